@@ -0,0 +1,160 @@
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Collection, Iterable, List, Optional, Tuple
+
+from buildlog import log_file_event
+from compress import Compressor, remove_compressed
+from manifest import hash_file
+from treescan import TreeInventory, scan_tree
+
+
+LOGGER = logging.getLogger(__name__)
+
+SYNC_MODES = ("copy", "hardlink", "reflink")
+
+FICLONE = 0x40049409  # linux ioctl cloning a file on copy-on-write filesystems (btrfs, xfs)
+
+
+class SyncSummary:
+    """Count of the files handled by a synchronisation of the static files
+    """
+
+    def __init__(self):
+        self.copied = 0
+        self.linked = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def __repr__(self):
+        return (f"{self.copied} copied, {self.linked} linked, "
+                f"{self.unchanged} unchanged, {self.removed} removed")
+
+
+def sync_assets(source: Path, destination: Path, previous_assets: Iterable[str],
+                mode: str = "copy", use_hash: bool = False,
+                include: Optional[Callable[[str], bool]] = None,
+                compressor: Optional[Compressor] = None,
+                inventory: Optional[TreeInventory] = None,
+                page_outputs: Collection[str] = ()) -> Tuple[SyncSummary, List[str]]:
+    """Synchronise the static files of a source directory into a destination directory
+    without emptying it first :
+    - files with the same size and modification time in both directories are left as is,
+      and with use_hash, files whose content did not change either
+    - new and changed files are copied, hard linked or reflinked depending on the mode
+    - previous_assets that are no longer in the source are removed from the destination
+    - if include is given, only the files for which include(relative path) is True are
+      synchronised, the others are left to another synchronisation (see shard)
+    - if a compressor is given, the compressed siblings of the new and changed files
+      are written again, and the ones of the unchanged files only if they are missing or older
+    - the files of the source are given by its inventory, scanned if not given (see treescan)
+    - the page_outputs, html documents relative to the destination, hide the files of the
+      same path, which are neither synchronised nor removed, as in a full build
+      (see buildgraph.BuildGraph.add_asset)
+    Return the summary of the synchronisation and the list of the synchronised assets,
+    relative to the destination, to give as previous_assets to the next synchronisation.
+    """
+    if mode not in SYNC_MODES:
+        raise ValueError(f"invalid sync mode: {mode}")
+    if not source.exists():
+        raise Exception(f"Not found: source directory {source}")
+
+    if inventory is None:
+        inventory = scan_tree(source)
+    summary = SyncSummary()
+    assets = []
+    for directory, (_, _, files) in inventory.directories.items():
+        (destination / directory).mkdir(parents=True, exist_ok=True)
+
+        for name in files:
+            asset = name if directory == "." else f"{directory}/{name}"
+            if (include is not None and not include(asset)) or asset in page_outputs:
+                continue
+            assets.append(asset)
+            src = source / asset
+            dst = destination / asset
+            unchanged = is_unchanged(src, dst, use_hash)
+            if unchanged:
+                summary.unchanged += 1
+            elif transfer_file(src, dst, mode):
+                summary.linked += 1
+                log_file_event(LOGGER, "FILE LINKED", src, dst)
+            else:
+                summary.copied += 1
+                log_file_event(LOGGER, "FILE COPIED", src, dst)
+            if compressor is not None:
+                compressor.compress_file(dst, changed=not unchanged)
+
+    for asset in set(previous_assets).difference(assets, page_outputs):
+        orphan = destination / asset
+        if orphan.is_file():
+            orphan.unlink()
+            summary.removed += 1
+            log_file_event(LOGGER, "FILE DELETED", orphan)
+        remove_compressed(orphan)
+
+    return summary, sorted(assets)
+
+
+def is_unchanged(src: Path, dst: Path, use_hash: bool = False) -> bool:
+    """Return True if the destination file is already up to date with the source file
+    """
+    try:
+        dst_stat = dst.stat()
+    except FileNotFoundError:
+        return False
+    src_stat = src.stat()
+
+    if (src_stat.st_ino, src_stat.st_dev) == (dst_stat.st_ino, dst_stat.st_dev):
+        return True  # hard link to the source
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return True
+    if use_hash and hash_file(src) == hash_file(dst):
+        shutil.copystat(src, dst)  # same mtime to skip the hash next time
+        return True
+    return False
+
+
+def transfer_file(src: Path, dst: Path, mode: str) -> bool:
+    """Put the content of src at dst, with a hard link, a reflink or a copy.
+    The previous dst is removed first, so that a hard linked source is never overwritten.
+    Return True if the file was linked, False if it was copied.
+    """
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return True
+        except OSError:
+            pass  # different filesystem or links not supported, copy instead
+    elif mode == "reflink" and reflink_file(src, dst):
+        return True
+
+    shutil.copy2(src, dst)
+    return False
+
+
+def reflink_file(src: Path, dst: Path) -> bool:
+    """Clone src to dst sharing the same blocks on disk.
+    Return False if the filesystem or the platform does not support it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    try:
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    except OSError:
+        if dst.exists():
+            dst.unlink()
+        return False
+
+    shutil.copystat(src, dst)
+    return True
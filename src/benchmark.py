@@ -0,0 +1,224 @@
+import argparse
+import json
+import logging
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import buildlog
+import fastparser
+import main
+from corpus import CorpusSettings, generate_documents, write_corpus
+from page_formatter import markdown_to_html, markdown_to_html_node, text_to_textnodes
+from searchindex import SearchIndex, collect_text
+from splitblocks import BlockType, block_to_block_type, markdown_to_blocks
+
+
+TEMPLATE = "<html><head><title>{{ Title }}</title></head><body><article>{{ Content }}</article></body></html>"
+
+
+def time_stage(function: Callable[[], object], repeat: int,
+               setup: Optional[Callable[[], object]] = None) -> Dict[str, object]:
+    """Run a function repeat times and return its timings in seconds.
+    The setup, if given, is run before each run and not timed.
+    """
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {"min": min(runs), "mean": sum(runs) / len(runs), "runs": runs}
+
+
+def benchmark_pipeline(documents: List[str], repeat: int) -> Dict[str, dict]:
+    """Time each stage of the markdown to html pipeline separately over a list of documents,
+    the fast path rendering html without the HTMLNode tree, the fast parser backend
+    (see parsers) and the search index
+    of the text of the documents
+    """
+    blocks = [block for document in documents for block in markdown_to_blocks(document)]
+    paragraphs = [block for block in blocks if block_to_block_type(block) == BlockType.PARAGRAPH]
+    trees = [markdown_to_html_node(document) for document in documents]
+    texts = []
+    for document in documents:
+        with collect_text() as page_texts:
+            markdown_to_html(document)
+        texts.append("\n".join(page_texts))
+    search_dir = tempfile.TemporaryDirectory()
+
+    results = {
+        "markdown_to_blocks": time_stage(lambda: [markdown_to_blocks(document) for document in documents], repeat),
+        "block_to_block_type": time_stage(lambda: [block_to_block_type(block) for block in blocks], repeat),
+        "text_to_textnodes": time_stage(lambda: [text_to_textnodes(block) for block in paragraphs], repeat),
+        "markdown_to_html_node": time_stage(lambda: [markdown_to_html_node(document) for document in documents], repeat),
+        "to_html": time_stage(lambda: [tree.to_html() for tree in trees], repeat),
+        "markdown_to_html": time_stage(lambda: [markdown_to_html(document) for document in documents], repeat),
+        "fast_markdown_to_html": time_stage(lambda: [fastparser.markdown_to_html(document)
+                                                     for document in documents], repeat),
+        "search_index": time_stage(lambda: build_search_index(texts, Path(search_dir.name)), repeat),
+    }
+    search_dir.cleanup()
+    return results
+
+
+def build_search_index(texts: List[str], public_dir: Path) -> None:
+    """Index the text of each document as a page and write the whole search index
+    """
+    search_index = SearchIndex()
+    for number, text in enumerate(texts):
+        search_index.add(public_dir / f"page_{number}.html", f"Page {number}", text)
+    search_index.write(public_dir)
+
+
+def benchmark_memory(documents: List[str]) -> Dict[str, int]:
+    """Measure the memory of the parsed trees of all the documents, kept alive together :
+    - peak_traced_bytes: peak of the memory allocated while parsing, traced by tracemalloc
+    - allocated_blocks: number of memory blocks still allocated once all trees are built
+    - max_rss_kib: peak resident memory of the whole benchmark process so far
+    """
+    # resident memory first, as tracing allocations adds its own memory
+    trees = [markdown_to_html_node(document) for document in documents]
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del trees
+
+    tracemalloc.start()
+    blocks_before = len(tracemalloc.take_snapshot().traces)
+    trees = [markdown_to_html_node(document) for document in documents]
+    _, peak = tracemalloc.get_traced_memory()
+    blocks_after = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+    del trees
+    return {
+        "peak_traced_bytes": peak,
+        "allocated_blocks": blocks_after - blocks_before,
+        "max_rss_kib": max_rss,
+    }
+
+
+def benchmark_builds(settings: CorpusSettings, build_options: List[List[str]], repeat: int) -> Dict[str, dict]:
+    """Time full builds of a generated site, once per list of command line options.
+    The public directory and the cache are deleted before each build, so that every
+    build starts from the sources only, even with --incremental or --tree-cache.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        site = Path(directory)
+        write_corpus(site / "content", settings)
+        (site / "static" / "images").mkdir(parents=True)
+        (site / "static" / "index.css").write_text("body { margin: 0; }")
+        (site / "template.html").write_text(TEMPLATE)
+        for options in build_options:
+            args = main.parse_args(options)
+            main.configure_logging(log_path=site / "logs.txt", use_queue=args.log_queue,
+                                   summary_only=args.log_summary)
+
+            def build():
+                main.build(args, content_dir=site / "content", static_dir=site / "static",
+                           template_path=site / "template.html", public_dir=site / "public",
+                           cache_dir=site / ".cache")
+
+            def clean():
+                shutil.rmtree(site / "public", ignore_errors=True)
+                shutil.rmtree(site / ".cache", ignore_errors=True)
+
+            results["build " + " ".join(options) if options else "build"] = time_stage(build, repeat, setup=clean)
+            buildlog.close()
+
+        logging.shutdown()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    """Return the current git commit of the repository, if any
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous: dict, current: dict) -> List[str]:
+    """Return a line per stage with the ratio between the current and previous min timings
+    """
+    lines = []
+    for name, value in current.get("memory", {}).items():
+        if name in previous.get("memory", {}):
+            ratio = value / previous["memory"][name]
+            lines.append(f"{name:<40} {previous['memory'][name]:>11} -> {value:>11}  x{ratio:.2f}")
+    for stage, timings in current["results"].items():
+        if stage not in previous["results"]:
+            continue
+        ratio = timings["min"] / previous["results"][stage]["min"]
+        lines.append(f"{stage:<40} {previous['results'][stage]['min']:10.4f}s -> {timings['min']:10.4f}s  x{ratio:.2f}")
+    return lines
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the markdown to html pipeline on a synthetic corpus")
+    parser.add_argument("--pages", type=int, default=100, help="number of documents")
+    parser.add_argument("--blocks", type=int, default=40, help="blocks per document")
+    parser.add_argument("--words", type=int, default=60, help="words per paragraph")
+    parser.add_argument("--links", type=int, default=4, help="links and images per paragraph")
+    parser.add_argument("--list-items", type=int, default=8, help="items per list")
+    parser.add_argument("--code-lines", type=int, default=20, help="lines per code block")
+    parser.add_argument("--quote-lines", type=int, default=4, help="lines per quote")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each stage, the min is kept")
+    parser.add_argument("--build", action="append", default=None, metavar="OPTIONS",
+                        help="options of a full build to time, e.g. --build='--jobs 4' (repeatable)")
+    parser.add_argument("--no-build", action="store_true", help="skip the full builds")
+    parser.add_argument("--memory", action="store_true",
+                        help="also measure the peak memory and allocations of the parsed trees")
+    parser.add_argument("--output", type=Path, help="write the json results to this file")
+    parser.add_argument("--compare", type=Path, help="json results of a previous run to compare with")
+    return parser.parse_args(argv)
+
+
+def run(argv: Optional[List[str]] = None) -> dict:
+    args = parse_args(argv)
+    settings = CorpusSettings(pages=args.pages, blocks=args.blocks, words=args.words,
+                              links=args.links, list_items=args.list_items,
+                              code_lines=args.code_lines, quote_lines=args.quote_lines,
+                              seed=args.seed)
+
+    documents = generate_documents(settings)
+    memory = benchmark_memory(documents) if args.memory else None
+    results = benchmark_pipeline(documents, args.repeat)
+    if not args.no_build:
+        build_options = [options.split() for options in (args.build or [""])]
+        results.update(benchmark_builds(settings, build_options, args.repeat))
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "corpus": settings.to_dict(),
+        "results": results,
+    }
+    if memory is not None:
+        report["memory"] = memory
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=1))
+    else:
+        print(json.dumps(report, indent=1))
+
+    if args.compare:
+        print("\n".join(compare_results(json.loads(args.compare.read_text()), report)), file=sys.stderr)
+
+    return report
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+
+SCHEMA_VERSION = "3"  # blocks stored with the urls of their links and their text
+
+# html fragment of a block, the urls of the links and images in it and its text
+CachedBlock = Tuple[str, Tuple[str, ...], str]
+
+
+def block_key(block: str) -> str:
+    """Return the content address of a raw markdown block
+    """
+    return hashlib.blake2b(block.encode(), digest_size=16).hexdigest()
+
+
+class BlockCache:
+    """A BlockCache maps raw markdown blocks to their rendered html fragment,
+    the urls of the links and images in it and its text (see searchindex), so that a cached block is never parsed again.
+    The fragments are kept in memory in a least recently used cache of max_entries blocks.
+    If a path is given, the fragments are also stored in a sqlite database
+    that survives between builds. The database is emptied when the version,
+    usually the version of the parser, changes.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[Path] = None, version: str = ""):
+        if max_entries < 1:
+            raise ValueError("a block cache must hold at least one block")
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.pending = {}  # fragments not yet written to the database
+        self.connection = None
+        if path is not None:
+            self.connection = open_database(path, version)
+
+    def get(self, block: str) -> Optional[str]:
+        """Return the html fragment of a block, or None if it is not cached
+        """
+        entry = self.get_entry(block)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, block: str) -> Optional[CachedBlock]:
+        """Return the html fragment of a block, the urls of its links and its text,
+        or None if it is not cached
+        """
+        key = block_key(block)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        if self.connection is not None:
+            row = self.connection.execute("SELECT html, links, text FROM blocks WHERE key = ?",
+                                          (key,)).fetchone()
+            if row is not None:
+                entry = (row[0], tuple(json.loads(row[1])), row[2])
+                self._remember(key, entry)
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, block: str, html: str, links: Iterable[str] = (), text: str = "") -> None:
+        """Store the html fragment of a block, the urls of its links and its text
+        """
+        key = block_key(block)
+        entry = (html, tuple(links), text)
+        self._remember(key, entry)
+        if self.connection is not None:
+            self.pending[key] = entry
+
+    def save(self) -> None:
+        """Write the new fragments to the database
+        """
+        if self.connection is None or not self.pending:
+            return
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO blocks (key, html, links, text) VALUES (?, ?, ?, ?)",
+                                        [(key, html, json.dumps(links), text)
+                                         for key, (html, links, text) in self.pending.items()])
+        self.pending.clear()
+
+    def close(self) -> None:
+        """Save the new fragments and close the database
+        """
+        self.save()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _remember(self, key: str, entry: CachedBlock) -> None:
+        """Add a fragment to the memory cache, evicting the least recently used one if full
+        """
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def open_database(path: Path, version: str) -> sqlite3.Connection:
+    """Open the sqlite database of a block cache, emptied if it was
+    written by another version, or with another schema
+    """
+    version = f"{SCHEMA_VERSION}/{version}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != version:
+            connection.execute("DROP TABLE IF EXISTS blocks")
+            connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (version,))
+        connection.execute("CREATE TABLE IF NOT EXISTS blocks "
+                           "(key TEXT PRIMARY KEY, html TEXT NOT NULL, links TEXT NOT NULL, text TEXT NOT NULL)")
+    return connection
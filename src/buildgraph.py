@@ -0,0 +1,222 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from buildlog import log_file_event
+from compress import remove_compressed
+from treescan import TreeInventory, scan_tree
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Kinds of the nodes of a build graph
+TEMPLATE = "template"
+SOURCE = "source"  # markdown document
+ASSET = "asset"  # static file
+PAGE = "page"  # html document rendered from a source and the template
+COPY = "copy"  # copy of an asset in the public directory
+
+
+class RebuildPlan:
+    """Work to bring the outputs of a site up to date :
+    - pages: (markdown source, destination directory) pairs to render
+    - assets: (static file, copy) pairs to copy
+    - deleted: outputs whose input disappeared, to delete
+    """
+
+    def __init__(self, pages: List[Tuple[Path, Path]], assets: List[Tuple[Path, Path]], deleted: List[Path]):
+        self.pages = pages
+        self.assets = assets
+        self.deleted = deleted
+
+    def __repr__(self):
+        return f"{len(self.pages)} pages, {len(self.assets)} assets, {len(self.deleted)} deleted"
+
+
+class BuildGraph:
+    """A BuildGraph records which output of a site depends on which inputs :
+    - a page depends on its markdown source and on the template
+    - the copy of a static asset depends on the asset
+    From a list of changed paths, it plans the minimal set of outputs to rebuild or delete,
+    and executes a plan with the asset copies running concurrently with the page renders.
+    When a page and an asset have the same output, the page is kept, as the pages
+    were always written after the static files.
+    """
+
+    def __init__(self, content_dir: Path, static_dir: Path, template_path: Path, public_dir: Path):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.public_dir = public_dir
+        self.inputs: Dict[Path, str] = {template_path: TEMPLATE}  # input -> kind
+        self.outputs: Dict[Path, Tuple[str, Tuple[Path, ...]]] = {}  # output -> (kind, inputs)
+        self.dependents: Dict[Path, Set[Path]] = {template_path: set()}  # input -> outputs
+
+    @classmethod
+    def scan(cls, content_dir: Path, static_dir: Path, template_path: Path, public_dir: Path) -> "BuildGraph":
+        """Return the graph of the markdown sources and static files found on disk
+        """
+        graph = cls(content_dir, static_dir, template_path, public_dir)
+        for asset in walk_files(static_dir):
+            graph.add_asset(asset)
+        for source in walk_files(content_dir):
+            graph.add_source(source)
+        return graph
+
+    def page_output(self, source: Path) -> Path:
+        """Return the html document rendered from a markdown source
+        """
+        return self.public_dir / source.parent.relative_to(self.content_dir) / f"{source.stem}.html"
+
+    def copy_output(self, asset: Path) -> Path:
+        """Return the copy of a static asset in the public directory
+        """
+        return self.public_dir / asset.relative_to(self.static_dir)
+
+    def add_source(self, source: Path) -> Path:
+        """Add a markdown source and its page, and return the page
+        """
+        output = self.page_output(source)
+        self._add(output, PAGE, (source, self.template_path), SOURCE)
+        return output
+
+    def add_asset(self, asset: Path) -> Path:
+        """Add a static asset and its copy, and return the copy
+        """
+        output = self.copy_output(asset)
+        if self.outputs.get(output, (None,))[0] == PAGE:
+            self.inputs[asset] = ASSET  # hidden by a page
+            self.dependents.setdefault(asset, set())
+            return output
+        self._add(output, COPY, (asset,), ASSET)
+        return output
+
+    def remove_input(self, path: Path) -> List[Path]:
+        """Remove a source or an asset and return its outputs, which no longer have an input
+        """
+        self.inputs.pop(path, None)
+        outputs = sorted(self.dependents.pop(path, set()))
+        for output in outputs:
+            _, inputs = self.outputs.pop(output)
+            for other_input in inputs:
+                self.dependents.get(other_input, set()).discard(output)  # the template
+        return outputs
+
+    def dependent_outputs(self, changed: Iterable[Path]) -> Set[Path]:
+        """Return the outputs depending on any of the changed inputs
+        """
+        outputs = set()
+        for path in changed:
+            outputs.update(self.dependents.get(path, ()))
+        return outputs
+
+    def plan(self, changed: Iterable[Path]) -> RebuildPlan:
+        """Update the graph with the changed paths, added, modified or deleted,
+        and return the minimal plan bringing the outputs up to date :
+        a changed template renders every page, a changed source its page
+        and a changed asset its copy. The asset hidden by a deleted page is copied again.
+        Paths outside of the inputs are ignored.
+        """
+        deleted = []
+        rebuilt = set()
+        for path in changed:
+            if path == self.template_path:
+                rebuilt.update(self.dependents[path])
+            elif path.is_relative_to(self.content_dir) or path.is_relative_to(self.static_dir):
+                if path.is_file():
+                    if path in self.inputs:
+                        pass
+                    elif path.is_relative_to(self.content_dir):
+                        self.add_source(path)
+                    else:
+                        self.add_asset(path)
+                    rebuilt.update(self.dependents[path])
+                elif path in self.inputs:
+                    outputs = self.remove_input(path)
+                    deleted.extend(outputs)
+                    rebuilt.update(self._show_hidden_assets(outputs))
+        # an asset shown again then deleted in the same change has no output anymore
+        return self._plan_outputs({output for output in rebuilt if output in self.outputs}, sorted(set(deleted)))
+
+    def full_plan(self) -> RebuildPlan:
+        """Return the plan building every output
+        """
+        return self._plan_outputs(set(self.outputs), [])
+
+    def execute(self, plan: RebuildPlan, render_pages: Callable[[List[Tuple[Path, Path]]], None],
+                copy_assets: Callable[[List[Tuple[Path, Path]]], None]) -> None:
+        """Delete the outputs of the plan, create the directories of the new outputs,
+        then render the pages in the calling thread while the assets are copied in another one
+        """
+        for output in plan.deleted:
+            if output.is_file():
+                output.unlink()
+                log_file_event(LOGGER, "FILE DELETED", output)
+            remove_compressed(output)
+        directories = {dest_dir for _, dest_dir in plan.pages}
+        directories.update(copy.parent for _, copy in plan.assets)
+        for directory in sorted(directories):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        run_concurrently(lambda: render_pages(plan.pages), lambda: copy_assets(plan.assets))
+
+    def _add(self, output: Path, output_kind: str, inputs: Tuple[Path, ...], input_kind: str) -> None:
+        previous = self.outputs.get(output)
+        if previous is not None:
+            for path in previous[1]:
+                self.dependents.get(path, set()).discard(output)
+        self.outputs[output] = (output_kind, inputs)
+        self.inputs[inputs[0]] = input_kind
+        for path in inputs:
+            self.dependents.setdefault(path, set()).add(output)
+
+    def _show_hidden_assets(self, outputs: List[Path]) -> List[Path]:
+        """Add back the copies of the assets hidden by the removed outputs, and return them
+        """
+        shown = []
+        for output in outputs:
+            asset = self.static_dir / output.relative_to(self.public_dir)
+            if self.inputs.get(asset) == ASSET and not self.dependents.get(asset):
+                self._add(output, COPY, (asset,), ASSET)
+                shown.append(output)
+        return shown
+
+    def _plan_outputs(self, outputs: Set[Path], deleted: List[Path]) -> RebuildPlan:
+        pages = []
+        assets = []
+        for output in sorted(outputs):
+            kind, inputs = self.outputs[output]
+            if kind == PAGE:
+                pages.append((inputs[0], output.parent))
+            else:
+                assets.append((inputs[0], output))
+        return RebuildPlan(pages, assets, sorted(deleted))
+
+
+def run_concurrently(*tasks: Callable[[], object]) -> List[object]:
+    """Run the first task in the calling thread and the others in threads of their own,
+    and return their results once all are done. The first error is raised.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, len(tasks) - 1), thread_name_prefix="build") as executor:
+        futures = [executor.submit(task) for task in tasks[1:]]
+        result = tasks[0]()
+        return [result, *[future.result() for future in futures]]
+
+
+def walk_files(root: Path) -> List[Path]:
+    """Return the files of a directory tree, in a stable order
+    """
+    return scan_tree(root).paths()
+
+
+def page_outputs(content_dir: Path, inventory: TreeInventory) -> Dict[str, Path]:
+    """Return the markdown document of each html document of the site, by its path
+    relative to the public directory, from the inventory of the content directory
+    """
+    outputs = {}
+    for directory, (_, _, names) in inventory.directories.items():
+        for name in names:
+            output = f"{Path(name).stem}.html" if directory == "." else f"{directory}/{Path(name).stem}.html"
+            outputs[output] = content_dir / directory / name
+    return outputs
@@ -0,0 +1,323 @@
+import contextlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+OTHER_PHASE = "other"  # phase of the events logged outside of any phase
+
+
+class BuildSummary:
+    """Time spent in each phase of a build (see phase) and count of the file events
+    logged during each phase, e.g. {("pages", "FILE CREATED"): 120}.
+    The phases can run in concurrent threads, e.g. the pages and the static files.
+    """
+
+    def __init__(self):
+        self.times: Dict[str, float] = {}  # phase -> seconds, in the order of their start
+        self.events: Counter = Counter()  # (phase, event) -> count
+        self.lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.times[name] = self.times.get(name, 0.0) + seconds
+
+    def count(self, event: str, count: int = 1, name: Optional[str] = None) -> None:
+        """Count a file event in a phase, by default the phase of the current thread
+        """
+        with self.lock:
+            self.events[(name or current_phase() or OTHER_PHASE, event)] += count
+
+    def drain_events(self) -> Counter:
+        """Return the count of each event, whatever its phase, and reset the summary,
+        to merge the events of a worker process into the phase of the parent (see merge_events)
+        """
+        with self.lock:
+            events = Counter()
+            for (_, event), count in self.events.items():
+                events[event] += count
+            self.events.clear()
+            self.times.clear()
+        return events
+
+    def merge_events(self, events: Counter) -> None:
+        """Count events of another process in the phase of the current thread
+        """
+        for event, count in events.items():
+            self.count(event, count)
+
+    def lines(self) -> List[str]:
+        """Return one line per phase with its time and its events, as
+        "PHASE pages : 0.512 s, DIRECTORY CREATED 3, FILE CREATED 120"
+        """
+        with self.lock:
+            names = list(self.times)
+            names.extend(sorted({name for name, _ in self.events if name not in self.times}))
+            lines = []
+            for name in names:
+                line = f"PHASE {name} : "
+                line += f"{self.times[name]:.3f} s" if name in self.times else "untimed"
+                for (event_phase, event), count in sorted(self.events.items()):
+                    if event_phase == name:
+                        line += f", {event} {count}"
+                lines.append(line)
+        return lines
+
+    def reset(self) -> None:
+        with self.lock:
+            self.times.clear()
+            self.events.clear()
+
+
+SUMMARY = BuildSummary()
+CURRENT_PHASE = threading.local()
+
+
+def current_phase() -> Optional[str]:
+    return getattr(CURRENT_PHASE, "name", None)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a phase of the build in the current thread, and count the file events
+    logged by the thread meanwhile in this phase
+    """
+    previous = current_phase()
+    CURRENT_PHASE.name = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SUMMARY.add_time(name, time.perf_counter() - start)
+        CURRENT_PHASE.name = previous
+
+
+def in_phase(name: str, function: Callable) -> Callable:
+    """Return a function calling the given one in a phase of the build
+    """
+    def run(*args, **kwargs):
+        with phase(name):
+            return function(*args, **kwargs)
+    return run
+
+
+# False to only count the file events, see configure
+LOG_FILES = True
+
+
+def log_file_event(logger: logging.Logger, event: str, path, destination=None) -> None:
+    """Count an event of a file in the phase of the current thread, e.g. "FILE CREATED",
+    and log it as "FILE CREATED : path", or "FILE COPIED : FROM path -> TO destination".
+    With the summary only, no log record is created for it.
+    """
+    SUMMARY.count(event)
+    if not LOG_FILES:
+        return
+    if destination is None:
+        logger.info(f"{event} : {path}")
+    else:
+        logger.info(f"{event} : FROM {path} -> TO {destination}")
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler leaving the formatting of the records to the thread of the listener.
+    The standard QueueHandler formats each record in the thread logging it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None  # the traceback can not cross a queue
+        return record
+
+
+class BatchFileHandler(logging.FileHandler):
+    """FileHandler of a queue listener keeping the formatted records in memory, written
+    at once when the listener has emptied its queue (see flush_batch), or every
+    MAX_BATCH records, instead of one write per record.
+    The file is opened in append mode, so that the batches and the lines of the
+    worker processes (see configure_worker) are each written at the end of the file.
+    """
+
+    MAX_BATCH = 1000
+
+    def __init__(self, filename: Path):
+        super().__init__(filename, mode="a")
+        self.batch: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.batch.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+        if len(self.batch) >= self.MAX_BATCH:
+            self.flush_batch()
+
+    def flush_batch(self) -> None:
+        """Write the records of the batch with one write call
+        """
+        with self.lock:
+            if self.batch and self.stream is not None:
+                self.stream.write("".join(self.batch))
+                self.stream.flush()
+            self.batch.clear()
+
+    def close(self) -> None:
+        self.flush_batch()
+        super().close()
+
+
+class BatchQueueListener(QueueListener):
+    """QueueListener flushing its handlers once it has handled all the records of its queue
+    """
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                if isinstance(handler, BatchFileHandler):
+                    handler.flush_batch()
+
+
+# handler of the root logger installed by configure, and the thread draining its queue
+HANDLER: Optional[logging.Handler] = None
+LISTENER: Optional[QueueListener] = None
+FORK_HANDLERS_REGISTERED = False
+# values of the settings of the logging module changed by configure, restored by close
+SAVED_RECORD_SETTINGS: Dict[str, object] = {}
+
+
+def configure(log_path: Path, use_queue: bool = False, summary_only: bool = False) -> None:
+    """Send the logs to a file overwritten at each build, replacing a previous configuration.
+    With use_queue, the records are put in a queue drained by a background thread
+    formatting and writing them, see close. With summary_only, the file events are
+    not logged, only counted for the summary of the phases (see log_summary).
+    """
+    global HANDLER, LISTENER, FORK_HANDLERS_REGISTERED, LOG_FILES, SAVED_RECORD_SETTINGS
+    close()
+    root = logging.getLogger()
+    if use_queue:
+        open(log_path, "w").close()  # overwritten, then appended to
+        file_handler = BatchFileHandler(log_path)
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        HANDLER = DeferredQueueHandler(records)
+        LISTENER = BatchQueueListener(records, file_handler)
+        LISTENER.start()
+    else:
+        HANDLER = logging.FileHandler(log_path, mode="w")
+        HANDLER.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(HANDLER)
+    LOG_FILES = not summary_only
+    # the records do not collect what LOG_FORMAT does not show (see "Optimization" in the
+    # documentation of logging): the caller, about a third of the cost of a record, and the thread and process
+    SAVED_RECORD_SETTINGS = {name: getattr(logging, name)
+                             for name in ("_srcfile", "logThreads", "logProcesses", "logMultiprocessing")}
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    root.setLevel(logging.INFO)
+    SUMMARY.reset()
+
+    if not FORK_HANDLERS_REGISTERED:
+        os.register_at_fork(before=acquire_log_handlers, after_in_parent=release_log_handlers,
+                            after_in_child=reset_summary_lock)
+        FORK_HANDLERS_REGISTERED = True
+
+
+def close() -> None:
+    """Write the records left in the queue and stop its thread, if any, then remove the
+    handler installed by configure, close the log file and restore the settings of logging
+    """
+    global HANDLER, LISTENER, LOG_FILES, SAVED_RECORD_SETTINGS
+    if HANDLER is not None:
+        logging.getLogger().removeHandler(HANDLER)
+        HANDLER.close()
+    if LISTENER is not None:
+        LISTENER.stop()
+        for handler in LISTENER.handlers:
+            handler.close()
+    HANDLER = None
+    LISTENER = None
+    LOG_FILES = True
+    for name, value in SAVED_RECORD_SETTINGS.items():
+        setattr(logging, name, value)
+    SAVED_RECORD_SETTINGS = {}
+
+
+def log_handlers() -> List[logging.Handler]:
+    handlers = list(logging.getLogger().handlers)
+    if LISTENER is not None:
+        handlers.extend(LISTENER.handlers)
+    return handlers
+
+
+def acquire_log_handlers() -> None:
+    """ Wait for the log handlers to be free before a worker process is forked.
+    The static files are copied by a thread while the pages are rendered (see buildgraph):
+    a worker forked while that thread writes a log line would inherit the lock of the
+    log file in its locked state, and hang at its first log line. The handlers of the
+    queue thread are held too, as the worker writes to the log file directly
+    (see configure_worker). Their batch is written first, not to be copied in the worker.
+    The lock of the summary, taken by log_file_event, is held too.
+    """
+    SUMMARY.lock.acquire()
+    for handler in log_handlers():
+        handler.acquire()
+        if isinstance(handler, BatchFileHandler):
+            handler.flush_batch()
+
+
+def release_log_handlers() -> None:
+    for handler in reversed(log_handlers()):
+        handler.release()
+    SUMMARY.lock.release()
+
+
+def reset_summary_lock() -> None:
+    """Give the summary of a forked worker a free lock, the one held by acquire_log_handlers
+    being copied in its locked state
+    """
+    SUMMARY.lock = threading.Lock()
+
+
+def configure_worker() -> None:
+    """Log directly to the file in a forked worker process: the thread draining the queue
+    of the parent does not exist in the worker, the records put in the queue would be lost.
+    The counts of the file events of the worker are sent back with drain_events.
+    """
+    global HANDLER, LISTENER
+    SUMMARY.reset()
+    if LISTENER is None or HANDLER is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(HANDLER)
+    HANDLER = logging.FileHandler(LISTENER.handlers[0].baseFilename, mode="a")
+    HANDLER.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(HANDLER)
+    LISTENER = None
+
+
+def drain_events() -> Optional[Counter]:
+    """Return the file events counted in this process since the last call, None if there is none
+    """
+    events = SUMMARY.drain_events()
+    return events if events else None
+
+
+def log_summary(logger: logging.Logger) -> None:
+    """Log the time and the file events of each phase of the build
+    """
+    for line in SUMMARY.lines():
+        logger.info(line)
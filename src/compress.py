@@ -0,0 +1,195 @@
+import gzip
+import locale
+import os
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional dependency, only gzip is available without it
+    brotli = None
+
+
+def gzip_compress(data: bytes) -> bytes:
+    """Compress with gzip at the highest level, without the time in the header,
+    so that the same file always gives the same compressed sibling
+    """
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+# format name -> (suffix of the compressed sibling, compression function)
+COMPRESSION_FORMATS: Dict[str, Tuple[str, Callable[[bytes], bytes]]] = {"gzip": (".gz", gzip_compress)}
+if brotli is not None:
+    COMPRESSION_FORMATS["br"] = (".br", brotli.compress)
+
+SIBLING_SUFFIXES = (".gz", ".br")
+
+# files already compressed, that a static server sends as they are
+INCOMPRESSIBLE_SUFFIXES = {".gz", ".br", ".zip", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif",
+                           ".woff", ".woff2", ".mp3", ".mp4", ".webm"}
+
+
+class Compressor:
+    """A Compressor writes the compressed siblings of the files of a site (index.html.gz
+    next to index.html) for the static servers sending precompressed files.
+    The compression runs in a pool of threads, zlib and brotli releasing the GIL,
+    or in the calling thread without threads. Files below min_size and files of
+    an already compressed type get no sibling.
+    The number of files compressed, up to date and skipped is kept in counts.
+    Files can be given from several threads, e.g. the pages and the static files of a build.
+    """
+
+    def __init__(self, formats: Iterable[str] = ("gzip",), min_size: int = 1024, threads: int = 4,
+                 max_pending: int = 64):
+        self.format_names = list(formats)
+        self.formats = []
+        for name in self.format_names:
+            if name not in COMPRESSION_FORMATS:
+                raise ValueError(f"unavailable compression format: {name}")
+            self.formats.append(COMPRESSION_FORMATS[name])
+        self.min_size = min_size
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="compress") if threads else None
+        self.pending: Deque[Future] = deque()
+        self.counts: Counter = Counter()
+        self.lock = threading.Lock()
+
+    def compress_bytes(self, path: Path, data: bytes) -> None:
+        """Write the siblings of a file from its content, still in memory
+        """
+        self._submit(self._write_siblings, path, data)
+
+    def compress_text(self, path: Path, text: str) -> None:
+        """Write the siblings of a text file written with the default encoding
+        """
+        self.compress_bytes(path, text.encode(locale.getpreferredencoding(False)))
+
+    def compress_file(self, path: Path, changed: bool = True) -> None:
+        """Write the siblings of a file read from the disk.
+        If the file did not change, the siblings are only written when they are missing
+        or older than the file.
+        """
+        self._submit(self._compress_file, path, changed)
+
+    def is_up_to_date(self, path: Path) -> bool:
+        """Return True if every sibling of a file was written after the file
+        """
+        mtime = path.stat().st_mtime_ns
+        for suffix, _ in self.formats:
+            try:
+                if sibling_path(path, suffix).stat().st_mtime_ns < mtime:
+                    return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    def drain_counts(self) -> Counter:
+        """Return the counts of the files handled since the last call and reset them,
+        to merge the counts of a worker process into the ones of the build
+        """
+        self.wait()
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    def merge_counts(self, counts: Counter) -> None:
+        """Add the counts of another compressor
+        """
+        with self.lock:
+            self.counts.update(counts)
+
+    def wait(self) -> None:
+        """Wait for the pending compressions, and raise the first error
+        """
+        self._wait_pending(0)
+
+    def close(self) -> None:
+        """Wait for the pending compressions and stop the threads
+        """
+        try:
+            self.wait()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+
+    def _submit(self, function: Callable[..., str], *args) -> None:
+        if self.executor is None:
+            self._count(function(*args))
+            return
+        self.pending.append(self.executor.submit(function, *args))
+        self._wait_pending(self.max_pending)  # bound the contents kept in memory
+
+    def _wait_pending(self, max_pending: int) -> None:
+        while len(self.pending) > max_pending:
+            try:
+                future = self.pending.popleft()
+            except IndexError:  # taken by another thread
+                return
+            self._count(future.result())
+
+    def _count(self, status: str) -> None:
+        with self.lock:
+            self.counts[status] += 1
+
+    def _compress_file(self, path: Path, changed: bool) -> str:
+        if not self._compressible(path, path.stat().st_size):
+            remove_compressed(path)
+            return "skipped"
+        if not changed and self.is_up_to_date(path):
+            return "unchanged"
+        return self._write_siblings(path, path.read_bytes())
+
+    def _write_siblings(self, path: Path, data: bytes) -> str:
+        if not self._compressible(path, len(data)):
+            remove_compressed(path)
+            return "skipped"
+        for suffix, compress in self.formats:
+            sibling = sibling_path(path, suffix)
+            temporary_path = sibling.with_name(f"{sibling.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            temporary_path.write_bytes(compress(data))
+            os.replace(temporary_path, sibling)
+        return "compressed"
+
+    def _compressible(self, path: Path, size: int) -> bool:
+        return size >= self.min_size and path.suffix.lower() not in INCOMPRESSIBLE_SUFFIXES
+
+
+def sibling_path(path: Path, suffix: str) -> Path:
+    """Return the path of the compressed sibling of a file
+    """
+    return path.with_name(path.name + suffix)
+
+
+def remove_compressed(path: Path) -> None:
+    """Delete the compressed siblings of a file, if any
+    """
+    for suffix in SIBLING_SUFFIXES:
+        sibling_path(path, suffix).unlink(missing_ok=True)
+
+
+def remove_orphan_siblings(directory: Path) -> None:
+    """Delete the compressed siblings of the files removed from a directory tree
+    """
+    for path in directory.rglob("*"):
+        if path.suffix in SIBLING_SUFFIXES and not path.with_suffix("").exists():
+            path.unlink()
+
+
+class TeeWriter:
+    """Text stream writing to another stream while keeping a copy of the text,
+    to compress a page without reading it back
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.chunks = []
+
+    def write(self, text: str) -> int:
+        self.chunks.append(text)
+        return self.stream.write(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.chunks)
@@ -0,0 +1,113 @@
+import random
+from pathlib import Path
+
+
+WORDS = ["the", "ring", "of", "power", "shire", "hobbit", "wizard", "mountain", "river",
+         "elves", "dwarves", "journey", "shadow", "light", "tower", "forest", "road", "king"]
+
+
+class CorpusSettings:
+    """Size and markup density of a synthetic markdown corpus :
+    - pages: number of markdown documents
+    - blocks: number of blocks in each document
+    - words: number of words in each paragraph
+    - links: number of links and images in each paragraph
+    - list_items: number of items of each list
+    - code_lines: number of lines of each code block
+    - quote_lines: number of lines of each quote
+    - seed: seed of the random generator, the same settings always give the same corpus
+    """
+
+    def __init__(self, pages: int = 100, blocks: int = 40, words: int = 60, links: int = 4,
+                 list_items: int = 8, code_lines: int = 20, quote_lines: int = 4, seed: int = 0):
+        self.pages = pages
+        self.blocks = blocks
+        self.words = words
+        self.links = links
+        self.list_items = list_items
+        self.code_lines = code_lines
+        self.quote_lines = quote_lines
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def generate_inline_text(generator: random.Random, words: int, links: int) -> str:
+    """Return a line of text with bold, italic, code, links and images
+    """
+    parts = []
+    for i in range(words):
+        word = generator.choice(WORDS)
+        match i % 12:
+            case 3:
+                parts.append(f"**{word}**")
+            case 7:
+                parts.append(f"*{word}*")
+            case 10:
+                parts.append(f"`{word}`")
+            case _:
+                parts.append(word)
+
+    for _ in range(links):
+        position = generator.randrange(len(parts) + 1)
+        word = generator.choice(WORDS)
+        if generator.random() < 0.2:
+            parts.insert(position, f"![{word}](/images/{word}.png)")
+        else:
+            parts.insert(position, f"[{word}](/{word}/{generator.randrange(100)})")
+
+    return " ".join(parts)
+
+
+def generate_block(generator: random.Random, settings: CorpusSettings) -> str:
+    """Return a random markdown block
+    """
+    kind = generator.random()
+    if kind < 0.45:
+        return generate_inline_text(generator, settings.words, settings.links)
+    if kind < 0.55:
+        return f"{'#' * generator.randint(2, 6)} {generate_inline_text(generator, 5, 0)}"
+    if kind < 0.70:
+        prefix = generator.choice(["* ", "- "])
+        return "\n".join(prefix + generate_inline_text(generator, 8, 1)
+                         for _ in range(settings.list_items))
+    if kind < 0.80:
+        items = min(settings.list_items, 9)  # ordered lists stop at 9 items
+        return "\n".join(f"{i}. " + generate_inline_text(generator, 8, 1)
+                         for i in range(1, items + 1))
+    if kind < 0.90:
+        lines = ["    " + " ".join(generator.choice(WORDS) for _ in range(6))
+                 for _ in range(settings.code_lines)]
+        return "```\n" + "\n".join(lines) + "\n```"
+    return "\n".join("> " + generate_inline_text(generator, 12, 0)
+                     for _ in range(settings.quote_lines))
+
+
+def generate_document(generator: random.Random, settings: CorpusSettings) -> str:
+    """Return a markdown document starting with a title
+    """
+    title = " ".join(generator.choice(WORDS) for _ in range(3))
+    blocks = [f"# {title}"] + [generate_block(generator, settings) for _ in range(settings.blocks)]
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_documents(settings: CorpusSettings) -> list:
+    """Return the list of markdown documents of a corpus
+    """
+    generator = random.Random(settings.seed)
+    return [generate_document(generator, settings) for _ in range(settings.pages)]
+
+
+def write_corpus(content_dir: Path, settings: CorpusSettings, pages_per_directory: int = 50) -> list:
+    """Write the documents of a corpus into a content directory,
+    in sub directories of pages_per_directory documents. Return the markdown paths.
+    """
+    paths = []
+    for index, document in enumerate(generate_documents(settings)):
+        directory = content_dir / f"section_{index // pages_per_directory}"
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"page_{index}.md"
+        path.write_text(document)
+        paths.append(path)
+    return paths
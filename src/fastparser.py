@@ -0,0 +1,305 @@
+import re
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import page_formatter
+from blockcache import BlockCache
+from htmlnode import Tag, HTMLNode, LeafNode, ParentNode
+from instrumentation import stage
+from linkindex import add_links
+from searchindex import add_texts
+from splitblocks import markdown_to_blocks
+
+
+# Fast parser backend: the same html as page_formatter, rendered by a state machine
+# straight to strings, without TextNodes nor HTMLNodes.
+# The text of a block is only scanned at its special characters, found with str.find
+# and a compiled pattern, and a block it can not render (an unmatched delimiter,
+# an element without text) is given to page_formatter, to raise the same error.
+
+# Delimiters of the inline text, in the order they are split by splitinlines.tokenize_inline.
+# Split on this pattern, a text alternates between its parts and its delimiters.
+DELIMITER_PATTERN = re.compile(r"(\*\*|\*|`)")
+
+# States of the delimiter scanner
+TEXT, BOLD, ITALIC, CODE, INVALID = range(5)
+
+# Next state by state and delimiter. A delimiter keeping the state is text:
+# "*" and "`" in bold, "`" in italic. A bold delimiter in italic or code,
+# or an italic one in code, ends the enclosing element before its delimiter is closed.
+TRANSITIONS = (
+    {"**": BOLD, "*": ITALIC, "`": CODE},  # TEXT
+    {"**": TEXT, "*": BOLD, "`": BOLD},  # BOLD
+    {"**": INVALID, "*": TEXT, "`": ITALIC},  # ITALIC
+    {"**": INVALID, "*": INVALID, "`": TEXT},  # CODE
+)
+
+# Opening and closing html of the text of each state
+STATE_TAGS = (("", ""), ("<b>", "</b>"), ("<i>", "</i>"), ("<code>", "</code>"))
+
+UNORDERED_LIST_MARKERS = ("* ", "- ")
+
+
+def delimiters_to_html(text: str, html: List[str], words: List[str]) -> bool:
+    """Append the html of a text without image or link to html, and its text without
+    the delimiters to words. Return False if a delimiter is not matched.
+    """
+    if "*" not in text and "`" not in text:
+        if text:
+            html.append(text)
+            words.append(text)
+        return True
+
+    parts = DELIMITER_PATTERN.split(text)
+    state = TEXT
+    part = parts[0]
+    for index in range(1, len(parts), 2):
+        delimiter = parts[index]
+        next_state = TRANSITIONS[state][delimiter]
+        if next_state == state:
+            part += delimiter + parts[index + 1]  # kept in the text of the element
+            continue
+        if next_state == INVALID:
+            return False
+        if part:
+            if state == TEXT:
+                html.append(part)
+            else:
+                opening, closing = STATE_TAGS[state]
+                html.append(f"{opening}{part}{closing}")
+            words.append(part)
+        state = next_state
+        part = parts[index + 1]
+    if state != TEXT:
+        return False
+    if part:
+        html.append(part)
+        words.append(part)
+    return True
+
+
+def find_bracket(text: str, opening: str, start: int, end: int) -> Optional[Tuple[int, str, str, int]]:
+    """Find the first image ("![") or link ("[") in text[start:end], matched as
+    splitinlines.IMAGE_PATTERN and LINK_PATTERN do, and return its start,
+    its text, its url and its end, or None if there is none.
+    The text ends at the first "](" and the url at the next ")", both on the same line.
+    """
+    while True:
+        start = text.find(opening, start, end)
+        if start == -1:
+            return None
+        text_start = start + len(opening)
+        middle = text.find("](", text_start, end)
+        if middle == -1:
+            return None  # none for any later start either
+        close = text.find(")", middle + 2, end)
+        if close == -1:
+            return None
+        newline = text.find("\n", text_start, close)
+        if newline == -1:
+            return start, text[text_start:middle], text[middle + 2:close], close + 1
+        start = newline + 1  # no match starts before the line return
+
+
+def text_to_html(text: str, links: List[str]) -> Optional[Tuple[str, str]]:
+    """Return the html of a text of inline markdown, as page_formatter.text_to_html,
+    with its text as collected by searchindex.add_textnodes, and append the urls
+    of its links and images to links.
+    Return None if it has an unmatched delimiter, or no inline element.
+    """
+    if not text:
+        return "", ""
+    html: List[str] = []
+    words: List[str] = []
+    if "[" not in text:
+        if "*" not in text and "`" not in text:
+            return text, text
+        if not delimiters_to_html(text, html, words) or not html:
+            return None
+        return "".join(html), "".join(words)
+
+    # the images first, then the links of the text between them, as tokenize_inline
+    end = len(text)
+    position = 0
+    image = find_bracket(text, "![", 0, end)
+    while True:
+        text_end = image[0] if image is not None else end
+        link = find_bracket(text, "[", position, text_end)
+        while link is not None:
+            link_start, anchor, url, link_end = link
+            if not delimiters_to_html(text[position:link_start], html, words):
+                return None
+            if anchor:
+                html.append(f'<a href="{url}">{anchor}</a>')
+                words.append(anchor)
+                links.append(url)
+            position = link_end
+            link = find_bracket(text, "[", position, text_end)
+        if not delimiters_to_html(text[position:text_end], html, words):
+            return None
+        if image is None:
+            break
+        _, alt, url, position = image
+        if alt:
+            html.append(f'<img src="{url}" alt="{alt}"></img>')
+            words.append(alt)
+            links.append(url)
+        image = find_bracket(text, "![", position, end)
+
+    if not html:
+        return None
+    return "".join(html), "".join(words)
+
+
+def render_inline(text: str, opening: str, closing: str, links: List[str], texts: List[str]) -> Optional[str]:
+    """Return the html of a text of inline markdown between an opening and a closing tag,
+    adding its text to texts, or None if it can not be rendered
+    """
+    rendered = text_to_html(text, links)
+    if rendered is None:
+        return None
+    texts.append(rendered[1])
+    return f"{opening}{rendered[0]}{closing}"
+
+
+def render_paragraph(block: str, links: List[str], texts: List[str]) -> Optional[str]:
+    return render_inline(block, "<p>", "</p>", links, texts)
+
+
+def render_heading(block: str, links: List[str], texts: List[str]) -> Optional[str]:
+    level = len(block) - len(block.lstrip("#"))
+    if level > 6 or block[level:level + 1] != " " or "\n" in block:
+        return render_paragraph(block, links, texts)
+    return render_inline(block[level:].lstrip(), f"<h{level}>", f"</h{level}>", links, texts)
+
+
+def render_code(block: str, links: List[str], texts: List[str]) -> Optional[str]:
+    if len(block) < 6 or not block.startswith("```") or not block.endswith("```"):
+        return render_paragraph(block, links, texts)
+    first_end = block.find("\n")
+    last_start = block.rfind("\n")
+    code = block[first_end + 1:last_start].strip() if first_end != last_start else ""
+    return render_inline(code, "<pre><code>", "</code></pre>", links, texts)
+
+
+def render_quote(block: str, links: List[str], texts: List[str]) -> Optional[str]:
+    if block.count("\n") != block.count("\n>"):
+        return render_paragraph(block, links, texts)
+    quote = "<br>".join([line.lstrip("> ") for line in block.split("\n")])
+    return render_inline(quote, "<blockquote>", "</blockquote>", links, texts)
+
+
+def render_list_items(lines: List[str], index: int, opening: str, closing: str,
+                      links: List[str], texts: List[str]) -> Optional[str]:
+    items = [opening]
+    for line in lines:
+        item = render_inline(line[index:], "<li>", "</li>", links, texts)
+        if item is None:
+            return None
+        items.append(item)
+    items.append(closing)
+    return "".join(items)
+
+
+def render_unordered_list(block: str, links: List[str], texts: List[str]) -> Optional[str]:
+    lines = block.split("\n")
+    for line in lines:
+        if line[:2] not in UNORDERED_LIST_MARKERS:
+            return render_paragraph(block, links, texts)
+    return render_list_items(lines, 2, "<ul>", "</ul>", links, texts)
+
+
+def render_ordered_list(block: str, links: List[str], texts: List[str]) -> Optional[str]:
+    lines = block.split("\n")
+    for number, line in enumerate(lines, start=1):
+        if line[0:3] != f"{number}. ":
+            return render_paragraph(block, links, texts)
+    return render_list_items(lines, 3, "<ol>", "</ol>", links, texts)
+
+
+# Renderer of a block by its first character, the one block type it can be besides
+# a paragraph, see splitblocks.classify_block
+BLOCK_RENDERERS = {
+    "#": render_heading,
+    "`": render_code,
+    ">": render_quote,
+    "*": render_unordered_list,
+    "-": render_unordered_list,
+    "1": render_ordered_list,
+}
+
+
+def block_to_html(block: str) -> str:
+    """Convert a single markdown block into its html, as page_formatter.block_to_html.
+    A block the state machine can not render is rendered by page_formatter, which
+    raises the error of the block.
+    """
+    links: List[str] = []
+    texts: List[str] = []
+    html = BLOCK_RENDERERS.get(block[:1], render_paragraph)(block, links, texts)
+    if html is None:
+        return page_formatter.block_to_html(block)
+    add_links(links)
+    add_texts(texts)
+    return html
+
+
+def render_block(block: str, cache: Optional[BlockCache] = None) -> str:
+    if cache is None:
+        return block_to_html(block)
+    return page_formatter.block_to_cached_html(block, cache, render=block_to_html)
+
+
+def markdown_to_html_fragments(markdown: str, cache: Optional[BlockCache] = None) -> List[str]:
+    """Convert a full markdown document into the list of html fragments of its DIV,
+    see page_formatter.markdown_to_html_fragments
+    """
+    with stage("split_blocks"):
+        blocks = markdown_to_blocks(markdown)
+    if not blocks:
+        raise ValueError("ParentNode object must have children")
+
+    with stage("render_blocks"):
+        fragments = [render_block(block, cache) for block in blocks]
+
+    return ["<div>", *fragments, "</div>"]
+
+
+def iter_html_fragments(blocks: Iterable[str], cache: Optional[BlockCache] = None) -> Iterator[str]:
+    """Yield the html fragments of a document from its blocks, rendering each block
+    only when the previous fragment is consumed, see page_formatter.iter_html_fragments
+    """
+    blocks = iter(blocks)
+    first_block = next(blocks, None)
+    if first_block is None:
+        raise ValueError("ParentNode object must have children")
+
+    yield "<div>"
+    for block in chain([first_block], blocks):
+        with stage("render_blocks"):
+            html = render_block(block, cache)
+        yield html
+    yield "</div>"
+
+
+def markdown_to_html_node(markdown: Union[str, Iterable[str]], cache: Optional[BlockCache] = None) -> HTMLNode:
+    """Convert a full markdown document, or its blocks, into a DIV ParentNode with
+    the html of each block as a raw text LeafNode, as page_formatter.markdown_to_html_node
+    does with a block cache. Its html is the one of the reference tree.
+    """
+    if isinstance(markdown, str):
+        with stage("split_blocks"):
+            blocks = markdown_to_blocks(markdown)
+    else:
+        blocks = markdown
+
+    with stage("render_blocks"):
+        document_nodes: List[HTMLNode] = [LeafNode(None, value=render_block(block, cache)) for block in blocks]
+
+    return ParentNode(Tag.DIV, children=document_nodes)
+
+
+def markdown_to_html(markdown: str, cache: Optional[BlockCache] = None) -> str:
+    """Convert a full markdown document into html
+    """
+    return "".join(markdown_to_html_fragments(markdown, cache))
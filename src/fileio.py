@@ -0,0 +1,180 @@
+import contextlib
+import io
+import mmap
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, Iterator, Optional, TextIO, Tuple, Union
+
+
+IO_BACKENDS = ("sync", "threaded", "mmap")
+
+
+def temporary_path(path: Path) -> Path:
+    """Return the temporary file a file is written to before being moved in place
+    """
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def write_text_atomically(path: Path, text: str, written: Optional[Callable[[], None]] = None) -> None:
+    """Write a text to a temporary file moved in place, never leaving a partial file,
+    then call written if given
+    """
+    temporary = temporary_path(path)
+    try:
+        temporary.write_text(text)
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    if written is not None:
+        written()
+
+
+class SyncIO:
+    """File backend reading and writing with blocking calls in the calling thread
+    """
+
+    memory_mapped = False  # the markdown sources are read with read_text, see MappedIO
+
+    def prefetch(self, paths: Iterable[Path]) -> None:
+        """Nothing is read ahead"""
+
+    def read_text(self, path: Path) -> str:
+        return path.read_text()
+
+    @contextlib.contextmanager
+    def open_write(self, path: Path, written: Optional[Callable[[], None]] = None) -> Iterator[TextIO]:
+        """Open a file to write text in. The text goes to a temporary file moved in place
+        when closed, so that an error while writing, like a page failing to render while
+        it is streamed (see MappedIO), never leaves a partial file behind.
+        written, if given, is called once the file is in place.
+        """
+        temporary = temporary_path(path)
+        try:
+            with temporary.open("w") as stream:
+                yield stream
+            os.replace(temporary, path)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+        if written is not None:
+            written()
+
+    def flush(self) -> None:
+        """Everything is already written"""
+
+    def close(self) -> None:
+        """Nothing to release"""
+
+
+class ThreadedIO:
+    """File backend overlapping the filesystem latency with the parsing :
+    - the markdown sources given to prefetch are read ahead by a thread pool,
+      up to read_ahead files at a time
+    - the text written to open_write is kept in memory and written by the thread pool,
+      with at most max_pending writes waiting at a time
+    Write errors are raised by flush, with the path of the file.
+    """
+
+    memory_mapped = False
+
+    def __init__(self, threads: int = 8, read_ahead: int = 32, max_pending: int = 64):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="fileio")
+        self.read_ahead = read_ahead
+        self.max_pending = max_pending
+        self.to_prefetch: Deque[Path] = deque()
+        self.reads: Dict[Path, Future] = {}
+        self.writes: Deque[Tuple[Path, Future]] = deque()
+
+    def prefetch(self, paths: Iterable[Path]) -> None:
+        """Read the given files ahead, in the order they will be asked by read_text
+        """
+        self.to_prefetch.extend(paths)
+        self._fill_read_ahead()
+
+    def read_text(self, path: Path) -> str:
+        """Return the text of a file, already read if it was prefetched
+        """
+        future = self.reads.pop(path, None)
+        self._fill_read_ahead()
+        if future is None:
+            return path.read_text()
+        return future.result()
+
+    @contextlib.contextmanager
+    def open_write(self, path: Path, written: Optional[Callable[[], None]] = None) -> Iterator[TextIO]:
+        """Return an in memory stream, written to the file by the thread pool when closed,
+        through a temporary file as SyncIO.open_write.
+        written, if given, is called by the thread pool once the file is in place.
+        """
+        buffer = io.StringIO()
+        yield buffer
+        self.writes.append((path, self.executor.submit(write_text_atomically, path, buffer.getvalue(), written)))
+        while len(self.writes) > self.max_pending:
+            self._wait_write()
+
+    def flush(self) -> None:
+        """Wait for all the pending writes
+        """
+        while self.writes:
+            self._wait_write()
+
+    def close(self) -> None:
+        """Wait for all the pending writes and stop the thread pool
+        """
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    def _fill_read_ahead(self) -> None:
+        while self.to_prefetch and len(self.reads) < self.read_ahead:
+            path = self.to_prefetch.popleft()
+            self.reads[path] = self.executor.submit(path.read_text)
+
+    def _wait_write(self) -> None:
+        path, future = self.writes.popleft()
+        try:
+            future.result()
+        except OSError as error:
+            raise Exception(f"failed to write {path}: {error}") from error
+
+
+class MappedIO(SyncIO):
+    """File backend memory mapping the markdown sources instead of reading them,
+    so that a page is parsed block by block from the mapping (see splitblocks.iter_blocks)
+    and only the bytes being parsed are decoded and kept in memory.
+    The html is written with blocking calls, as it is rendered, to a temporary file
+    moved in place once the page is complete (see SyncIO.open_write).
+    """
+
+    memory_mapped = True
+
+    @contextlib.contextmanager
+    def open_mapping(self, path: Path) -> Iterator[Union[mmap.mmap, BinaryIO]]:
+        """Memory map a file to read it. An empty file, which can not be mapped,
+        is given as an empty bytes stream.
+        """
+        with path.open("rb") as file:
+            if path.stat().st_size == 0:
+                yield io.BytesIO()
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                yield mapping
+
+
+def make_io_backend(name: str, threads: int = 8):
+    """Return the file backend of the given name
+    """
+    match name:
+        case "sync":
+            return SyncIO()
+        case "threaded":
+            return ThreadedIO(threads=threads)
+        case "mmap":
+            return MappedIO()
+        case _:
+            raise ValueError(f"invalid io backend: {name}")
+
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, List
+from typing import Iterator, Optional, List, TextIO
 
 
 class Tag(Enum):
@@ -23,6 +23,9 @@ class Tag(Enum):
 
 
 class HTMLNode:
+    # No per instance __dict__: a page allocates a node per inline fragment
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag: Optional[Tag] = None, value: Optional[str] = None, 
                        children: Optional[List] = None, props: Optional[dict] = None):
         if tag is not None and not isinstance(tag, Tag):
@@ -37,6 +40,19 @@ class HTMLNode:
 
     def to_html(self):
         raise NotImplementedError
+
+    def iter_html(self) -> Iterator[str]:
+        """Yield the HTML of the node chunk by chunk
+        """
+        raise NotImplementedError
+
+    def write_html(self, stream: TextIO) -> None:
+        """Write the HTML of the node to a file object chunk by chunk,
+        without building the full HTML string in memory
+        """
+        write = stream.write
+        for chunk in self.iter_html():
+            write(chunk)
     
     def props_to_html(self):
         """ Transform the attributes in the props dictionary into a html readable attribute
@@ -51,6 +67,7 @@ class HTMLNode:
 class LeafNode(HTMLNode):
     """A LeafNode is a type of HTMLNode that represents a single HTML tag with no children.
     """
+    __slots__ = ()
 
     def __init__(self, tag: Tag | None, value: str, props: Optional[dict] = None):
         super().__init__(tag, value, None, props)
@@ -66,11 +83,17 @@ class LeafNode(HTMLNode):
 
         return f"<{self.tag.value if not self.props else self.tag.value + ' ' + self.props_to_html()}>{self.value}</{self.tag.value}>"
 
+    def iter_html(self) -> Iterator[str]:
+        """A LeafNode is rendered as a single chunk
+        """
+        yield self.to_html()
+
 
 class ParentNode(HTMLNode):
     """ParentNode class handle the nesting of HTML nodes inside of one another.
        Any HTML node that's not "leaf" node (i.e. it has children) is a "parent" node.
     """
+    __slots__ = ()
 
     def __init__(self, tag: Tag, children: List, props: Optional[dict] = None):
         super().__init__(tag, None, children, props)
@@ -78,13 +101,30 @@ class ParentNode(HTMLNode):
     def to_html(self):
         """Return the ParentNode and its children to a single concatenated HTML string
         """
+        return "".join(self.iter_html())
+
+    def iter_html(self) -> Iterator[str]:
+        """Yield the opening tag, the chunks of each child and the closing tag,
+        so that the text of the children is never copied into intermediate strings
+        """
         if not self.tag:
             raise ValueError("ParentNode object must have a tag")
 
         if not self.children:
             raise ValueError("ParentNode object must have children")
 
-        return f"{'<pre>' if self.tag==Tag.CODE else ''}<{self.tag.value}>{''.join([child.to_html() for child in self.children])}</{self.tag.value}>{'</pre>' if self.tag==Tag.CODE else ''}"
+        if self.tag == Tag.CODE:
+            yield f"<pre><{self.tag.value}>"
+        else:
+            yield f"<{self.tag.value}>"
+
+        for child in self.children:
+            yield from child.iter_html()
+
+        if self.tag == Tag.CODE:
+            yield f"</{self.tag.value}></pre>"
+        else:
+            yield f"</{self.tag.value}>"
 
 
         
@@ -0,0 +1,170 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class _ThreadStages(threading.local):
+    """The stages being recorded by a thread: the stack of the time spent in their
+    nested stages, and the stages of the page they are attributed to
+    """
+
+    def __init__(self):
+        self.children_time: List[float] = []
+        self.page: Optional[Dict[str, float]] = None
+
+
+class BuildProfiler:
+    """A BuildProfiler records the wall time and the number of calls of each stage
+    of a build, per page and in aggregate.
+    Stages can be nested : the time of a stage does not include the time of the
+    stages run inside of it, so that the times of all the stages add up.
+    Each thread has its own nested stages and page, the threads of the file backends
+    recording stages at the same time as the main one.
+    If trace is True, every stage is also kept as an event for a Chrome trace file.
+    """
+
+    def __init__(self, trace: bool = False):
+        self.trace = trace
+        self.totals: Dict[str, List[float]] = {}   # stage -> [seconds, calls]
+        self.pages: Dict[str, Dict[str, float]] = {}  # page -> stage -> seconds
+        self.events: List[dict] = []
+        self._threads = _ThreadStages()
+        self._lock = threading.Lock()  # of the records shared by the threads
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **details):
+        """Record the time spent in the body of the with statement as the given stage
+        """
+        children_time = self._threads.children_time
+        start = time.perf_counter()
+        children_time.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            own_time = elapsed - children_time.pop()
+            if children_time:
+                children_time[-1] += elapsed
+
+            page = self._threads.page
+            with self._lock:
+                total = self.totals.setdefault(name, [0.0, 0])
+                total[0] += own_time
+                total[1] += 1
+                if page is not None:
+                    page[name] = page.get(name, 0.0) + own_time
+                if self.trace:
+                    self.events.append({"name": name, "ph": "X", "ts": start * 1e6, "dur": elapsed * 1e6,
+                                        "pid": os.getpid(), "tid": threading.get_ident(), "args": details})
+
+    @contextlib.contextmanager
+    def page(self, page: str):
+        """Attribute the stages run in the body of the with statement to a page.
+        The time of the page outside of any stage (logging...) is recorded as the "page" stage.
+        """
+        with self._lock:
+            self._threads.page = self.pages.setdefault(page, {})
+        try:
+            with self.stage("page", page=page):
+                yield
+        finally:
+            self._threads.page = None
+
+    def page_time(self, page: str) -> float:
+        """Return the total time spent rendering a page
+        """
+        return sum(self.pages[page].values())
+
+    def slowest_pages(self, count: int) -> List[str]:
+        """Return the count pages that took the most time
+        """
+        return sorted(self.pages, key=self.page_time, reverse=True)[:count]
+
+    def drain(self) -> dict:
+        """Return the recorded timings and forget them,
+        to send the timings of a worker process to the main one
+        """
+        with self._lock:
+            data = {"totals": self.totals, "pages": self.pages, "events": self.events}
+            self.totals, self.pages, self.events = {}, {}, []
+        return data
+
+    def merge(self, data: dict) -> None:
+        """Add the timings returned by the drain of another profiler
+        """
+        with self._lock:
+            self._merge(data)
+
+    def _merge(self, data: dict) -> None:
+        for name, (seconds, calls) in data["totals"].items():
+            total = self.totals.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += calls
+        for page, stages in data["pages"].items():
+            page_stages = self.pages.setdefault(page, {})
+            for name, seconds in stages.items():
+                page_stages[name] = page_stages.get(name, 0.0) + seconds
+        self.events.extend(data["events"])
+
+    def report(self, slowest: int = 10) -> str:
+        """Return a text report of the time of each stage and the slowest pages
+        """
+        lines = [f"{'stage':<16}{'seconds':>12}{'calls':>10}"]
+        for name, (seconds, calls) in sorted(self.totals.items(), key=lambda item: -item[1][0]):
+            lines.append(f"{name:<16}{seconds:>12.4f}{calls:>10}")
+        if self.pages and slowest:
+            lines.append(f"\nslowest {slowest} pages:")
+            for page in self.slowest_pages(slowest):
+                stages = ", ".join(f"{name} {seconds:.4f}s" for name, seconds in
+                                   sorted(self.pages[page].items(), key=lambda item: -item[1]))
+                lines.append(f"{self.page_time(page):10.4f}s  {page} ({stages})")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Write the recorded stages in the Chrome trace format,
+        readable by chrome://tracing or https://ui.perfetto.dev
+        """
+        path.write_text(json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}))
+
+
+# Profiler of the current process, None when the instrumentation is disabled
+PROFILER: Optional[BuildProfiler] = None
+
+_DISABLED_STAGE = contextlib.nullcontext()
+
+
+def enable(trace: bool = False) -> BuildProfiler:
+    """Start recording the stages of the build in this process
+    """
+    global PROFILER
+    PROFILER = BuildProfiler(trace=trace)
+    return PROFILER
+
+
+def disable() -> None:
+    """Stop recording the stages of the build in this process
+    """
+    global PROFILER
+    PROFILER = None
+
+
+def stage(name: str):
+    """Return a context manager recording a stage, doing nothing
+    when the instrumentation is disabled
+    """
+    if PROFILER is None:
+        return _DISABLED_STAGE
+    return PROFILER.stage(name)
+
+
+def page(name: str):
+    """Return a context manager attributing the stages to a page, doing nothing
+    when the instrumentation is disabled
+    """
+    if PROFILER is None:
+        return _DISABLED_STAGE
+    return PROFILER.page(name)
@@ -0,0 +1,116 @@
+import contextlib
+import os
+import posixpath
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlsplit
+
+
+# urls of the links and images rendered by each thread inside collect_links, None outside of it
+RENDERED_LINKS = threading.local()
+
+
+def rendered_links() -> Optional[List[str]]:
+    return getattr(RENDERED_LINKS, "urls", None)
+
+
+@contextlib.contextmanager
+def collect_links() -> Iterator[List[str]]:
+    """Collect the urls of the links and images rendered by page_formatter in the current
+    thread into a list. The urls collected by a nested collect_links are not added to
+    the outer list, see add_links.
+    """
+    previous = rendered_links()
+    RENDERED_LINKS.urls = urls = []
+    try:
+        yield urls
+    finally:
+        RENDERED_LINKS.urls = previous
+
+
+def add_link(url: str) -> None:
+    """Add the url of a rendered link or image to the current collection, if any
+    """
+    urls = rendered_links()
+    if urls is not None:
+        urls.append(url)
+
+
+def add_links(urls: Iterable[str]) -> None:
+    """Add urls to the current collection, if any
+    """
+    collected = rendered_links()
+    if collected is not None:
+        collected.extend(urls)
+
+
+class LinkIndex:
+    """A LinkIndex keeps the urls of the links and images of every html document of a site,
+    to report the ones pointing to a file that does not exist in the generated site.
+    External urls (with a scheme, like https: or mailto:, or starting with //)
+    and links to an anchor of the same page are not checked.
+    """
+
+    def __init__(self):
+        self.pages: Dict[Path, List[str]] = {}  # html document -> urls of its links and images
+
+    def add(self, page: Path, urls: Iterable[str]) -> None:
+        self.pages[page] = list(urls)
+
+    def links_count(self) -> int:
+        return sum(len(urls) for urls in self.pages.values())
+
+    def dangling(self, public_dir: Path) -> List[Tuple[Path, str]]:
+        """Return the (html document, url) pairs whose target is not in the public directory.
+        A target is resolved once per directory and url, so that each link
+        costs a single dictionary lookup.
+        """
+        files = site_files(public_dir)
+        resolved: Dict[Tuple[str, str], bool] = {}
+        dangling = []
+        for page, urls in self.pages.items():
+            directory = page.parent.relative_to(public_dir).as_posix()
+            for url in urls:
+                key = (directory, url)
+                exists = resolved.get(key)
+                if exists is None:
+                    target = resolve_url(url, directory)
+                    exists = target is None or target in files or index_file(target) in files
+                    resolved[key] = exists
+                if not exists:
+                    dangling.append((page, url))
+        return dangling
+
+
+def resolve_url(url: str, directory: str) -> Optional[str]:
+    """Return the path relative to the site root targeted by a url found in a document
+    of the given directory ("." for the root), or None if the url is not checked.
+    Paths going above the root are returned with their leading "..".
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None  # external url, or anchor / query of the same page
+    path = unquote(parts.path)
+    if path.startswith("/"):
+        path = path.lstrip("/") or "."
+    else:
+        path = posixpath.join(directory, path)
+    return posixpath.normpath(path)
+
+
+def index_file(target: str) -> str:
+    """Return the path of the document served for a directory url
+    """
+    return "index.html" if target == "." else f"{target}/index.html"
+
+
+def site_files(public_dir: Path) -> Set[str]:
+    """Return the paths relative to the public directory of all its files
+    """
+    files = set()
+    for directory, _, names in os.walk(public_dir):
+        relative_directory = Path(directory).relative_to(public_dir)
+        for name in names:
+            files.add((relative_directory / name).as_posix())
+    return files
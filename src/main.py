@@ -1,8 +1,33 @@
+import argparse
+import contextlib
+import cProfile
 import logging
+import os
 import shutil
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
-from page_formatter import extract_title, markdown_to_html_node
+import buildlog
+import instrumentation
+from assetsync import SYNC_MODES, sync_assets, transfer_file
+from blockcache import BlockCache
+from buildgraph import BuildGraph, page_outputs, run_concurrently
+from buildlog import in_phase, log_file_event, phase
+from compress import COMPRESSION_FORMATS, Compressor, TeeWriter, remove_compressed, remove_orphan_siblings
+from fileio import IO_BACKENDS, SyncIO, make_io_backend
+from htmlnode import HTMLNode
+from linkindex import LinkIndex, collect_links
+from manifest import Manifest, hash_file
+from page_formatter import extract_title, parser_version
+from parsers import PARSER_BACKENDS, ReferenceParser, make_parser_backend
+from searchindex import SEARCH_DIR_NAME, SearchIndex, collect_text
+from shard import SHARDS_DIR_NAME, in_shard, merge_shards, parse_shard, shard_manifest_path, shard_of
+from splitblocks import iter_blocks
+from template import load_template
+from treecache import TreeCache, cached_markdown_to_html_fragments, cached_markdown_to_html_node
+from treescan import TreeInventory, scan_tree
 
 
 BASE_DIR = Path(__file__).parent.parent.resolve()
@@ -12,46 +37,349 @@ CONTENT_DIR = BASE_DIR / "content"
 
 TEMPLATE_PATH = BASE_DIR / "template.html"
 LOG_PATH = BASE_DIR / "logs.txt"
-
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    filename=LOG_PATH,
-                    filemode="w")
+CACHE_DIR = BASE_DIR / ".cache"
+MANIFEST_NAME = "manifest.json"
+BLOCK_CACHE_NAME = "blocks.sqlite3"
+TREE_CACHE_NAME = "trees"
+SEARCH_STATE_NAME = "search.json"
 
 LOGGER = logging.getLogger(__name__)
 
 
-def main():
-    copy_content(source=STATIC_DIR, destination=PUBLIC_DIR)
-    generate_pages_recursive(dir_path_content=CONTENT_DIR, 
-                             template_path=TEMPLATE_PATH, 
-                             dest_dir_path=PUBLIC_DIR)
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    configure_logging(use_queue=args.log_queue, summary_only=args.log_summary)
+    try:
+        run(args)
+    finally:
+        buildlog.close()  # write the records left in the queue
 
 
-def copy_content(source: Path, destination:Path) -> None:
-    """ Copy and write all content from a source directory 
-        to a destination directory recursively
+def run(args: argparse.Namespace) -> None:
+    """ Build the site, or merge the shards of a build, as told by the command line options
     """
-    if not source.exists():
-        raise Exception(f"Not found: source directory {source}")
-    
-    delete_content(destination)
+    profiler = None
+    if args.profile or args.trace:
+        profiler = instrumentation.enable(trace=args.trace is not None)
+    c_profiler = cProfile.Profile() if args.cprofile else None
 
-    for content in source.iterdir():
+    if c_profiler is not None:
+        c_profiler.enable()
+    if args.merge_shards:
+        link_index = merge_build(args, content_dir=CONTENT_DIR, static_dir=STATIC_DIR,
+                                 public_dir=PUBLIC_DIR, cache_dir=CACHE_DIR)
+    else:
+        link_index = build(args, content_dir=CONTENT_DIR, static_dir=STATIC_DIR,
+                           template_path=TEMPLATE_PATH, public_dir=PUBLIC_DIR, cache_dir=CACHE_DIR)
+    if c_profiler is not None:
+        c_profiler.disable()
+        c_profiler.dump_stats(args.cprofile)
 
-        if content.is_file():
-            new_destination = destination / content.name
-            shutil.copy(src=content, dst=new_destination)
-            LOGGER.info(f"FILE COPIED : FROM {content} -> TO {new_destination}")
+    if profiler is not None:
+        print(profiler.report(slowest=args.slowest))
+        if args.trace:
+            profiler.write_chrome_trace(args.trace)
+    if link_index is not None:
+        report_broken_links(link_index, PUBLIC_DIR)
 
-        elif content.is_dir():
-            new_destination = destination / content.name
-            new_destination.mkdir(exist_ok=True)
-            LOGGER.info(f"DIRECTORY COPIED : FROM {content} -> TO {new_destination}")
-            copy_content(source=content, destination=new_destination)
 
-        else:
-            raise Exception(f"invalid content: {content}")
+def build(args: argparse.Namespace, content_dir: Path, static_dir: Path,
+          template_path: Path, public_dir: Path, cache_dir: Path) -> Optional[LinkIndex]:
+    """ Build a site with the command line options given in args.
+    Takes as input :
+    - content_dir: path of the markdown content directory
+    - static_dir: path of the static files directory
+    - template_path: html template used to create the html documents
+    - public_dir: path of the generated site
+    - cache_dir: path of the files kept between builds
+    Return the index of the links of the site with --check-links, None otherwise
+    """
+    public_dir.mkdir(exist_ok=True)
+    buildlog.SUMMARY.reset()
+    parser = make_parser_backend(args.parser)
+
+    block_cache = None
+    if args.block_cache:
+        block_cache = BlockCache(max_entries=args.block_cache, 
+                                 path=cache_dir / BLOCK_CACHE_NAME if args.persistent_block_cache else None,
+                                 version=parser_version())
+    tree_cache = None
+    if args.tree_cache:
+        # the trees of the fast parser only have the html of their blocks, see parsers.FastParser
+        tree_cache = TreeCache(cache_dir / TREE_CACHE_NAME, version=f"{parser_version()}-{parser.name}")
+        tree_cache.remove_other_versions()
+    file_io = make_io_backend(args.io, threads=args.io_threads)
+    link_index = LinkIndex() if args.check_links else None
+    search_index = None
+    if args.search_index:
+        state_path = cache_dir / SEARCH_STATE_NAME
+        search_index = SearchIndex.load(state_path) if args.incremental else SearchIndex(state_path)
+    compressor = None
+    if args.compress:
+        compressor = Compressor(formats=args.compress, min_size=args.compress_min_size,
+                                threads=args.compress_threads)
+
+    if args.incremental or args.shard:
+        manifest_path = cache_dir / MANIFEST_NAME
+        if args.shard:
+            manifest_path = shard_manifest_path(cache_dir, args.shard)
+        build_incremental(content_dir=content_dir, static_dir=static_dir,
+                          template_path=template_path, public_dir=public_dir,
+                          manifest_path=manifest_path, jobs=args.jobs,
+                          block_cache=block_cache, asset_mode=args.asset_mode,
+                          hash_assets=args.hash_assets, file_io=file_io,
+                          link_index=link_index, tree_cache=tree_cache, shard=args.shard,
+                          search_index=search_index, compressor=compressor, parser=parser)
+    else:
+        if not static_dir.exists():
+            raise Exception(f"Not found: source directory {static_dir}")
+        with phase("scan"):
+            graph = BuildGraph.scan(content_dir=content_dir, static_dir=static_dir,
+                                    template_path=template_path, public_dir=public_dir)
+        with phase("clean"):
+            delete_content(public_dir)
+            remove_manifests(cache_dir)
+        graph.execute(graph.full_plan(),
+                      render_pages=in_phase("pages", lambda pages: render_pages(
+                          pages, template_path, args.jobs, block_cache, file_io, link_index, tree_cache,
+                          search_index, compressor, parser)),
+                      copy_assets=in_phase("assets", lambda assets: copy_assets(assets, compressor)))
+        if tree_cache is not None:  # every page was rendered: the other trees are of sources gone or changed
+            LOGGER.info(f"TREE CACHE : {tree_cache.remove_unused()} unused trees removed")
+
+    file_io.close()
+    if block_cache is not None:
+        LOGGER.info(f"BLOCK CACHE : {block_cache.hits} hits, {block_cache.misses} misses")
+        block_cache.close()
+    if tree_cache is not None:
+        LOGGER.info(f"TREE CACHE : {tree_cache.hits} hits, {tree_cache.misses} misses")
+    if search_index is not None:
+        with phase("search index"):
+            written_shards = search_index.write(public_dir)
+        LOGGER.info(f"SEARCH INDEX : {len(search_index.documents)} documents, "
+                    f"{len(written_shards)} shards written")
+        if compressor is not None:
+            remove_orphan_siblings(public_dir / SEARCH_DIR_NAME)  # shards left without terms
+            for path in sorted((public_dir / SEARCH_DIR_NAME).rglob("*.json")):
+                compressor.compress_file(path, changed=False)
+    if compressor is not None:
+        with phase("compress"):  # the compressions left once the pages and files are written
+            compressor.close()
+        LOGGER.info(f"COMPRESSED FILES : {compressor.counts['compressed']} compressed, "
+                    f"{compressor.counts['unchanged']} unchanged, {compressor.counts['skipped']} skipped")
+    buildlog.log_summary(LOGGER)
+    if args.shard:
+        return None  # a shard only has a slice of the site, its links are checked by the merge
+    return link_index
+
+
+def merge_build(args: argparse.Namespace, content_dir: Path, static_dir: Path,
+                public_dir: Path, cache_dir: Path) -> Optional[LinkIndex]:
+    """ Merge the manifests of the --merge-shards N shards of a build into the manifest
+    of the site, after checking that they built the whole site (see shard.merge_shards).
+    Return the index of the links recorded by the shards with --check-links, None otherwise.
+    Raise an Exception if a page of a shard built without --check-links has no recorded links.
+    """
+    manifest = merge_shards(content_dir=content_dir, static_dir=static_dir, public_dir=public_dir,
+                            cache_dir=cache_dir, count=args.merge_shards,
+                            manifest_path=cache_dir / MANIFEST_NAME)
+    LOGGER.info(f"SHARDS MERGED : {len(manifest.pages)} pages, {len(manifest.assets)} static files")
+    if not args.check_links:
+        return None
+    unchecked = [source for source, entry in manifest.pages.items() if "links" not in entry]
+    if unchecked:
+        raise Exception(f"links not recorded for {len(unchecked)} pages, build the shards with --check-links "
+                        f"to check the links of the site:\n" + "\n".join(unchecked))
+    link_index = LinkIndex()
+    for entry in manifest.pages.values():
+        link_index.add(Path(entry["output"]), entry["links"])
+    return link_index
+
+
+def report_broken_links(link_index: LinkIndex, public_dir: Path) -> None:
+    """Log every link or image of the site whose target is not in the public directory,
+    and print their count
+    """
+    broken_links = link_index.dangling(public_dir)
+    for page, url in broken_links:
+        LOGGER.warning(f"BROKEN LINK : {page} -> {url}")
+    print(f"{len(broken_links)} broken links out of {link_index.links_count()} links "
+          f"in {len(link_index.pages)} pages")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """ Parse the command line options of the generator
+    """
+    parser = argparse.ArgumentParser(description="Generate the static site in public/")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only render pages whose markdown or template changed since the last build")
+    parser.add_argument("--asset-mode", choices=SYNC_MODES, default="copy",
+                        help="how --incremental puts new or changed static files in public/")
+    parser.add_argument("--hash-assets", action="store_true",
+                        help="with --incremental, compare the content of static files whose mtime changed")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="number of processes rendering the pages (0 uses all the cpus)")
+    parser.add_argument("--io", choices=IO_BACKENDS, default="sync",
+                        help="file backend of the pages: sync reads and writes in turn, "
+                             "threaded prefetches the markdown and writes the html in threads, "
+                             "mmap parses the markdown block by block from a memory mapping")
+    parser.add_argument("--io-threads", type=int, default=8, metavar="N",
+                        help="number of threads of the threaded file backend")
+    parser.add_argument("--parser", choices=PARSER_BACKENDS, default="reference",
+                        help="markdown parser: reference splits the inline text into TextNodes, "
+                             "fast renders it to html with a table driven state machine, "
+                             "both giving the same html")
+    parser.add_argument("--tree-cache", action="store_true",
+                        help="store the parsed tree of each page in .cache/trees and load it "
+                             "instead of parsing the page again while its markdown and the parser are unchanged")
+    parser.add_argument("--check-links", action="store_true",
+                        help="index the links and images of the pages and report the ones "
+                             "whose target is not in the generated site")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="only build the slice i of N of the pages and static files, "
+                             "without emptying public/, to build a site with N processes or machines")
+    parser.add_argument("--merge-shards", type=int, default=0, metavar="N",
+                        help="check that N --shard builds produced the whole site "
+                             "and merge their manifests into .cache/manifest.json")
+    parser.add_argument("--search-index", action="store_true",
+                        help="index the text of the pages for a client side search in public/search, "
+                             "sharded by term prefix and only updated for the changed pages with --incremental")
+    parser.add_argument("--compress", action="append", choices=sorted(COMPRESSION_FORMATS), metavar="FORMAT",
+                        help="write a compressed sibling of each page and static file, e.g. index.html.gz, "
+                             f"in one of {', '.join(sorted(COMPRESSION_FORMATS))} (repeat for several formats)")
+    parser.add_argument("--compress-min-size", type=int, default=1024, metavar="BYTES",
+                        help="do not compress the files smaller than BYTES")
+    parser.add_argument("--compress-threads", type=int, default=4, metavar="N",
+                        help="number of threads compressing the files")
+    parser.add_argument("--block-cache", type=int, default=0, metavar="N",
+                        help="cache the html of up to N markdown blocks in memory (0 disables the cache)")
+    parser.add_argument("--persistent-block-cache", action="store_true",
+                        help="also store the cached blocks in .cache/ between builds (ignored by --jobs workers)")
+    parser.add_argument("--log-queue", action="store_true",
+                        help="put the log records in a queue written to logs.txt by a background thread")
+    parser.add_argument("--log-summary", action="store_true",
+                        help="only log the time and the count of files of each phase of the build, "
+                             "instead of one line per file")
+    parser.add_argument("--profile", action="store_true",
+                        help="record the time of each build stage and print a report at the end")
+    parser.add_argument("--slowest", type=int, default=10, metavar="N",
+                        help="number of slowest pages listed in the --profile report")
+    parser.add_argument("--trace", type=Path, metavar="FILE",
+                        help="write the build stages to FILE in the Chrome trace format (implies --profile)")
+    parser.add_argument("--cprofile", type=Path, metavar="FILE",
+                        help="run the build under cProfile and write the stats to FILE (main process only)")
+    args = parser.parse_args(argv)
+    if args.search_index and args.shard:
+        parser.error("--search-index can not be combined with --shard")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+def configure_logging(log_path: Path = LOG_PATH, use_queue: bool = False, summary_only: bool = False) -> None:
+    """ Send the build logs to the log file, overwritten at each build,
+    from a background thread with use_queue, and only the summary of each phase
+    of the build with summary_only (see buildlog.configure)
+    """
+    buildlog.configure(log_path, use_queue=use_queue, summary_only=summary_only)
+
+
+def build_incremental(content_dir: Path, static_dir: Path, template_path: Path,
+                      public_dir: Path, manifest_path: Path, jobs: int = 1,
+                      block_cache: Optional[BlockCache] = None, asset_mode: str = "copy",
+                      hash_assets: bool = False, file_io=None,
+                      link_index: Optional[LinkIndex] = None,
+                      tree_cache: Optional[TreeCache] = None,
+                      shard: Optional[Tuple[int, int]] = None,
+                      search_index: Optional[SearchIndex] = None,
+                      compressor: Optional[Compressor] = None,
+                      parser: Optional[ReferenceParser] = None) -> None:
+    """ Build the site without wiping the public directory.
+    Only the new or changed static files are copied or linked (see assetsync.sync_assets),
+    in a thread of their own while the pages are rendered,
+    pages are only rendered when their markdown or the template changed, and the
+    documents and static files whose source disappeared are deleted.
+    The links of the skipped pages are taken from the manifest.
+    With a shard (index, count), only the pages and static files of the shard are built,
+    and the manifest only records them.
+    The inventories of the content and static directories are saved with the manifest
+    (see treescan.TreeInventory): the markdown documents left unchanged since the previous
+    build are not read again to be hashed, their hash is taken from the manifest.
+    """
+    manifest = Manifest.load(manifest_path)
+    previous_assets = manifest.assets
+    content_inventory_path, static_inventory_path = inventory_paths(manifest_path)
+    with phase("scan"):
+        content_inventory, static_inventory = run_concurrently(
+            lambda: scan_tree(content_dir, TreeInventory.load(content_inventory_path, content_dir)),
+            lambda: scan_tree(static_dir, TreeInventory.load(static_inventory_path, static_dir)))
+    pages = page_outputs(content_dir, content_inventory)
+    for output in pages.keys() & set(previous_assets):
+        # a static file synchronised before its page existed: the page is rendered again,
+        # in a new file not to write through a hard link to the static directory
+        manifest.pages.pop(str(pages[output]), None)
+        (public_dir / output).unlink(missing_ok=True)
+    _, (summary, manifest.assets) = run_concurrently(
+        in_phase("pages", lambda: generate_pages_recursive(dir_path_content=content_dir,
+                                         template_path=template_path,
+                                         dest_dir_path=public_dir,
+                                         manifest=manifest,
+                                         jobs=jobs,
+                                         block_cache=block_cache,
+                                         file_io=file_io,
+                                         link_index=link_index,
+                                         tree_cache=tree_cache,
+                                         shard=shard,
+                                         search_index=search_index,
+                                         compressor=compressor,
+                                         inventory=content_inventory,
+                                         parser=parser)),
+        in_phase("assets", lambda: sync_assets(source=static_dir, destination=public_dir,
+                            previous_assets=previous_assets,
+                            mode=asset_mode, use_hash=hash_assets,
+                            include=(lambda asset: shard_of(asset, shard[1]) == shard[0]) if shard else None,
+                            compressor=compressor,
+                            inventory=static_inventory,
+                            page_outputs=pages.keys())))
+    LOGGER.info(f"ASSETS SYNCED : {summary}")
+    with phase("orphans"):
+        for html_file in manifest.remove_orphans():
+            log_file_event(LOGGER, "FILE DELETED", html_file)
+            remove_compressed(html_file)
+    manifest.save()
+    content_inventory.save(content_inventory_path)  # with the hashes of the manifest they vouch for
+    static_inventory.save(static_inventory_path)
+
+
+def remove_manifests(cache_dir: Path) -> None:
+    """ Delete the manifests of the incremental and sharded builds and their inventories.
+    A full build empties the public directory: the pages they record as up to date
+    may be rendered from other sources by then.
+    """
+    manifest_path = cache_dir / MANIFEST_NAME
+    for path in (manifest_path, *inventory_paths(manifest_path)):
+        path.unlink(missing_ok=True)
+    shutil.rmtree(cache_dir / SHARDS_DIR_NAME, ignore_errors=True)
+
+
+def inventory_paths(manifest_path: Path) -> Tuple[Path, Path]:
+    """Return the paths of the inventories of the content and static directories
+    saved with a manifest
+    """
+    return (manifest_path.with_name(f"{manifest_path.stem}-content.inventory.json"),
+            manifest_path.with_name(f"{manifest_path.stem}-static.inventory.json"))
+
+
+def copy_assets(assets: List[Tuple[Path, Path]], compressor: Optional[Compressor] = None) -> None:
+    """ Copy each (static file, destination file) pair, the destination directories existing,
+    and write the compressed siblings of the copies if a compressor is given.
+    The copies keep the mtime of their static file, that the next --incremental compares.
+    """
+    for asset, destination in assets:
+        transfer_file(asset, destination, mode="copy")
+        log_file_event(LOGGER, "FILE COPIED", asset, destination)
+        if compressor is not None:
+            compressor.compress_file(destination)
 
 
 def delete_content(destination:Path) -> None:
@@ -60,65 +388,342 @@ def delete_content(destination:Path) -> None:
     if not destination.exists():
         raise Exception(f"Not found: destination directory {destination}")
 
-    for content in destination.iterdir():
-        if content.is_file():
-            content.unlink()
-            LOGGER.info(f"FILE DELETED : {content}")
-        elif content.is_dir():
-            shutil.rmtree(content)
-            LOGGER.info(f"DIRECTORY DELETED : {content}")
+    with os.scandir(destination) as entries:  # the type of the entries without a stat call
+        for entry in entries:
+            content = Path(entry.path)
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(content)
+                log_file_event(LOGGER, "DIRECTORY DELETED", content)
+            else:
+                content.unlink()
+                log_file_event(LOGGER, "FILE DELETED", content)
 
 
-def generate_page(from_path: Path, template_path: Path, dest_path: Path) -> None:
+def generate_page(from_path: Path, template_path: Path, dest_path: Path,
+                  block_cache: Optional[BlockCache] = None, file_io=None,
+                  transform: Optional[Callable[[HTMLNode], HTMLNode]] = None,
+                  link_index: Optional[LinkIndex] = None,
+                  tree_cache: Optional[TreeCache] = None,
+                  search_index: Optional[SearchIndex] = None,
+                  compressor: Optional[Compressor] = None,
+                  parser: Optional[ReferenceParser] = None) -> None:
     """ Create a html document from a markdown document.
     Takes as input : 
     - from_path: path of the markdown document
     - template_path: html template used to create the html document
     - dest_path: path of the newly created html document
+    - block_cache: optional cache of the html of the markdown blocks
+    - file_io: backend reading the markdown and writing the html (see fileio),
+      synchronous by default. With a memory mapped backend, the markdown is parsed
+      block by block from the mapping while the html is written.
+    - transform: optional function changing the HTMLNode tree of the page before
+      it is written. The tree is only built when a transform is given, otherwise
+      the html is rendered straight from the markdown.
+    - link_index: if given, the urls of the links and images of the page are added to it
+    - tree_cache: if given, the tree of the page is loaded from it instead of parsing
+      the markdown, or stored in it once parsed, and the html is rendered from the tree.
+      The HTMLNodes of the tree are only built for a transform.
+    - search_index: if given, the text of the page, as parsed by text_to_textnodes,
+      is added to it with its title
+    - compressor: if given, the html written is kept in memory and given to it
+      to write the compressed siblings of the document
+    - parser: backend turning the markdown into html (see parsers), the reference one by default
     """
-    LOGGER.info(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    md_content = from_path.read_text()
-    template_content = template_path.read_text()
+    if file_io is None:
+        file_io = SyncIO()
+    if parser is None:
+        parser = ReferenceParser()
 
-    title = extract_title(md_content)
-    title_placeholder = "{{ Title }}"
-    html_content = markdown_to_html_node(md_content).to_html()
-    content_placeholder = "{{ Content }}"
+    with instrumentation.page(str(from_path)), contextlib.ExitStack() as stack:
+        if link_index is not None:
+            links = stack.enter_context(collect_links())
+        if search_index is not None:
+            texts = stack.enter_context(collect_text())
+        if buildlog.LOG_FILES:
+            LOGGER.info(f"Generating page from {from_path} to {dest_path} using {template_path}")
+        with instrumentation.stage("read"):
+            if file_io.memory_mapped:
+                md_content = stack.enter_context(file_io.open_mapping(from_path))
+            else:
+                md_content = file_io.read_text(from_path)
+        with instrumentation.stage("template"):
+            template = load_template(template_path)
 
-    full_html_page = template_content.replace(title_placeholder, title) \
-                                     .replace(content_placeholder, html_content)
-    
-    html_file = dest_path / f"{from_path.stem}.html" # defined path of document
-    html_file.touch                                  # create document
-    html_file.write_text(full_html_page)             # add content
-    LOGGER.info(f"FILE CREATED : {html_file}")
+        with instrumentation.stage("title"):
+            title = extract_title(md_content)
+        if tree_cache is not None:
+            with instrumentation.stage("tree_cache"):
+                if transform is None:
+                    content = cached_markdown_to_html_fragments(md_content, tree_cache, block_cache, parser)
+                else:
+                    content = transform(cached_markdown_to_html_node(md_content, tree_cache, block_cache, parser))
+        elif file_io.memory_mapped:
+            blocks = iter_blocks(md_content)
+            if transform is None:
+                content = parser.iter_html_fragments(blocks, cache=block_cache)
+            else:
+                content = transform(parser.markdown_to_html_node(blocks, cache=block_cache))
+        elif transform is None:
+            content = parser.markdown_to_html_fragments(md_content, cache=block_cache)
+        else:
+            content = transform(parser.markdown_to_html_node(md_content, cache=block_cache))
+        
+        html_file = page_path(from_path, dest_path)      # defined path of document
+        written = None
+        if compressor is not None:
+            # compressed once written, the siblings being newer than the document (see Compressor.is_up_to_date)
+            written = lambda: compressor.compress_text(html_file, stream.getvalue())
+        with instrumentation.stage("write"):
+            with file_io.open_write(html_file, written=written) as stream:  # create document
+                if compressor is not None:
+                    stream = TeeWriter(stream)
+                with instrumentation.stage("serialize"):
+                    template.write(stream, {"Title": title, "Content": content})
+        log_file_event(LOGGER, "FILE CREATED", html_file)
+        if link_index is not None:
+            link_index.add(html_file, links)
+        if search_index is not None:
+            search_index.add(html_file, title, "\n".join(texts))
 
 
-def generate_pages_recursive(dir_path_content: Path, template_path: Path, dest_dir_path: Path) -> None:
+def page_path(from_path: Path, dest_path: Path) -> Path:
+    """ Return the path of the html document generated from a markdown document
+    """
+    return dest_path / f"{from_path.stem}.html"
+
+
+def generate_pages_recursive(dir_path_content: Path, template_path: Path, dest_dir_path: Path,
+                             manifest: Optional[Manifest] = None, jobs: int = 1,
+                             block_cache: Optional[BlockCache] = None, file_io=None,
+                             link_index: Optional[LinkIndex] = None,
+                             tree_cache: Optional[TreeCache] = None,
+                             shard: Optional[Tuple[int, int]] = None,
+                             search_index: Optional[SearchIndex] = None,
+                             compressor: Optional[Compressor] = None,
+                             inventory: Optional[TreeInventory] = None,
+                             parser: Optional[ReferenceParser] = None) -> None:
     """Generate all html documents from directory tree containing markdown files.
     Takes as input : 
     - dir_path_content: path of markdown content directory
     - template_path: html template used to create the html documents
     - dest_dir_path: path of the newly created html documents
+    - manifest: if given, pages already up to date in the manifest are skipped
+      and the newly generated pages are recorded in it
+    - jobs: number of processes rendering the pages in parallel
+    - block_cache: optional cache of the html of the markdown blocks
+    - file_io: backend reading the markdown and writing the html (see fileio)
+    - link_index: if given, the urls of the links and images of every page are added to it.
+      With a manifest, they are recorded in it for the pages to skip in the next builds,
+      and the pages without recorded links are rendered again.
+    - tree_cache: optional cache of the parsed trees of the pages
+    - shard: if given as (index, count), only the markdown documents of this shard
+      are generated, see shard.shard_of
+    - search_index: if given, the text of every page is indexed in it.
+      With a manifest, the pages missing from the index, or indexed from another version
+      of their markdown (e.g. changed by a build without the index), are rendered again.
+    - compressor: if given, the compressed siblings of the generated documents are written,
+      and the ones of the skipped documents if they are missing or older
+    - inventory: inventory of the content directory, scanned if not given. With a manifest,
+      the hash of the markdown documents it finds unchanged is taken from the manifest
+    - parser: backend turning the markdown into html (see parsers), the reference one by default
     """
-    for content in dir_path_content.iterdir():
-        
-        if content.is_file():
-            generate_page(from_path=content, template_path=template_path, 
-                          dest_path=dest_dir_path)
+    pages = collect_pages(dir_path_content, dest_dir_path, inventory)
+    if shard is not None:
+        pages = [(from_path, dest_path) for from_path, dest_path in pages
+                 if in_shard(from_path, dir_path_content, shard)]
+
+    if manifest is None:
+        render_pages(pages, template_path, jobs, block_cache, file_io, link_index, tree_cache, search_index,
+                     compressor, parser)
+        return
+
+    template_hash = hash_file(template_path)
+    outdated_pages = []
+    hashes = {}
+    for from_path, dest_path in pages:
+        entry = manifest.pages.get(str(from_path))
+        if inventory is not None and entry is not None and inventory.is_unchanged(from_path):
+            content_hash = entry["hash"]
+        else:
+            content_hash = hash_file(from_path)
+        html_file = page_path(from_path, dest_path)
+        if (manifest.is_up_to_date(from_path, content_hash, template_hash, html_file)
+                and (link_index is None or manifest.links(from_path) is not None)
+                and (search_index is None or search_index.keep(html_file, content_hash))):
+            log_file_event(LOGGER, "FILE UP TO DATE", html_file)
+            if link_index is not None:
+                link_index.add(html_file, manifest.links(from_path))
+            if compressor is not None:
+                compressor.compress_file(html_file, changed=False)
+            continue
+        outdated_pages.append((from_path, dest_path))
+        hashes[from_path] = content_hash
+
+    render_pages(outdated_pages, template_path, jobs, block_cache, file_io, link_index, tree_cache,
+                 search_index, compressor, parser)
+
+    for from_path, dest_path in outdated_pages:
+        html_file = page_path(from_path, dest_path)
+        links = link_index.pages[html_file] if link_index is not None else None
+        manifest.record(from_path, hashes[from_path], template_hash, html_file, links)
+        if search_index is not None:
+            search_index.set_source_hash(html_file, hashes[from_path])
+
+
+def collect_pages(dir_path_content: Path, dest_dir_path: Path,
+                  inventory: Optional[TreeInventory] = None) -> List[Tuple[Path, Path]]:
+    """Walk a directory tree containing markdown files, create the matching
+    destination directories and return a list of (markdown path, destination directory) pairs,
+    in the order of the paths. The tree is given by its inventory, scanned if not given.
+    """
+    if inventory is None:
+        if not dir_path_content.exists():
+            raise Exception(f"Not found: content directory {dir_path_content}")
+        inventory = scan_tree(dir_path_content)
 
-        elif content.is_dir():
+    pages = []
+    for directory, (_, _, names) in inventory.directories.items():
+        new_dest_dir_path = dest_dir_path / directory
+        if directory != ".":
             # Create destination directory
-            new_dest_dir_path = dest_dir_path / content.name
             new_dest_dir_path.mkdir(exist_ok=True)
-            LOGGER.info(f"DIRECTORY CREATED : FROM {content} -> TO {new_dest_dir_path}")
-            # Generate pages in new directory
-            generate_pages_recursive(dir_path_content=content, 
-                                     template_path=template_path,
-                                     dest_dir_path=new_dest_dir_path)
+            log_file_event(LOGGER, "DIRECTORY CREATED", dir_path_content / directory, new_dest_dir_path)
+        pages.extend((dir_path_content / directory / name, new_dest_dir_path) for name in names)
 
-        else:
-            raise Exception(f"invalid content: {content}")
+    return pages
+
+
+def render_pages(pages: List[Tuple[Path, Path]], template_path: Path, jobs: int = 1,
+                 block_cache: Optional[BlockCache] = None, file_io=None,
+                 link_index: Optional[LinkIndex] = None,
+                 tree_cache: Optional[TreeCache] = None,
+                 search_index: Optional[SearchIndex] = None,
+                 compressor: Optional[Compressor] = None,
+                 parser: Optional[ReferenceParser] = None) -> None:
+    """Generate the html document of each (markdown path, destination directory) pair.
+    With one job, the markdown documents are prefetched and the html documents written
+    by the file backend, and all the writes are done when it returns.
+    With more than one job, the pages are rendered by a pool of processes,
+    each with its own in memory block cache and synchronous file access,
+    or memory mapped if the file backend is. Their links are sent back to the link index,
+    and the terms of their text, counted by the workers, to the search index.
+    The workers compress their documents themselves, with the settings of the compressor,
+    and parse them with a parser backend of the same name.
+    """
+    if jobs <= 1 or len(pages) <= 1:
+        if file_io is None:
+            file_io = SyncIO()
+        file_io.prefetch([from_path for from_path, _ in pages])
+        for from_path, dest_path in pages:
+            generate_page(from_path=from_path, template_path=template_path, 
+                          dest_path=dest_path, block_cache=block_cache, file_io=file_io,
+                          link_index=link_index, tree_cache=tree_cache, search_index=search_index,
+                          compressor=compressor, parser=parser)
+        file_io.flush()
+        return
+
+    jobs_args = [(from_path, template_path, dest_path) for from_path, dest_path in pages]
+    chunksize = max(1, len(jobs_args) // (jobs * 4))
+    cache_size = block_cache.max_entries if block_cache is not None else 0
+    profiler = instrumentation.PROFILER
+    profiler_trace = profiler.trace if profiler is not None else None
+    io_backend = "mmap" if file_io is not None and file_io.memory_mapped else "sync"
+    compress_settings = None
+    if compressor is not None:
+        compress_settings = (compressor.format_names, compressor.min_size)
+    parser_backend = parser.name if parser is not None else "reference"
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_page_worker,
+                             initargs=(cache_size, profiler_trace, io_backend,
+                                       link_index is not None, tree_cache,
+                                       search_index is not None, compress_settings,
+                                       parser_backend)) as executor:
+        # consume the results to raise the first error of the workers
+        for links, documents, timings, compressed, logged, trees in executor.map(generate_page_job, jobs_args,
+                                                                                  chunksize=chunksize):
+            if profiler is not None and timings is not None:
+                profiler.merge(timings)
+            if link_index is not None and links is not None:
+                link_index.pages.update(links)
+            if search_index is not None and documents is not None:
+                search_index.merge(documents)
+            if compressor is not None and compressed is not None:
+                compressor.merge_counts(compressed)
+            if logged is not None:
+                buildlog.SUMMARY.merge_events(logged)
+            if tree_cache is not None and trees is not None:
+                tree_cache.merge_counts(trees)
+
+
+# Block cache and file backend of a worker process, created by init_page_worker
+WORKER_BLOCK_CACHE: Optional[BlockCache] = None
+WORKER_FILE_IO = None
+WORKER_CHECK_LINKS = False
+WORKER_TREE_CACHE: Optional[TreeCache] = None
+WORKER_SEARCH_INDEX = False
+WORKER_COMPRESSOR: Optional[Compressor] = None
+WORKER_PARSER: Optional[ReferenceParser] = None
+
+
+def init_page_worker(cache_size: int, profiler_trace: Optional[bool] = None, io_backend: str = "sync",
+                     check_links: bool = False, tree_cache: Optional[TreeCache] = None,
+                     search_index: bool = False,
+                     compress_settings: Optional[Tuple[List[str], int]] = None,
+                     parser_backend: str = "reference") -> None:
+    """Create the block cache and the file backend of a worker process, and its profiler
+    if the build is instrumented (profiler_trace is not None).
+    The tree cache is shared with the main process, its counts are sent back. The compressor of the worker,
+    created from the (formats, min size) compress_settings, compresses in the worker thread.
+    The parser of the worker is the backend named parser_backend.
+    The worker writes its logs to the log file itself, see buildlog.configure_worker.
+    """
+    global WORKER_BLOCK_CACHE, WORKER_FILE_IO, WORKER_CHECK_LINKS, WORKER_TREE_CACHE, WORKER_SEARCH_INDEX
+    global WORKER_COMPRESSOR, WORKER_PARSER
+    WORKER_BLOCK_CACHE = BlockCache(max_entries=cache_size) if cache_size else None
+    WORKER_FILE_IO = make_io_backend(io_backend)
+    WORKER_CHECK_LINKS = check_links
+    WORKER_TREE_CACHE = tree_cache
+    if tree_cache is not None:
+        tree_cache.drain_counts()  # the counts of the main process, copied with the cache
+    WORKER_SEARCH_INDEX = search_index
+    WORKER_PARSER = make_parser_backend(parser_backend)
+    buildlog.configure_worker()
+    WORKER_COMPRESSOR = None
+    if compress_settings is not None:
+        formats, min_size = compress_settings
+        WORKER_COMPRESSOR = Compressor(formats=formats, min_size=min_size, threads=0)
+    if profiler_trace is None:
+        instrumentation.disable()
+    else:
+        instrumentation.enable(trace=profiler_trace)
+
+
+def generate_page_job(job_args: Tuple[Path, Path, Path]) -> Tuple[Optional[dict], Optional[dict], Optional[dict],
+                                                                 Optional[Counter], Optional[Counter],
+                                                                 Optional[Tuple[int, int, Set[str]]]]:
+    """Generate a page inside a worker process, and return the urls of its links
+    if they are checked, its indexed terms if the pages are indexed (see SearchIndex.merge),
+    its timings if the build is instrumented, the counts of its compressor if the
+    documents are compressed, the count of its logged file events (see buildlog) and
+    the counts of the tree cache if the trees are cached (see TreeCache.drain_counts).
+    The error is raised again with the markdown path, as the worker traceback is lost.
+    """
+    from_path, template_path, dest_path = job_args
+    link_index = LinkIndex() if WORKER_CHECK_LINKS else None
+    search_index = SearchIndex() if WORKER_SEARCH_INDEX else None
+    try:
+        generate_page(from_path=from_path, template_path=template_path, dest_path=dest_path,
+                      block_cache=WORKER_BLOCK_CACHE, file_io=WORKER_FILE_IO, link_index=link_index,
+                      tree_cache=WORKER_TREE_CACHE, search_index=search_index,
+                      compressor=WORKER_COMPRESSOR, parser=WORKER_PARSER)
+    except Exception as error:
+        raise Exception(f"failed to generate page from {from_path}: {error!r}") from error
+
+    links = link_index.pages if link_index is not None else None
+    documents = search_index.documents if search_index is not None else None
+    timings = instrumentation.PROFILER.drain() if instrumentation.PROFILER is not None else None
+    compressed = WORKER_COMPRESSOR.drain_counts() if WORKER_COMPRESSOR is not None else None
+    trees = WORKER_TREE_CACHE.drain_counts() if WORKER_TREE_CACHE is not None else None
+    return links, documents, timings, compressed, buildlog.drain_events(), trees
         
 
 if __name__ == "__main__":
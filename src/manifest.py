@@ -0,0 +1,89 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Optional
+
+
+def hash_file(path: Path) -> str:
+    """Return the sha256 hex digest of the content of a file
+    """
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class Manifest:
+    """A Manifest keeps track of every page generated during a build.
+    For each markdown source it stores :
+    - hash: hash of the markdown content
+    - template: hash of the html template used to render it
+    - output: path of the generated html document
+    - links: urls of the links and images of the document, when they were collected
+    It also keeps the list of the static files synchronised in the public directory.
+    It is saved as json between builds so that unchanged pages can be skipped.
+    """
+
+    def __init__(self, path: Path, pages: Optional[dict] = None, assets: Optional[List[str]] = None):
+        self.path = path
+        self.pages = pages if pages is not None else {}
+        self.assets = assets if assets is not None else []
+        self.seen = set()  # sources visited during the current build
+
+    @classmethod
+    def load(cls, path: Path) -> "Manifest":
+        """Load a manifest from a json file, or return an empty one
+        if the file does not exist or can not be read
+        """
+        if not path.exists():
+            return cls(path)
+        try:
+            data = json.loads(path.read_text())
+        except ValueError:
+            return cls(path)
+        return cls(path, pages=data.get("pages", {}), assets=data.get("assets", []))
+
+    def save(self) -> None:
+        """Write the manifest to its json file
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"pages": self.pages, "assets": self.assets}, indent=1, sort_keys=True))
+
+    def is_up_to_date(self, source: Path, source_hash: str, template_hash: str, output: Path) -> bool:
+        """Return True if the source was already rendered with the same content
+        and the same template, and its html document still exists
+        """
+        self.seen.add(str(source))
+        entry = self.pages.get(str(source))
+        if entry is None:
+            return False
+        return (entry["hash"] == source_hash
+                and entry["template"] == template_hash
+                and entry["output"] == str(output)
+                and output.exists())
+
+    def record(self, source: Path, source_hash: str, template_hash: str, output: Path,
+               links: Optional[List[str]] = None) -> None:
+        """Store the hashes and output of a freshly rendered source, and the urls of its links
+        if they were collected
+        """
+        self.seen.add(str(source))
+        entry = {"hash": source_hash, "template": template_hash, "output": str(output)}
+        if links is not None:
+            entry["links"] = links
+        self.pages[str(source)] = entry
+
+    def links(self, source: Path) -> Optional[List[str]]:
+        """Return the urls of the links of a source, or None if they were not collected
+        """
+        entry = self.pages.get(str(source))
+        return entry.get("links") if entry is not None else None
+
+    def remove_orphans(self) -> List[Path]:
+        """Delete the html documents whose markdown source was not seen during the build
+        and drop them from the manifest. Return the list of deleted documents.
+        """
+        deleted = []
+        for source in [source for source in self.pages if source not in self.seen]:
+            output = Path(self.pages.pop(source)["output"])
+            if output.exists():
+                output.unlink()
+                deleted.append(output)
+        return deleted
@@ -1,9 +1,21 @@
+import hashlib
 import re
-from typing import List
-
+import sys
+from pathlib import Path
+from itertools import chain
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Union
+
+import htmlnode
+import linkindex
+import searchindex
+import splitblocks
+import splitinlines
+import textnode
+from blockcache import BlockCache
+from instrumentation import stage
 from htmlnode import Tag, HTMLNode, LeafNode, ParentNode
-from splitinlines import split_nodes_delimiter, split_nodes_image, split_nodes_link
-from splitblocks import BlockType, markdown_to_blocks, block_to_block_type
+from splitinlines import split_nodes_delimiter, split_nodes_image, split_nodes_link, tokenize_inline
+from splitblocks import BlockType, markdown_to_blocks, classify_block
 from textnode import TextType, TextNode
 
 
@@ -11,6 +23,13 @@ def text_to_textnodes(text: str) -> List[TextNode]:
     """Take a raw string full of inline markdown element and split it
     into a list of relevant TextNodes
     """
+    return tokenize_inline(text)
+
+
+def text_to_textnodes_chained(text: str) -> List[TextNode]:
+    """Reference implementation of text_to_textnodes, chaining a full pass
+    of each split_nodes_* function. Kept to check the single pass tokenizer against it.
+    """
     if not text:
         return [TextNode("", TextType.TEXT)]
     firstnode = TextNode(f"{'' if not text else text}", TextType.TEXT)
@@ -44,9 +63,11 @@ def text_node_to_html_node(text_node: TextNode):
             return LeafNode(Tag.CODE, value=text_node.text)
         
         case TextType.LINK:
+            linkindex.add_link(text_node.url)
             return LeafNode(Tag.A, value=text_node.text, props={"href": text_node.url})
         
         case TextType.IMAGE:
+            linkindex.add_link(text_node.url)
             return LeafNode(Tag.IMG, value="", props={"src": text_node.url, "alt": text_node.text})
 
         # case _:
@@ -56,49 +77,212 @@ def text_node_to_html_node(text_node: TextNode):
 def text_to_children(text: str) -> List[HTMLNode]:
     """Takes a raw text and return a list of HTMLNodes
     """
-    textnodes = text_to_textnodes(text)
+    with stage("inline_parse"):
+        textnodes = text_to_textnodes(text)
+    searchindex.add_textnodes(textnodes)
     return [text_node_to_html_node(node) for node in textnodes]
 
 
-def markdown_to_html_node(markdown: str) -> HTMLNode:
-
-    blocks = markdown_to_blocks(markdown)
-    document_nodes = []
-
-    for block in blocks:
-        match block_to_block_type(block):
-            case BlockType.PARAGRAPH:
-                document_nodes.append(ParentNode(tag=Tag.P, children=text_to_children(block)))
-            case BlockType.HEADING:
-                document_nodes.append(ParentNode(tag=get_heading_tag(block), 
-                                                 children=text_to_children(format_markdown_heading(block))))
-            case BlockType.CODE:
-                document_nodes.append(ParentNode(tag=Tag.CODE, 
-                                                 children=text_to_children(format_markdown_code(block))))
-            case BlockType.QUOTE:
-                document_nodes.append(ParentNode(tag=Tag.QUOTE, 
-                                                 children=text_to_children(format_markdown_quote(block))))
-            case BlockType.UNORDERED_LIST:
-                document_nodes.append(ParentNode(Tag.UL, 
-                                                 children=markdown_lists_to_li_nodes(text=block, index=2)))
-
-            case BlockType.ORDERED_LIST:
-                document_nodes.append(ParentNode(Tag.OL, 
-                                                 children=markdown_lists_to_li_nodes(text=block, index=3)))
-                
-            case _:
-                raise Exception("not a valid blocktype")
+def markdown_to_html_node(markdown: Union[str, Iterable[str]], cache: Optional[BlockCache] = None) -> HTMLNode:
+    """Convert a full markdown document into a DIV ParentNode with a child per block.
+    The document can also be given already cut into blocks, e.g. streamed by iter_blocks.
+    If a block cache is given, each block is rendered once to an html fragment
+    and added to the document as a raw text LeafNode.
+    """
+    if isinstance(markdown, str):
+        with stage("split_blocks"):
+            blocks = markdown_to_blocks(markdown)
+    else:
+        blocks = markdown
+
+    with stage("build_tree"):
+        if cache is None:
+            document_nodes = [block_to_html_node(block) for block in blocks]
+        else:
+            document_nodes = [LeafNode(None, value=block_to_cached_html(block, cache)) for block in blocks]
 
     return ParentNode(Tag.DIV, children=document_nodes)
 
+
+def block_to_html_node(block: str) -> HTMLNode:
+    """Convert a single markdown block into its HTMLNode
+    """
+    block_type, lines = classify_block(block)
+    match block_type:
+        case BlockType.PARAGRAPH:
+            return ParentNode(tag=Tag.P, children=text_to_children(block))
+        case BlockType.HEADING:
+            return ParentNode(tag=get_heading_tag(block), 
+                              children=text_to_children(format_markdown_heading(block)))
+        case BlockType.CODE:
+            return ParentNode(tag=Tag.CODE, 
+                              children=text_to_children(format_markdown_code(block, lines)))
+        case BlockType.QUOTE:
+            return ParentNode(tag=Tag.QUOTE, 
+                              children=text_to_children(format_markdown_quote(block, lines)))
+        case BlockType.UNORDERED_LIST:
+            return ParentNode(Tag.UL, 
+                              children=markdown_lists_to_li_nodes(text=block, index=2, lines=lines))
+
+        case BlockType.ORDERED_LIST:
+            return ParentNode(Tag.OL, 
+                              children=markdown_lists_to_li_nodes(text=block, index=3, lines=lines))
+            
+        case _:
+            raise Exception("not a valid blocktype")
+
+
+def block_to_cached_html(block: str, cache: BlockCache, render: Optional[Callable[[str], str]] = None) -> str:
+    """Return the html fragment of a markdown block, rendering it with render,
+    block_to_html by default, only if it is not already in the cache.
+    The urls of its links and its text are cached with it,
+    to be collected without parsing the block again.
+    """
+    entry = cache.get_entry(block)
+    if entry is None:
+        with linkindex.collect_links() as links, searchindex.collect_text() as texts:
+            html = (render or block_to_html)(block)
+        text = "\n".join(texts)
+        cache.put(block, html, links, text)
+    else:
+        html, links, text = entry
+    linkindex.add_links(links)
+    searchindex.add_texts([text])
+    return html
+
+
+# Fast path: html rendered straight from the TextNodes, without HTMLNode objects.
+# It returns the same html as markdown_to_html_node(...).to_html()
+
+# Opening and closing html of the TextTypes without attributes
+INLINE_TAGS = {
+    TextType.TEXT: ("", ""),
+    TextType.BOLD: ("<b>", "</b>"),
+    TextType.ITALIC: ("<i>", "</i>"),
+    TextType.CODE: ("<code>", "</code>"),
+}
+
+
+def text_to_html(text: str) -> str:
+    """Takes a raw text and return the html of its inline elements.
+    Raise a ValueError if the text has no inline element, like an empty ParentNode.
+    """
+    with stage("inline_parse"):
+        textnodes = text_to_textnodes(text)
+    if not textnodes:
+        raise ValueError("ParentNode object must have children")
+    searchindex.add_textnodes(textnodes)
+
+    parts = []
+    for node in textnodes:
+        tags = INLINE_TAGS.get(node.text_type)
+        if tags is not None:
+            parts.append(f"{tags[0]}{node.text}{tags[1]}")
+        elif node.text_type == TextType.LINK:
+            parts.append(f'<a href="{node.url}">{node.text}</a>')
+            linkindex.add_link(node.url)
+        else:
+            parts.append(f'<img src="{node.url}" alt="{node.text}"></img>')
+            linkindex.add_link(node.url)
+    return "".join(parts)
+
+
+def block_to_html(block: str) -> str:
+    """Convert a single markdown block into its html
+    """
+    block_type, lines = classify_block(block)
+    match block_type:
+        case BlockType.PARAGRAPH:
+            return f"<p>{text_to_html(block)}</p>"
+        case BlockType.HEADING:
+            tag = get_heading_tag(block).value
+            return f"<{tag}>{text_to_html(format_markdown_heading(block))}</{tag}>"
+        case BlockType.CODE:
+            return f"<pre><code>{text_to_html(format_markdown_code(block, lines))}</code></pre>"
+        case BlockType.QUOTE:
+            return f"<blockquote>{text_to_html(format_markdown_quote(block, lines))}</blockquote>"
+        case BlockType.UNORDERED_LIST:
+            return f"<ul>{markdown_lists_to_html(text=block, index=2, lines=lines)}</ul>"
+        case BlockType.ORDERED_LIST:
+            return f"<ol>{markdown_lists_to_html(text=block, index=3, lines=lines)}</ol>"
+        case _:
+            raise Exception("not a valid blocktype")
+
+
+def markdown_lists_to_html(text: str, index: int, lines: Optional[List[str]] = None) -> str:
+    """Html of the LI elements of a markdown list block, see markdown_lists_to_li_nodes
+    """
+    if lines is None:
+        lines = text.split("\n")
+    return "".join(f"<li>{text_to_html(line[index:])}</li>" for line in lines)
+
+
+def markdown_to_html_fragments(markdown: str, cache: Optional[BlockCache] = None) -> List[str]:
+    """Convert a full markdown document into the list of html fragments of its DIV :
+    the opening tag, the html of each block and the closing tag.
+    Joined, they are the html of markdown_to_html_node, without building the HTMLNode tree.
+    """
+    with stage("split_blocks"):
+        blocks = markdown_to_blocks(markdown)
+    if not blocks:
+        raise ValueError("ParentNode object must have children")
+
+    with stage("render_blocks"):
+        if cache is None:
+            fragments = [block_to_html(block) for block in blocks]
+        else:
+            fragments = [block_to_cached_html(block, cache) for block in blocks]
+
+    return ["<div>", *fragments, "</div>"]
+
+
+def iter_html_fragments(blocks: Iterable[str], cache: Optional[BlockCache] = None) -> Iterator[str]:
+    """Yield the html fragments of markdown_to_html_fragments from the blocks of a document,
+    rendering each block only when the previous fragment is consumed.
+    With the blocks streamed by iter_blocks, a page is parsed and written
+    without the whole document or its html in memory.
+    """
+    blocks = iter(blocks)
+    first_block = next(blocks, None)
+    if first_block is None:
+        raise ValueError("ParentNode object must have children")
+
+    yield "<div>"
+    for block in chain([first_block], blocks):
+        with stage("render_blocks"):
+            html = block_to_html(block) if cache is None else block_to_cached_html(block, cache)
+        yield html
+    yield "</div>"
+
+
+def markdown_to_html(markdown: str, cache: Optional[BlockCache] = None) -> str:
+    """Convert a full markdown document into html, without building the HTMLNode tree
+    """
+    return "".join(markdown_to_html_fragments(markdown, cache))
+
+
+def parser_version() -> str:
+    """Return a hash of the source code of the modules turning markdown into html.
+    It changes whenever the parser changes, to invalidate the rendering caches.
+    """
+    import fastparser  # imports this module, see parsers
+    modules = [htmlnode, splitblocks, splitinlines, textnode, sys.modules[__name__], fastparser]
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(Path(module.__file__).read_bytes()) # type: ignore
+    return digest.hexdigest()[:16]
+
 # Helper functions for markdown_to_html_nodes below
+HEADING_LEVEL_PATTERN = re.compile(r'#{1,6}')
+CODE_END_PATTERN = re.compile(r'```$')
+
 def get_heading_tag(text: str) -> Tag:
     """ Return the html heading tag of a markdown text block 
     based on the number of hashtags in it
     """
     # Get the number of "#" in the beginning of the block
     # If the number is aobe
-    heading_type = len(re.match(r'^#{1,6}', text).group()) #type: ignore
+    heading_type = len(HEADING_LEVEL_PATTERN.match(text).group()) #type: ignore
     match heading_type:
         case 1:
             return Tag.H1
@@ -121,53 +305,79 @@ def format_markdown_heading(text: str) -> str:
         of a markdown heading block
     """
     # get all hashtags
-    markdown_headings = re.match(r'^#{1,6}', text).group() #type: ignore
+    markdown_headings = HEADING_LEVEL_PATTERN.match(text).group() #type: ignore
     return text.lstrip(markdown_headings).lstrip()
 
 
-def format_markdown_code(text: str) -> str:
+def format_markdown_code(text: str, lines: Optional[List[str]] = None) -> str:
     """ Strip markdown code backticks at the beginning 
-        and end of a markdown code block
+        and end of a markdown code block.
+        lines are the lines of the block, if already split
     """
-    lines = text.split("\n")
-    if not re.match(r'^```', lines[0]) or not re.search(r'```$', lines[-1]):
+    if lines is None:
+        lines = text.split("\n")
+    if not lines[0].startswith("```") or CODE_END_PATTERN.search(lines[-1]) is None:
         raise Exception(("not a valid code block"))
-    lines.pop(0)
-    lines.pop()
-    return "\n".join(lines).strip()
+    return "\n".join(lines[1:-1]).strip()
 
 
-def format_markdown_quote(text: str) -> str:
+def format_markdown_quote(text: str, lines: Optional[List[str]] = None) -> str:
     """ Strip markdown quote delimiter (">") and spaces
-    at the begining of each code line
+    at the begining of each code line.
+    lines are the lines of the block, if already split
     """
-    lines = text.split("\n")
+    if lines is None:
+        lines = text.split("\n")
     # Remove block quotes from lines
     # and add html line break if there are more than one line
     return "<br>".join([line.lstrip("> ") for line in lines])
 
 
-def markdown_lists_to_li_nodes(text: str, index: int) -> List[ParentNode]:
+def markdown_lists_to_li_nodes(text: str, index: int, lines: Optional[List[str]] = None) -> List[ParentNode]:
     """Takes a string block of markdown list elements (ordered and unordered),
-    the index at which the line must be cut
+    the index at which the line must be cut, the lines of the block if already split,
     and return a list of ParentNode of tag LI with the formated lines
     """
-    lines = text.split("\n")
+    if lines is None:
+        lines = text.split("\n")
     lines = [line[index:] for line in lines]
     return [ParentNode(Tag.LI, children=text_to_children(line)) for line in lines]
     
 
-def extract_title(mardown: str) -> str:
-    """ get the title of a markdown document
+def extract_title(mardown: Union[str, BinaryIO]) -> str:
+    """ get the title of a markdown document,
+    given as a text or as a binary file object or mmap of which only the first line is read
     """
     pattern = r'^# '
-    lines = mardown.splitlines()
+    if isinstance(mardown, str):
+        line = first_line(mardown)
+    else:
+        line = read_first_line(mardown)
     
-    if not re.match(pattern, lines[0]):
+    if not re.match(pattern, line):
         raise Exception("no title in document")
 
-    h1_title = re.match(r'^# ', lines[0]).group() #type: ignore
-    return lines[0].lstrip(h1_title).lstrip()
+    h1_title = re.match(r'^# ', line).group() #type: ignore
+    return line.lstrip(h1_title).lstrip()
+
+
+def first_line(text: str) -> str:
+    """ Return text.splitlines()[0], splitting only the text up to the first line return
+    """
+    end = text.find("\n")
+    head = text if end == -1 else text[:end + 1]
+    return head.splitlines()[0]
+
+
+def read_first_line(source: BinaryIO, encoding: str = "utf-8") -> str:
+    """ Return the first line of a binary file object or mmap, as first_line
+    of its decoded text, without moving its position
+    """
+    position = source.tell()
+    source.seek(0)
+    head = source.readline()
+    source.seek(position)
+    return first_line(head.decode(encoding))
 
 
 if __name__ == "__main__":
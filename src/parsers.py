@@ -0,0 +1,66 @@
+from typing import Iterable, Iterator, List, Optional, Union
+
+import fastparser
+import page_formatter
+from blockcache import BlockCache
+from htmlnode import HTMLNode
+
+
+PARSER_BACKENDS = ("reference", "fast")
+
+
+class ReferenceParser:
+    """Parser backend of page_formatter: the blocks are cut by splitblocks, their inline
+    text is split into TextNodes by splitinlines, and the html is rendered from them
+    or from the tree of HTMLNodes they make
+    """
+
+    name = "reference"
+
+    def markdown_to_html_node(self, markdown: Union[str, Iterable[str]],
+                              cache: Optional[BlockCache] = None) -> HTMLNode:
+        """Return the tree of a markdown document, given as text or as its blocks"""
+        return page_formatter.markdown_to_html_node(markdown, cache=cache)
+
+    def markdown_to_html_fragments(self, markdown: str, cache: Optional[BlockCache] = None) -> List[str]:
+        """Return the html of a markdown document in fragments"""
+        return page_formatter.markdown_to_html_fragments(markdown, cache=cache)
+
+    def iter_html_fragments(self, blocks: Iterable[str], cache: Optional[BlockCache] = None) -> Iterator[str]:
+        """Yield the html of a markdown document in fragments, from its streamed blocks"""
+        return page_formatter.iter_html_fragments(blocks, cache=cache)
+
+    def markdown_to_html(self, markdown: str, cache: Optional[BlockCache] = None) -> str:
+        return "".join(self.markdown_to_html_fragments(markdown, cache=cache))
+
+
+class FastParser(ReferenceParser):
+    """Parser backend of fastparser: the inline text of each block is rendered
+    by a table driven state machine straight to html, without TextNodes.
+    The html, the links and the text of the pages are the ones of the reference parser,
+    but the tree of a document only has a raw html LeafNode per block.
+    """
+
+    name = "fast"
+
+    def markdown_to_html_node(self, markdown: Union[str, Iterable[str]],
+                              cache: Optional[BlockCache] = None) -> HTMLNode:
+        return fastparser.markdown_to_html_node(markdown, cache=cache)
+
+    def markdown_to_html_fragments(self, markdown: str, cache: Optional[BlockCache] = None) -> List[str]:
+        return fastparser.markdown_to_html_fragments(markdown, cache=cache)
+
+    def iter_html_fragments(self, blocks: Iterable[str], cache: Optional[BlockCache] = None) -> Iterator[str]:
+        return fastparser.iter_html_fragments(blocks, cache=cache)
+
+
+def make_parser_backend(name: str) -> ReferenceParser:
+    """Return the parser backend of the given name, see PARSER_BACKENDS
+    """
+    match name:
+        case "reference":
+            return ReferenceParser()
+        case "fast":
+            return FastParser()
+        case _:
+            raise ValueError(f"invalid parser backend: {name}")
@@ -0,0 +1,233 @@
+import contextlib
+import json
+import os
+import re
+import string
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+
+FORMAT_VERSION = 2  # version of the search files and of the state of the index
+
+SEARCH_DIR_NAME = "search"  # directory of the index in the public directory
+INDEX_FILE_NAME = "index.json"  # documents and shards of the index
+TERMS_DIR_NAME = "terms"  # one file of postings per term prefix
+
+PREFIX_LENGTH = 2
+PREFIX_PATTERN = re.compile(r"[a-z0-9]+")
+OTHER_PREFIX = "_"  # shard of the terms whose prefix is not a valid file name
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+TERM_PATTERN = re.compile(r"[^\W_]+")  # run of letters and digits
+MARKUP_PATTERN = re.compile(r"<[^<>]*>")  # html in the text, like the <br> of the quotes
+PUNCTUATION = str.maketrans(dict.fromkeys(string.punctuation, " "))
+
+# texts of the inline elements rendered by each thread inside collect_text, None outside of it
+RENDERED_TEXT = threading.local()
+
+
+def rendered_text() -> Optional[List[str]]:
+    return getattr(RENDERED_TEXT, "texts", None)
+
+
+@contextlib.contextmanager
+def collect_text() -> Iterator[List[str]]:
+    """Collect the text of the TextNodes rendered by page_formatter in the current thread
+    into a list, one string per call of text_to_textnodes. As with linkindex.collect_links,
+    the text collected by a nested collect_text is not added to the outer list.
+    """
+    previous = rendered_text()
+    RENDERED_TEXT.texts = texts = []
+    try:
+        yield texts
+    finally:
+        RENDERED_TEXT.texts = previous
+
+
+def add_textnodes(textnodes) -> None:
+    """Add the text of TextNodes (the alt text of the images) to the current collection, if any
+    """
+    texts = rendered_text()
+    if texts is not None:
+        texts.append("".join(node.text for node in textnodes))
+
+
+def add_texts(texts: Iterable[str]) -> None:
+    """Add texts to the current collection, if any
+    """
+    collected = rendered_text()
+    if collected is not None:
+        collected.extend(texts)
+
+
+def count_terms(text: str) -> Dict[str, int]:
+    """Return the number of occurrences of each term of a text : the runs of letters
+    and digits of 2 to 64 characters, in lower case, html markup excluded.
+    The text is cut at the spaces and the ascii punctuation, three times faster than
+    with TERM_PATTERN, which only cuts the few distinct words left with another separator.
+    """
+    words = Counter(MARKUP_PATTERN.sub(" ", text).lower().translate(PUNCTUATION).split())
+    terms = {}
+    for word, count in words.items():
+        if word.isalnum():
+            if MIN_TERM_LENGTH <= len(word) <= MAX_TERM_LENGTH:
+                terms[word] = terms.get(word, 0) + count
+            continue
+        for term in TERM_PATTERN.findall(word):
+            if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+                terms[term] = terms.get(term, 0) + count
+    return terms
+
+
+def term_prefix(term: str) -> str:
+    """Return the prefix naming the shard of a term
+    """
+    prefix = term[:PREFIX_LENGTH]
+    return prefix if PREFIX_PATTERN.fullmatch(prefix) else OTHER_PREFIX
+
+
+class SearchIndex:
+    """A SearchIndex is an inverted index of the text of the pages of a site,
+    for a client side search. For each page it keeps an id, the title and the
+    count of each term, and writes in the search directory of the site :
+    - index.json: the url and title of each document by id, and the list of the shards
+    - terms/<prefix>.json: for each term of the prefix, the flat list of
+      document id and term count pairs [id, count, id, count, ...]
+    A page keeps its id while it exists, so that only the shards of the terms of
+    the changed pages are written again. The new pages are numbered in the order of their paths. The state of the index is kept between
+    builds in a json file, see load and save, with the hash of the markdown source of each page
+    (see set_source_hash), so that a page changed by a build without the index is indexed again.
+    """
+
+    def __init__(self, state_path: Optional[Path] = None):
+        self.state_path = state_path
+        self.documents: Dict[str, list] = {}  # html document -> [id, title, term counts, source hash]
+        self.next_id = 0
+        self.changed_prefixes: Set[str] = set()  # shards to write again
+        self.seen: Set[str] = set()  # documents added or kept during the current build
+        self.complete = False  # True once every shard was written from this state
+
+    @classmethod
+    def load(cls, state_path: Path) -> "SearchIndex":
+        """Load the state of the index saved by a previous build, or return an empty index
+        if there is none or it can not be read
+        """
+        index = cls(state_path)
+        try:
+            data = json.loads(state_path.read_text())
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != FORMAT_VERSION:
+            return index
+        index.documents = data["documents"]
+        index.next_id = data["next_id"]
+        index.complete = True
+        return index
+
+    def save(self) -> None:
+        """Write the state of the index to its json file
+        """
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps({"version": FORMAT_VERSION, "next_id": self.next_id,
+                                               "documents": self.documents}))
+
+    def add(self, page: Path, title: str, text: str) -> None:
+        """Index the text of a html document
+        """
+        self.add_terms(page, title, count_terms(text))
+
+    def add_terms(self, page: Path, title: str, terms: Dict[str, int]) -> None:
+        """Index the term counts of a html document, replacing its previous ones
+        """
+        key = str(page)
+        self.seen.add(key)
+        previous = self.documents.get(key)
+        if previous is None:
+            document_id = None  # numbered by write, in the order of the pages
+            changed_terms = terms.keys()
+        else:
+            document_id, _, previous_terms, _ = previous
+            # only the shards of the terms added, removed or counted differently change
+            changed_terms = {term for term in previous_terms.keys() | terms.keys()
+                             if previous_terms.get(term) != terms.get(term)}
+        self.documents[key] = [document_id, title, terms, None]  # see set_source_hash
+        self.changed_prefixes.update(term_prefix(term) for term in changed_terms)
+
+    def merge(self, documents: Dict[str, list]) -> None:
+        """Index the documents of another index, e.g. of a worker process
+        """
+        for page, (_, title, terms, _) in documents.items():
+            self.add_terms(Path(page), title, terms)
+
+    def set_source_hash(self, page: Path, source_hash: str) -> None:
+        """Record the hash of the markdown source a html document was indexed from
+        """
+        self.documents[str(page)][3] = source_hash
+
+    def keep(self, page: Path, source_hash: Optional[str] = None) -> bool:
+        """Keep the terms of a html document that was not generated again.
+        Return False if the document is not indexed, or, given the hash of its markdown
+        source, was indexed from another version of it, to generate it again.
+        """
+        key = str(page)
+        document = self.documents.get(key)
+        if document is None or (source_hash is not None and document[3] != source_hash):
+            return False
+        self.seen.add(key)
+        return True
+
+    def write(self, public_dir: Path) -> List[str]:
+        """Remove the documents that were neither added nor kept, write the index
+        and the shards of the changed terms in the search directory of the site,
+        and save the state of the index. Return the prefixes of the written shards.
+        """
+        for key in [key for key in self.documents if key not in self.seen]:
+            self.changed_prefixes.update(term_prefix(term) for term in self.documents.pop(key)[2])
+        for key in sorted(key for key, document in self.documents.items() if document[0] is None):
+            self.documents[key][0] = self.next_id
+            self.next_id += 1
+
+        search_dir = public_dir / SEARCH_DIR_NAME
+        terms_dir = search_dir / TERMS_DIR_NAME
+        rewrite_all = not self.complete or not (search_dir / INDEX_FILE_NAME).exists()
+        shards: Dict[str, Dict[str, List[int]]] = {}
+        prefixes = set()
+        documents = sorted(self.documents.items(), key=lambda item: item[1][0])
+        for _, (document_id, _, terms, _) in documents:
+            for term, count in terms.items():
+                prefix = term_prefix(term)
+                prefixes.add(prefix)
+                if rewrite_all or prefix in self.changed_prefixes:
+                    shards.setdefault(prefix, {}).setdefault(term, []).extend((document_id, count))
+
+        terms_dir.mkdir(parents=True, exist_ok=True)
+        for prefix, postings in shards.items():
+            write_json(terms_dir / f"{prefix}.json", postings)
+        removed = {path.stem for path in terms_dir.glob("*.json")} if rewrite_all else self.changed_prefixes
+        for prefix in removed.difference(prefixes):
+            (terms_dir / f"{prefix}.json").unlink(missing_ok=True)  # no term left in the shard
+
+        write_json(search_dir / INDEX_FILE_NAME, {
+            "version": FORMAT_VERSION,
+            "prefix_length": PREFIX_LENGTH,
+            "shards": sorted(prefixes),
+            "documents": {document_id: [Path(page).relative_to(public_dir).as_posix(), title]
+                          for page, (document_id, title, _, _) in documents},
+        })
+        self.changed_prefixes.clear()
+        self.complete = True
+        self.save()
+        return sorted(shards)
+
+
+def write_json(path: Path, data) -> None:
+    """Write compact json to a file, replacing it at once
+    """
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary_path.write_text(json.dumps(data, separators=(",", ":"), sort_keys=True))
+    os.replace(temporary_path, path)
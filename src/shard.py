@@ -0,0 +1,103 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from buildgraph import page_outputs, walk_files
+from manifest import Manifest
+from treescan import scan_tree
+
+
+SHARDS_DIR_NAME = "shards"
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Return the (index, count) of a shard given as "i/N", with 1 <= i <= N
+    """
+    index, separator, count = text.partition("/")
+    if not separator or not index.isdigit() or not count.isdigit():
+        raise ValueError(f"invalid shard: {text}, expected i/N")
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise ValueError(f"invalid shard: {text}, i must be between 1 and N")
+    return index, count
+
+
+def shard_of(relative_path: str, count: int) -> int:
+    """Return the shard (from 1 to count) of a file given by its posix path relative
+    to the content or static directory.
+    The path is hashed with blake2b rather than hash(), which is salted per process,
+    so that every process and machine assigns the same files to the same shard.
+    """
+    digest = hashlib.blake2b(relative_path.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def in_shard(path: Path, root: Path, shard: Tuple[int, int]) -> bool:
+    """Return True if a file of the root directory belongs to the shard (index, count)
+    """
+    index, count = shard
+    return shard_of(path.relative_to(root).as_posix(), count) == index
+
+
+def shard_manifest_path(cache_dir: Path, shard: Tuple[int, int]) -> Path:
+    """Return the path of the manifest of the pages and assets of a shard
+    """
+    index, count = shard
+    return cache_dir / SHARDS_DIR_NAME / f"manifest-{index}-of-{count}.json"
+
+
+def merge_shards(content_dir: Path, static_dir: Path, public_dir: Path, cache_dir: Path,
+                 count: int, manifest_path: Path) -> Manifest:
+    """Merge the manifests of the count shards of a build into a combined manifest,
+    saved at manifest_path and returned.
+    The union of the shards is validated first: every shard manifest must exist,
+    each markdown source and static file must have been built by exactly one shard,
+    its own, but the static files hidden by a page of the same output, and every generated document must exist in the public directory.
+    Raise an Exception listing the problems otherwise.
+    """
+    problems = []
+    pages: Dict[str, dict] = {}
+    assets: Dict[str, int] = {}
+    for index in range(1, count + 1):
+        path = shard_manifest_path(cache_dir, (index, count))
+        if not path.exists():
+            problems.append(f"missing manifest of shard {index}/{count}: {path}")
+            continue
+        shard_manifest = Manifest.load(path)
+        for source, entry in shard_manifest.pages.items():
+            if source in pages:
+                problems.append(f"page built by more than one shard: {source}")
+            elif not in_shard(Path(source), content_dir, (index, count)):
+                problems.append(f"page built by the wrong shard {index}/{count}: {source}")
+            pages[source] = entry
+        for asset in shard_manifest.assets:
+            if asset in assets:
+                problems.append(f"static file synchronised by more than one shard: {asset}")
+            elif shard_of(asset, count) != index:
+                problems.append(f"static file synchronised by the wrong shard {index}/{count}: {asset}")
+            assets[asset] = index
+
+    content_inventory = scan_tree(content_dir)
+    problems.extend(f"page not built by any shard: {source}"
+                    for source in missing(content_inventory.paths(), pages))
+    # the static files hidden by a page of the same output are not synchronised
+    outputs = page_outputs(content_dir, content_inventory)
+    static_files = [path.relative_to(static_dir).as_posix() for path in walk_files(static_dir)]
+    problems.extend(f"static file not synchronised by any shard: {asset}"
+                    for asset in missing([name for name in static_files if name not in outputs], assets))
+    problems.extend(f"missing document: {entry['output']}"
+                    for entry in pages.values() if not Path(entry["output"]).exists())
+    problems.extend(f"missing static file: {public_dir / asset}"
+                    for asset in assets if not (public_dir / asset).exists())
+    if problems:
+        raise Exception(f"invalid shards, {len(problems)} problems:\n" + "\n".join(problems))
+
+    manifest = Manifest(manifest_path, pages=pages, assets=sorted(assets))
+    manifest.save()
+    return manifest
+
+
+def missing(expected: List, found: Dict) -> List:
+    """Return the expected keys (paths are compared as strings) that were not found
+    """
+    return [key for key in expected if str(key) not in found]
@@ -1,5 +1,8 @@
+import codecs
+import io
 from enum import Enum
 import re
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, TextIO, Tuple, Union
 
 from htmlnode import Tag
 
@@ -27,53 +30,116 @@ def markdown_to_blocks(markdown: str) -> list:
     return [block for block in stripped_blocks if block]
 
 
+def iter_blocks(source: Union[TextIO, BinaryIO], chunk_size: int = 1 << 16,
+                encoding: str = "utf-8") -> Iterator[str]:
+    """Cut a document into blocks like markdown_to_blocks, reading it chunk by chunk
+    so that only the block being cut is kept in memory.
+    Takes as input :
+    - source: a file object, or a mmap, with a read(size) method.
+      Bytes are decoded with the encoding and their line returns translated to "\n",
+      as in a file opened in text mode.
+    - chunk_size: number of characters or bytes read at a time
+    and yields the "block" strings one by one.
+    """
+    decoder = None
+    pending = []  # chunks of the text after the last double line return
+    while True:
+        data = source.read(chunk_size)
+        chunk = data
+        if isinstance(data, bytes):
+            if decoder is None:
+                decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(),
+                                                       translate=True)
+            chunk = decoder.decode(data, final=not data)
+        if not chunk:
+            if not data:
+                break
+            continue  # only the start of a character or a "\r"
+
+        if "\n\n" not in chunk and not (pending and pending[-1][-1] == "\n" and chunk[0] == "\n"):
+            pending.append(chunk)  # same block, joined once complete
+            continue
+        # the last piece may go on in the next chunk
+        *blocks, last = ("".join(pending) + chunk).split("\n\n")
+        yield from _clean_blocks(blocks)
+        pending = [last] if last else []
+
+    yield from _clean_blocks(["".join(pending)])
+
+
+def _clean_blocks(blocks: List[str]) -> Iterator[str]:
+    for block in blocks:
+        block = block.replace("\xa0", " ").strip()
+        if block:
+            yield block
+
+
+# Patterns of the block types, matched from the start of the block
+HEADING_PATTERN = re.compile(r'#{1,6} .*$')
+CODE_PATTERN = re.compile(r'```[\s\S]*?```$')
+UNORDERED_LIST_MARKERS = ("* ", "- ")
+
+
 def block_to_block_type(block: str) -> BlockType:
     """Take a block of raw markdown text as input, and return its blocktype
     """
-    if is_heading(block):
-        return BlockType.HEADING
-    elif is_code(block):
-        return BlockType.CODE
-    elif is_quote(block):
-        return BlockType.QUOTE
-    elif is_unordered_list(block):
-        return BlockType.UNORDERED_LIST
-    elif is_ordered_list(block):
-        return BlockType.ORDERED_LIST
-    else: 
-        return BlockType.PARAGRAPH
-    
-# All bool functions used for asserting block type
-def is_heading(text: str) -> bool:
+    return classify_block(block)[0]
+
+
+def classify_block(block: str) -> Tuple[BlockType, List[str]]:
+    """Take a block of raw markdown text as input, and return its blocktype
+    with the list of its lines, split only once for the classification and the rendering.
+    The first character of the block gives the only type it can be, besides a paragraph :
+    "#" a heading, "`" a code block, ">" a quote, "*" or "-" an unordered list
+    and "1" an ordered list.
+    """
+    lines = block.split("\n")
+    candidate = BLOCK_CANDIDATES.get(block[:1])
+    if candidate is not None:
+        block_type, matches = candidate
+        if matches(block, lines):
+            return block_type, lines
+    return BlockType.PARAGRAPH, lines
+
+
+# All bool functions used for asserting block type,
+# taking the lines of the text if they are already split
+def is_heading(text: str, lines: Optional[List[str]] = None) -> bool:
     """Determine if the input text is a markdown heading"""
-    pattern = r'^#{1,6} .*$'
-    return bool(re.match(pattern, text))
+    return HEADING_PATTERN.match(text) is not None
 
-def is_code(text: str) -> bool:
+def is_code(text: str, lines: Optional[List[str]] = None) -> bool:
     """Determine if the input text is a markdown code block"""
-    pattern = r'^```[\s\S]*?```$'
-    return bool(re.match(pattern, text))
+    return CODE_PATTERN.match(text) is not None
 
-def is_quote(text: str) -> bool:
+def is_quote(text: str, lines: Optional[List[str]] = None) -> bool:
     """Determine if the input text is a markdown quote block"""
-    pattern = r'^>.*$'
     # All lines start with ">"
-    return all(re.match(pattern, line) for line in text.split('\n'))
+    return all(line.startswith(">") for line in lines or text.split('\n'))
 
-def is_unordered_list(text: str) -> bool:
+def is_unordered_list(text: str, lines: Optional[List[str]] = None) -> bool:
     """Determine if the input text is a markdown unordered list block"""
-    pattern = r'^[*-] .*$'
     # All lines start with "*" or "-" followed by a space
-    return all(re.match(pattern, line) for line in text.split('\n'))
+    return all(line[:2] in UNORDERED_LIST_MARKERS for line in lines or text.split('\n'))
 
-def is_ordered_list(text: str) -> bool:
+def is_ordered_list(text: str, lines: Optional[List[str]] = None) -> bool:
     """Determine if the input text is a markdown ordered list block"""
-    lines = text.split('\n')
     # Start with a number in ascending order followed by a point and space
-    pattern = [f"{i}. " for i in range(1, len(lines) + 1)]
-    # Compare pattern with a list of the first 3 characters of each line
-    numbers = [line[0:3] for line in lines]
-    return numbers == pattern
+    for number, line in enumerate(lines or text.split('\n'), start=1):
+        if line[0:3] != f"{number}. ":
+            return False
+    return True
+
+
+# Type and test of the only block type a block can be, by its first character
+BLOCK_CANDIDATES: Dict[str, Tuple[BlockType, Callable[[str, Optional[List[str]]], bool]]] = {
+    "#": (BlockType.HEADING, is_heading),
+    "`": (BlockType.CODE, is_code),
+    ">": (BlockType.QUOTE, is_quote),
+    "*": (BlockType.UNORDERED_LIST, is_unordered_list),
+    "-": (BlockType.UNORDERED_LIST, is_unordered_list),
+    "1": (BlockType.ORDERED_LIST, is_ordered_list),
+}
 
 
 
@@ -4,12 +4,18 @@ from typing import List
 from textnode import TextNode, TextType
 
 
+IMAGE_PATTERN = re.compile(r'!\[(.*?)\]\((.*?)\)')
+LINK_PATTERN = re.compile(r'\[(.*?)\]\((.*?)\)')
+# Delimiters in the order they are split by the reference chain of split_nodes_delimiter
+DELIMITERS = [("**", TextType.BOLD), ("*", TextType.ITALIC), ("`", TextType.CODE)]
+
+
 def extract_markdown_images(text: str) -> list:
     """Takes a markdown string as input and return a tuple with :
     - alt text (index 0)
     - url (index 1)
     """
-    return re.findall(r'!\[(.*?)\]\((.*?)\)', text)
+    return IMAGE_PATTERN.findall(text)
 
 
 def extract_markdown_links(text: str) -> list:
@@ -17,7 +23,7 @@ def extract_markdown_links(text: str) -> list:
     - alt text (index 0)
     - url (index 1)
     """
-    return re.findall(r'\[(.*?)\]\((.*?)\)', text)
+    return LINK_PATTERN.findall(text)
 
 
 def split_nodes_delimiter(old_nodes: List[TextNode], delimiter: str, text_type: TextType) -> List[TextNode]:
@@ -127,5 +133,69 @@ def split_nodes_link(old_nodes) -> List[TextNode]:
     return [node for node in new_nodes if node.text or node.text_type == TextType.LINK]
 
 
+def tokenize_inline(text: str) -> List[TextNode]:
+    """Split a raw string full of inline markdown elements into a list of TextNodes
+    in a single pass over the text.
+    It returns the same nodes as the chain of split_nodes_image, split_nodes_link
+    and split_nodes_delimiter ("**", "*" then "`"), with empty nodes removed :
+    - images are found first, the text between two images is searched for links
+    - the text between images and links is split on each delimiter in turn
+    Each part of the text is scanned a bounded number of times, and the nodes
+    are appended to a single list instead of rebuilding it after each split.
+    """
+    if not text:
+        return [TextNode("", TextType.TEXT)]
+
+    nodes = []
+    position = 0
+    for image in IMAGE_PATTERN.finditer(text):
+        _tokenize_links(text, position, image.start(), nodes)
+        if image.group(1):
+            nodes.append(TextNode(image.group(1), TextType.IMAGE, image.group(2)))
+        position = image.end()
+    _tokenize_links(text, position, len(text), nodes)
+
+    return nodes
+
+
+def _tokenize_links(text: str, start: int, end: int, nodes: List[TextNode]) -> None:
+    """Append the link nodes found in text[start:end] to nodes,
+    and the delimited nodes of the text around them
+    """
+    position = start
+    for link in LINK_PATTERN.finditer(text, start, end):
+        _tokenize_delimiters(text[position:link.start()], nodes)
+        if link.group(1):
+            nodes.append(TextNode(link.group(1), TextType.LINK, link.group(2)))
+        position = link.end()
+    _tokenize_delimiters(text[position:end], nodes)
+
+
+def _tokenize_delimiters(text: str, nodes: List[TextNode], level: int = 0) -> None:
+    """Append the nodes of a text without image or link to nodes,
+    splitting it on the delimiter of the given level then on the next ones
+    """
+    if not text:
+        return
+    if level == len(DELIMITERS):
+        nodes.append(TextNode(text, TextType.TEXT))
+        return
+
+    delimiter, text_type = DELIMITERS[level]
+    if delimiter not in text:
+        _tokenize_delimiters(text, nodes, level + 1)
+        return
+
+    parts = text.split(delimiter)
+    if len(parts) % 2 == 0:
+        raise Exception(f"Unmatched delimiter '{delimiter}' found in text: '{text}'")
+
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            _tokenize_delimiters(part, nodes, level + 1)
+        elif part:
+            nodes.append(TextNode(part, text_type))
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,71 @@
+import re
+from pathlib import Path
+from typing import Dict, Iterator, Tuple, TextIO
+
+from htmlnode import HTMLNode
+
+
+# A placeholder is a name between double curly braces, like {{ Title }}
+PLACEHOLDER_PATTERN = re.compile(r'\{\{ (\w+) \}\}')
+
+# Compiled templates by path, with the (mtime, size) of the file they were read from
+_TEMPLATE_CACHE: Dict[Path, Tuple[Tuple[int, int], "Template"]] = {}
+
+
+class Template:
+    """A Template is an html template parsed once into a list of literal segments
+    and the placeholder slots between them :
+    segments[0] slots[0] segments[1] slots[1] ... segments[-1]
+    Any placeholder name can be filled, and a page is rendered by joining the segments
+    with the values of the slots, in a single pass whatever the number of placeholders.
+    """
+
+    def __init__(self, text: str):
+        parts = PLACEHOLDER_PATTERN.split(text)
+        self.segments = parts[0::2]
+        self.slots = parts[1::2]
+
+    def iter_render(self, values: dict) -> Iterator[str]:
+        """Yield the template chunk by chunk with the placeholders filled by values.
+        A value can be a string, an HTMLNode, which is rendered chunk by chunk,
+        or an iterable of html fragments. Placeholders without a value are left as is.
+        """
+        yield self.segments[0]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(slot)
+            if value is None:
+                yield "{{ " + slot + " }}"
+            elif isinstance(value, HTMLNode):
+                yield from value.iter_html()
+            elif isinstance(value, str):
+                yield value
+            else:
+                yield from value
+            yield segment
+
+    def render(self, values: dict) -> str:
+        """Return the template with the placeholders filled by values
+        """
+        return "".join(self.iter_render(values))
+
+    def write(self, stream: TextIO, values: dict) -> None:
+        """Write the template with the placeholders filled by values to a file object
+        """
+        write = stream.write
+        for chunk in self.iter_render(values):
+            write(chunk)
+
+
+def load_template(template_path: Path) -> Template:
+    """Return the compiled template of a file.
+    The template is only read and parsed again when the file changed.
+    """
+    stat = template_path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _TEMPLATE_CACHE.get(template_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    template = Template(template_path.read_text())
+    _TEMPLATE_CACHE[template_path] = (key, template)
+    return template
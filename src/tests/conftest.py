@@ -0,0 +1,21 @@
+import pytest
+
+
+TEMPLATE = "<html><title>{{ Title }}</title><body>{{ Content }}</body></html>"
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Create a small site with a content, static and public directory"""
+    content = tmp_path / "content"
+    (content / "blog").mkdir(parents=True)
+    (content / "index.md").write_text("# Home\n\nWelcome **home**")
+    (content / "blog" / "post.md").write_text("# Post\n\nA *post*")
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "index.css").write_text("body {}")
+    template = tmp_path / "template.html"
+    template.write_text(TEMPLATE)
+    public = tmp_path / "public"
+    public.mkdir()
+    return tmp_path
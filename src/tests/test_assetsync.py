@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from assetsync import is_unchanged, sync_assets
+from buildlog import SUMMARY, phase
+from compress import Compressor
+
+
+@pytest.fixture
+def static(tmp_path):
+    static = tmp_path / "static"
+    (static / "images").mkdir(parents=True)
+    (static / "index.css").write_text("body {}")
+    (static / "images" / "logo.png").write_bytes(b"\x89PNG")
+    (tmp_path / "public").mkdir()
+    return static
+
+
+class TestSyncAssets:
+    def test_first_sync_copies_all_files(self, static, tmp_path):
+        summary, assets = sync_assets(static, tmp_path / "public", [])
+        assert assets == ["images/logo.png", "index.css"]
+        assert summary.copied == 2
+        assert (tmp_path / "public" / "images" / "logo.png").read_bytes() == b"\x89PNG"
+
+    def test_file_events_are_counted(self, static, tmp_path):
+        SUMMARY.reset()
+        with phase("assets"):
+            _, assets = sync_assets(static, tmp_path / "public", [])
+            (static / "index.css").unlink()
+            sync_assets(static, tmp_path / "public", assets)
+        assert SUMMARY.events == {("assets", "FILE COPIED"): 2, ("assets", "FILE DELETED"): 1}
+
+    def test_unchanged_files_are_not_copied(self, static, tmp_path):
+        _, assets = sync_assets(static, tmp_path / "public", [])
+        summary, _ = sync_assets(static, tmp_path / "public", assets)
+        assert (summary.copied, summary.unchanged) == (0, 2)
+
+    def test_changed_file_is_copied(self, static, tmp_path):
+        _, assets = sync_assets(static, tmp_path / "public", [])
+        (static / "index.css").write_text("body { margin: 0; }")
+        summary, _ = sync_assets(static, tmp_path / "public", assets)
+        assert (summary.copied, summary.unchanged) == (1, 1)
+        assert (tmp_path / "public" / "index.css").read_text() == "body { margin: 0; }"
+
+    def test_orphans_are_removed(self, static, tmp_path):
+        _, assets = sync_assets(static, tmp_path / "public", [])
+        (tmp_path / "public" / "index.html").write_text("<p>generated page</p>")
+        (static / "index.css").unlink()
+        summary, assets = sync_assets(static, tmp_path / "public", assets)
+        assert summary.removed == 1
+        assert assets == ["images/logo.png"]
+        assert not (tmp_path / "public" / "index.css").exists()
+        assert (tmp_path / "public" / "index.html").exists()
+
+    def test_page_outputs_hide_the_static_files(self, static, tmp_path):
+        (static / "index.html").write_text("<p>static</p>")
+        (tmp_path / "public" / "index.html").write_text("<p>page</p>")
+        summary, assets = sync_assets(static, tmp_path / "public", ["index.html"], page_outputs={"index.html"})
+        assert assets == ["images/logo.png", "index.css"]
+        assert (summary.copied, summary.removed) == (2, 0)
+        assert (tmp_path / "public" / "index.html").read_text() == "<p>page</p>"
+
+    def test_hardlink_mode(self, static, tmp_path):
+        summary, _ = sync_assets(static, tmp_path / "public", [], mode="hardlink")
+        assert summary.linked == 2
+        assert os.path.samefile(static / "index.css", tmp_path / "public" / "index.css")
+
+    def test_copy_after_hardlink_does_not_change_source(self, static, tmp_path):
+        _, assets = sync_assets(static, tmp_path / "public", [], mode="hardlink")
+        (tmp_path / "public" / "index.css").unlink()
+        (tmp_path / "public" / "index.css").write_text("changed in public")
+        sync_assets(static, tmp_path / "public", assets, mode="copy")
+        assert (static / "index.css").read_text() == "body {}"
+        assert (tmp_path / "public" / "index.css").read_text() == "body {}"
+
+    def test_reflink_mode_falls_back_to_copy(self, static, tmp_path):
+        summary, _ = sync_assets(static, tmp_path / "public", [], mode="reflink")
+        assert summary.linked + summary.copied == 2
+        assert (tmp_path / "public" / "index.css").read_text() == "body {}"
+
+    def test_invalid_mode(self, static, tmp_path):
+        with pytest.raises(ValueError):
+            sync_assets(static, tmp_path / "public", [], mode="move")
+
+    def test_compressed_siblings(self, static, tmp_path):
+        public = tmp_path / "public"
+        compressor = Compressor(min_size=0, threads=0)
+        _, assets = sync_assets(static, public, [], compressor=compressor)
+        assert (public / "index.css.gz").exists()
+        assert not (public / "images" / "logo.png.gz").exists()  # already compressed
+
+        (static / "index.css").unlink()
+        sync_assets(static, public, assets, compressor=compressor)
+        assert not (public / "index.css.gz").exists()
+
+
+class TestIsUnchanged:
+    def test_missing_destination(self, static, tmp_path):
+        assert not is_unchanged(static / "index.css", tmp_path / "public" / "index.css")
+
+    def test_same_content_different_mtime(self, static, tmp_path):
+        destination = tmp_path / "public" / "index.css"
+        destination.write_text("body {}")
+        os.utime(destination, ns=(0, 0))
+        assert not is_unchanged(static / "index.css", destination)
+        assert is_unchanged(static / "index.css", destination, use_hash=True)
+        assert is_unchanged(static / "index.css", destination)  # mtime was copied
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+from blockcache import BlockCache, block_key
+
+
+class TestBlockCache:
+    def test_get_missing_block(self):
+        cache = BlockCache()
+        assert cache.get("# Heading") is None
+        assert cache.misses == 1
+
+    def test_put_and_get(self):
+        cache = BlockCache()
+        cache.put("# Heading", "<h1>Heading</h1>")
+        assert cache.get("# Heading") == "<h1>Heading</h1>"
+        assert cache.hits == 1
+
+    def test_least_recently_used_block_is_evicted(self):
+        cache = BlockCache(max_entries=2)
+        cache.put("a", "<p>a</p>")
+        cache.put("b", "<p>b</p>")
+        cache.get("a")
+        cache.put("c", "<p>c</p>")
+        assert cache.get("b") is None
+        assert cache.get("a") == "<p>a</p>"
+        assert cache.get("c") == "<p>c</p>"
+
+    def test_links_and_text_are_cached_with_the_html(self):
+        cache = BlockCache()
+        cache.put("[a](a.html)", "<p><a href=\"a.html\">a</a></p>", ["a.html"], "a")
+        cache.put("text", "<p>text</p>")
+        assert cache.get_entry("[a](a.html)") == ("<p><a href=\"a.html\">a</a></p>", ("a.html",), "a")
+        assert cache.get_entry("text") == ("<p>text</p>", (), "")
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            BlockCache(max_entries=0)
+
+    def test_block_key(self):
+        assert block_key("a") == block_key("a")
+        assert block_key("a") != block_key("b")
+
+
+class TestPersistentBlockCache:
+    def test_blocks_survive_between_caches(self, tmp_path):
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="1")
+        cache.put("# Heading", "<h1>Heading</h1>")
+        cache.close()
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="1")
+        assert cache.get("# Heading") == "<h1>Heading</h1>"
+        cache.close()
+
+    def test_new_version_empties_the_cache(self, tmp_path):
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="1")
+        cache.put("# Heading", "<h1>Heading</h1>")
+        cache.close()
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="2")
+        assert cache.get("# Heading") is None
+        cache.close()
+
+    def test_links_and_text_survive_between_caches(self, tmp_path):
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="1")
+        cache.put("![i](a.png)", "<p><img></img></p>", ["a.png"], "i")
+        cache.close()
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="1")
+        assert cache.get_entry("![i](a.png)") == ("<p><img></img></p>", ("a.png",), "i")
+        cache.close()
+
+    def test_database_of_previous_schema_is_replaced(self, tmp_path):
+        connection = sqlite3.connect(tmp_path / "blocks.sqlite3")
+        connection.execute("CREATE TABLE blocks (key TEXT PRIMARY KEY, html TEXT NOT NULL)")
+        connection.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        connection.execute("INSERT INTO meta VALUES ('version', '1')")
+        connection.commit()
+        connection.close()
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="1")
+        cache.put("# Heading", "<h1>Heading</h1>")
+        cache.close()
+        cache = BlockCache(path=tmp_path / "blocks.sqlite3", version="1")
+        assert cache.get("# Heading") == "<h1>Heading</h1>"
+        cache.close()
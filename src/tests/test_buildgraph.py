@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from buildgraph import BuildGraph, run_concurrently, walk_files
+
+
+@pytest.fixture
+def graph(site):
+    (site / "static" / "images").mkdir()
+    (site / "static" / "images" / "logo.png").write_bytes(b"png")
+    return BuildGraph.scan(content_dir=site / "content", static_dir=site / "static",
+                           template_path=site / "template.html", public_dir=site / "public")
+
+
+class TestPlan:
+    def test_full_plan(self, graph):
+        plan = graph.full_plan()
+        assert plan.pages == [(graph.content_dir / "blog" / "post.md", graph.public_dir / "blog"),
+                              (graph.content_dir / "index.md", graph.public_dir)]
+        assert plan.assets == [(graph.static_dir / "images" / "logo.png", graph.public_dir / "images" / "logo.png"),
+                               (graph.static_dir / "index.css", graph.public_dir / "index.css")]
+        assert plan.deleted == []
+
+    def test_template_change_renders_every_page(self, graph):
+        plan = graph.plan({graph.template_path})
+        assert len(plan.pages) == 2
+        assert plan.assets == []
+
+    def test_source_change_renders_its_page(self, graph):
+        plan = graph.plan({graph.content_dir / "index.md"})
+        assert plan.pages == [(graph.content_dir / "index.md", graph.public_dir)]
+        assert plan.assets == []
+
+    def test_asset_change_copies_it(self, graph):
+        plan = graph.plan({graph.static_dir / "index.css"})
+        assert plan.pages == []
+        assert plan.assets == [(graph.static_dir / "index.css", graph.public_dir / "index.css")]
+
+    def test_new_source(self, graph):
+        source = graph.content_dir / "about" / "team.md"
+        source.parent.mkdir()
+        source.write_text("# Team")
+        assert graph.plan({source}).pages == [(source, graph.public_dir / "about")]
+        assert len(graph.plan({graph.template_path}).pages) == 3
+
+    def test_deleted_inputs_delete_their_outputs(self, graph):
+        (graph.content_dir / "index.md").unlink()
+        (graph.static_dir / "index.css").unlink()
+        plan = graph.plan({graph.content_dir / "index.md", graph.static_dir / "index.css"})
+        assert plan.pages == [] and plan.assets == []
+        assert plan.deleted == [graph.public_dir / "index.css", graph.public_dir / "index.html"]
+        assert graph.plan({graph.template_path}).pages == [(graph.content_dir / "blog" / "post.md",
+                                                            graph.public_dir / "blog")]
+
+    def test_unknown_paths_are_ignored(self, graph, tmp_path):
+        (tmp_path / "notes.txt").write_text("notes")
+        plan = graph.plan({tmp_path / "notes.txt", graph.content_dir / "missing.md"})
+        assert (plan.pages, plan.assets, plan.deleted) == ([], [], [])
+
+    def test_page_wins_over_asset_with_the_same_output(self, graph):
+        (graph.static_dir / "index.html").write_text("<p>static</p>")
+        graph = BuildGraph.scan(graph.content_dir, graph.static_dir, graph.template_path, graph.public_dir)
+        assert (graph.static_dir / "index.html", graph.public_dir / "index.html") not in graph.full_plan().assets
+        assert graph.plan({graph.static_dir / "index.html"}).assets == []
+
+    def test_asset_hidden_by_a_deleted_page_is_copied(self, graph):
+        (graph.static_dir / "index.html").write_text("<p>static</p>")
+        graph = BuildGraph.scan(graph.content_dir, graph.static_dir, graph.template_path, graph.public_dir)
+        (graph.content_dir / "index.md").unlink()
+        plan = graph.plan({graph.content_dir / "index.md"})
+        assert plan.deleted == [graph.public_dir / "index.html"]
+        assert plan.assets == [(graph.static_dir / "index.html", graph.public_dir / "index.html")]
+        assert graph.plan({graph.static_dir / "index.html"}).assets == [(graph.static_dir / "index.html",
+                                                                         graph.public_dir / "index.html")]
+
+    def test_asset_and_page_of_the_same_output_deleted_together(self, graph):
+        (graph.static_dir / "index.html").write_text("<p>static</p>")
+        graph = BuildGraph.scan(graph.content_dir, graph.static_dir, graph.template_path, graph.public_dir)
+        (graph.content_dir / "index.md").unlink()
+        (graph.static_dir / "index.html").unlink()
+        plan = graph.plan([graph.content_dir / "index.md", graph.static_dir / "index.html"])
+        assert (plan.assets, plan.deleted) == ([], [graph.public_dir / "index.html"])
+        assert graph.public_dir / "index.html" not in graph.outputs
+
+
+class TestExecute:
+    def test_assets_are_copied_in_another_thread(self, graph):
+        threads = {}
+        graph.execute(graph.full_plan(),
+                      render_pages=lambda pages: threads.setdefault("pages", threading.get_ident()),
+                      copy_assets=lambda assets: threads.setdefault("assets", threading.get_ident()))
+        assert threads["pages"] == threading.get_ident()
+        assert threads["assets"] != threading.get_ident()
+        assert (graph.public_dir / "blog").is_dir()
+        assert (graph.public_dir / "images").is_dir()
+
+    def test_renders_overlap_copies(self, graph):
+        copying = threading.Event()
+
+        def render_pages(pages):
+            assert copying.wait(timeout=5)  # the copies started before the renders ended
+
+        graph.execute(graph.full_plan(), render_pages=render_pages, copy_assets=lambda assets: copying.set())
+
+    def test_deleted_outputs_are_removed(self, graph):
+        (graph.public_dir / "index.css").write_text("body {}")
+        (graph.static_dir / "index.css").unlink()
+        graph.execute(graph.plan({graph.static_dir / "index.css"}),
+                      render_pages=lambda pages: None, copy_assets=lambda assets: None)
+        assert not (graph.public_dir / "index.css").exists()
+
+
+class TestRunConcurrently:
+    def test_results(self):
+        assert run_concurrently(lambda: 1, lambda: 2, lambda: 3) == [1, 2, 3]
+
+    def test_error_is_raised(self):
+        def fail():
+            raise ValueError("failed")
+
+        with pytest.raises(ValueError):
+            run_concurrently(lambda: 1, fail)
+
+
+def test_walk_files(tmp_path):
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "c.md").write_text("c")
+    (tmp_path / "a.md").write_text("a")
+    assert walk_files(tmp_path) == [tmp_path / "a.md", tmp_path / "b" / "c.md"]
+    assert walk_files(tmp_path / "missing") == []
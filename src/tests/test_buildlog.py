@@ -0,0 +1,147 @@
+import logging
+import threading
+
+import pytest
+
+import buildlog
+from buildlog import (BatchFileHandler, DeferredQueueHandler, SUMMARY, configure, in_phase, log_file_event,
+                      log_summary, phase)
+
+
+LOGGER = logging.getLogger("test_buildlog")
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    yield tmp_path / "logs.txt"
+    buildlog.close()
+
+
+def read_messages(log_path):
+    return [line.split(" - ", 2)[2] for line in log_path.read_text().splitlines()]
+
+
+class TestConfigure:
+    @pytest.mark.parametrize("use_queue", [False, True])
+    def test_file_events_are_logged(self, log_path, use_queue):
+        configure(log_path, use_queue=use_queue)
+        log_file_event(LOGGER, "FILE CREATED", "public/index.html")
+        log_file_event(LOGGER, "FILE COPIED", "static/a.css", "public/a.css")
+        LOGGER.warning("BROKEN LINK : %s -> %s", "index.html", "missing.html")
+        buildlog.close()
+        assert read_messages(log_path) == ["FILE CREATED : public/index.html",
+                                           "FILE COPIED : FROM static/a.css -> TO public/a.css",
+                                           "BROKEN LINK : index.html -> missing.html"]
+        assert " - WARNING - " in log_path.read_text()
+
+    @pytest.mark.parametrize("use_queue", [False, True])
+    def test_summary_only(self, log_path, use_queue):
+        configure(log_path, use_queue=use_queue, summary_only=True)
+        with phase("pages"):
+            for page in range(3):
+                log_file_event(LOGGER, "FILE CREATED", f"page{page}.html")
+        LOGGER.info("BLOCK CACHE : 1 hits, 2 misses")
+        log_summary(LOGGER)
+        buildlog.close()
+        messages = read_messages(log_path)
+        assert messages[0] == "BLOCK CACHE : 1 hits, 2 misses"
+        assert messages[1].startswith("PHASE pages : ") and messages[1].endswith(" s, FILE CREATED 3")
+        assert len(messages) == 2
+
+    def test_configure_again_overwrites_the_log(self, log_path):
+        configure(log_path, use_queue=True)
+        LOGGER.info("first build")
+        configure(log_path)
+        LOGGER.info("second build")
+        buildlog.close()
+        assert read_messages(log_path) == ["second build"]
+        assert buildlog.LOG_FILES
+
+
+    def test_close_restores_the_settings_of_logging(self, log_path):
+        srcfile = logging._srcfile
+        configure(log_path)
+        configure(log_path, use_queue=True)
+        assert logging._srcfile is None and not logging.logThreads
+        buildlog.close()
+        assert logging._srcfile == srcfile
+        assert logging.logThreads and logging.logProcesses and logging.logMultiprocessing
+
+
+class TestQueue:
+    def test_records_of_threads_are_all_written(self, log_path):
+        configure(log_path, use_queue=True)
+
+        def log_files(name):
+            for index in range(500):
+                log_file_event(LOGGER, "FILE CREATED", f"{name}{index}")
+
+        threads = [threading.Thread(target=log_files, args=(name,)) for name in "ab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        buildlog.close()
+        messages = read_messages(log_path)
+        assert len(messages) == 1000
+        assert [message[len("FILE CREATED : a"):] for message in messages
+                if message.startswith("FILE CREATED : a")] == [str(index) for index in range(500)]
+
+    def test_record_formatted_by_the_listener(self):
+        records = []
+        handler = DeferredQueueHandler(records)
+        handler.enqueue = records.append
+        LOGGER.addHandler(handler)
+        try:
+            LOGGER.info("FILE %s : %s", "CREATED", "index.html")
+            try:
+                raise ValueError("failed")
+            except ValueError:
+                LOGGER.exception("error")
+        finally:
+            LOGGER.removeHandler(handler)
+        assert (records[0].msg, records[0].args) == ("FILE CREATED : index.html", None)
+        assert records[1].exc_info is None and "ValueError: failed" in records[1].exc_text
+
+    def test_batch_is_written_when_full(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(BatchFileHandler, "MAX_BATCH", 2)
+        handler = BatchFileHandler(tmp_path / "logs.txt")
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, "line", None, None)
+        handler.emit(record)
+        assert (tmp_path / "logs.txt").read_text() == ""
+        handler.emit(record)
+        assert (tmp_path / "logs.txt").read_text() == "line\nline\n"
+        handler.emit(record)
+        handler.close()
+        assert (tmp_path / "logs.txt").read_text() == "line\n" * 3
+
+
+class TestSummary:
+    def test_phases_of_concurrent_threads(self):
+        SUMMARY.reset()
+
+        def copy_files():
+            for _ in range(2):
+                log_file_event(LOGGER, "FILE COPIED", "a", "b")
+
+        thread = threading.Thread(target=in_phase("assets", copy_files))
+        with phase("pages"):
+            thread.start()
+            log_file_event(LOGGER, "FILE CREATED", "index.html")
+            thread.join()
+        log_file_event(LOGGER, "FILE DELETED", "old.html")
+        assert SUMMARY.events == {("pages", "FILE CREATED"): 1, ("assets", "FILE COPIED"): 2,
+                                  ("other", "FILE DELETED"): 1}
+        lines = SUMMARY.lines()
+        assert [line.split(" : ")[0] for line in lines] == ["PHASE assets", "PHASE pages", "PHASE other"]
+        assert lines[2] == "PHASE other : untimed, FILE DELETED 1"
+
+    def test_events_of_a_worker(self):
+        SUMMARY.reset()
+        log_file_event(LOGGER, "FILE CREATED", "index.html")
+        events = buildlog.drain_events()
+        assert events == {"FILE CREATED": 1}
+        assert buildlog.drain_events() is None
+        with phase("pages"):
+            SUMMARY.merge_events(events)
+        assert SUMMARY.events == {("pages", "FILE CREATED"): 1}
@@ -0,0 +1,141 @@
+import gzip
+import io
+import os
+
+import pytest
+
+from compress import COMPRESSION_FORMATS, Compressor, TeeWriter, remove_compressed, remove_orphan_siblings
+
+
+TEXT = "<p>compressible text</p>\n" * 100
+
+
+@pytest.fixture
+def page(tmp_path):
+    page = tmp_path / "index.html"
+    page.write_text(TEXT)
+    return page
+
+
+def set_mtime(path, mtime):
+    os.utime(path, ns=(mtime, mtime))
+
+
+class TestCompressor:
+    @pytest.mark.parametrize("threads", [0, 2])
+    def test_gzip_sibling(self, page, tmp_path, threads):
+        compressor = Compressor(threads=threads)
+        compressor.compress_file(page)
+        compressor.close()
+        assert gzip.decompress((tmp_path / "index.html.gz").read_bytes()) == page.read_bytes()
+        assert compressor.counts == {"compressed": 1}
+
+    def test_compressed_text_is_the_written_file(self, page, tmp_path):
+        compressor = Compressor(threads=0)
+        compressor.compress_text(page, TEXT)
+        assert gzip.decompress((tmp_path / "index.html.gz").read_bytes()) == page.read_bytes()
+
+    def test_deterministic_output(self, page, tmp_path):
+        compressor = Compressor(threads=0)
+        compressor.compress_file(page)
+        first = (tmp_path / "index.html.gz").read_bytes()
+        compressor.compress_file(page)
+        assert (tmp_path / "index.html.gz").read_bytes() == first
+
+    def test_small_file_is_skipped(self, tmp_path):
+        small = tmp_path / "small.css"
+        small.write_text("body {}")
+        (tmp_path / "small.css.gz").write_bytes(b"stale")
+        compressor = Compressor(min_size=1024, threads=0)
+        compressor.compress_file(small)
+        assert not (tmp_path / "small.css.gz").exists()
+        assert compressor.counts == {"skipped": 1}
+
+    def test_incompressible_type_is_skipped(self, tmp_path):
+        image = tmp_path / "logo.png"
+        image.write_bytes(b"\x89PNG" * 1000)
+        compressor = Compressor(threads=0)
+        compressor.compress_file(image)
+        assert not (tmp_path / "logo.png.gz").exists()
+
+    def test_unchanged_file_keeps_its_sibling(self, page, tmp_path):
+        compressor = Compressor(threads=0)
+        compressor.compress_file(page)
+        set_mtime(tmp_path / "index.html.gz", 4 * 10**18)  # after the page
+        compressor.compress_file(page, changed=False)
+        assert compressor.counts == {"compressed": 1, "unchanged": 1}
+        compressor.compress_file(page)  # a changed file is always compressed again
+        assert compressor.counts["compressed"] == 2
+
+    def test_older_sibling_is_written_again(self, page, tmp_path):
+        compressor = Compressor(threads=0)
+        compressor.compress_file(page)
+        set_mtime(tmp_path / "index.html.gz", 0)
+        assert not compressor.is_up_to_date(page)
+        compressor.compress_file(page, changed=False)
+        assert compressor.counts == {"compressed": 2}
+        assert compressor.is_up_to_date(page)
+
+    def test_many_files_with_threads(self, tmp_path):
+        pages = []
+        for index in range(50):
+            pages.append(tmp_path / f"page{index}.html")
+            pages[-1].write_text(TEXT * (index + 1))
+        compressor = Compressor(threads=4, max_pending=4)
+        for path in pages:
+            compressor.compress_file(path)
+        compressor.close()
+        assert compressor.counts == {"compressed": 50}
+        for path in pages:
+            assert gzip.decompress(path.with_name(path.name + ".gz").read_bytes()) == path.read_bytes()
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_error_is_raised(self, tmp_path):
+        compressor = Compressor(threads=2)
+        compressor.compress_file(tmp_path / "missing.html")
+        with pytest.raises(FileNotFoundError):
+            compressor.close()
+
+    def test_drain_and_merge_counts(self, page):
+        worker = Compressor(threads=0)
+        worker.compress_file(page)
+        compressor = Compressor(threads=0)
+        compressor.merge_counts(worker.drain_counts())
+        assert worker.counts == {}
+        assert compressor.counts == {"compressed": 1}
+
+    def test_unavailable_format(self):
+        with pytest.raises(ValueError):
+            Compressor(formats=["zstd"])
+
+    @pytest.mark.skipif("br" not in COMPRESSION_FORMATS, reason="brotli is not installed")
+    def test_brotli_sibling(self, page, tmp_path):
+        import brotli
+        compressor = Compressor(formats=["gzip", "br"], threads=0)
+        compressor.compress_file(page)
+        assert brotli.decompress((tmp_path / "index.html.br").read_bytes()) == page.read_bytes()
+        assert (tmp_path / "index.html.gz").exists()
+
+
+class TestRemoveCompressed:
+    def test_remove_compressed(self, page, tmp_path):
+        Compressor(threads=0).compress_file(page)
+        remove_compressed(page)
+        remove_compressed(page)  # no sibling left
+        assert not (tmp_path / "index.html.gz").exists()
+
+    def test_remove_orphan_siblings(self, page, tmp_path):
+        compressor = Compressor(threads=0)
+        compressor.compress_file(page)
+        (tmp_path / "removed.json.gz").write_bytes(b"")
+        remove_orphan_siblings(tmp_path)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["index.html", "index.html.gz"]
+
+
+class TestTeeWriter:
+    def test_write(self):
+        stream = io.StringIO()
+        tee = TeeWriter(stream)
+        tee.write("<p>")
+        tee.write("text</p>")
+        assert stream.getvalue() == tee.getvalue() == "<p>text</p>"
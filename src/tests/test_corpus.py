@@ -0,0 +1,24 @@
+from corpus import CorpusSettings, generate_documents, write_corpus
+from page_formatter import extract_title, markdown_to_html_node
+from splitblocks import markdown_to_blocks
+
+
+class TestCorpus:
+    def test_same_settings_same_corpus(self):
+        settings = CorpusSettings(pages=3, blocks=10)
+        assert generate_documents(settings) == generate_documents(settings)
+
+    def test_different_seed_different_corpus(self):
+        assert generate_documents(CorpusSettings(pages=3, seed=1)) != \
+            generate_documents(CorpusSettings(pages=3, seed=2))
+
+    def test_documents_can_be_rendered(self):
+        for document in generate_documents(CorpusSettings(pages=10, blocks=30)):
+            assert extract_title(document)
+            assert len(markdown_to_blocks(document)) == 31
+            assert markdown_to_html_node(document).to_html().startswith("<div><h1>")
+
+    def test_write_corpus(self, tmp_path):
+        paths = write_corpus(tmp_path, CorpusSettings(pages=5, blocks=2), pages_per_directory=2)
+        assert len(paths) == 5
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["section_0", "section_1", "section_2"]
@@ -0,0 +1,177 @@
+import io
+import random
+from pathlib import Path
+
+import pytest
+
+import fastparser
+import page_formatter
+from blockcache import BlockCache
+from corpus import CorpusSettings, generate_documents
+from linkindex import collect_links
+from searchindex import collect_text
+from splitblocks import iter_blocks
+
+
+CONTENT_DIR = Path(__file__).parent.parent.parent / "content"
+
+# Documents of the tests of page_formatter, splitblocks and splitinlines, and their edge cases
+TEST_DOCUMENTS = [
+    "This is **text** with an *italic* word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)",
+    "This is **bold text** and **another bold** section.",
+    "*entire text as italic*",
+    "# Tolkien Fan Club\n\n**I like Tolkien**. Read my [first post here](/majesty)\n\n> All that is gold does not glitter",
+    "# [Home](/)\n\nSee ![logo](/logo.png) and [post](blog/post.html)\n\n* [a](a.html)",
+    "- [Wikipedia](https://en.wikipedia.org/wiki/NP_(complexity)) ",
+    "> Documentation\n> - [Wikipedia](https://en.wikipedia.org/wiki/NP_(complexity))\n> - [Vidéo](https://youtu.be/zVLSrrIKKF0)",
+    "```python\nprint('hello')\n```",
+    "```\n\n```",
+    "``````",
+    "```a```",
+    "### #### Someone made a space",
+    "####### seven",
+    "#no space",
+    "# two\nlines",
+    "1. a\n2. b\n3. c",
+    "1. a\n3. b",
+    "1. a\n2. b\n3. c\n4. d\n5. e\n6. f\n7. g\n8. h\n9. i\n10. j",
+    "* a\n- b\n* c",
+    "* a\n-b",
+    "**bold** paragraph",
+    "> a\n>\n> b",
+    "> a\nb",
+    "[x ![c](d)](e)",
+    "![](empty.png) and [](empty.html) text",
+    "[t(o@boot dev]]](htttps://www.boo}t.dev)",
+    "[a\n](b) [c](d\n) [e](f)",
+    "a **b [l](u) c** d",
+    "***a***",
+    "**a*b**",
+    "*a`b*",
+    "`a*b`",
+    "text\xa0with\xa0spaces\n\n\n\nand blocks \t\n\n",
+    " \n\n# heading ",
+]
+
+# Documents whose blocks can not be rendered: an unmatched delimiter, or no inline element
+INVALID_DOCUMENTS = [
+    "`code block` text with non closed `delimiter",
+    "****",
+    "![](image.png)",
+    "# a\n\n**b",
+    "*a**b**c*",
+    "- a\n- [](x)",
+    "",
+    "\n\n  \n",
+]
+
+FUZZ_PIECES = ["# ", "## ", "####### ", "#", "word", " ", "\t", "**b**", "*i*", "`c`", "[l](u)", "![a](i)",
+               "![](i)", "[](x)", "\n", "\n\n", "- ", "* ", "1. ", "2. ", "> ", ">", "```", "\xa0",
+               "*", "**", "`", "[", "]", "(", ")", "!", "](", "<br>"]
+
+
+def render(function, markdown):
+    """Return the html, the urls of the links and the texts collected while rendering
+    a document, or the type and the message of the error raised"""
+    with collect_links() as links, collect_text() as texts:
+        try:
+            html = function(markdown)
+        except Exception as error:
+            return type(error), str(error)
+    return html, links, texts
+
+
+def assert_same_rendering(markdown):
+    expected = render(page_formatter.markdown_to_html, markdown)
+    assert render(fastparser.markdown_to_html, markdown) == expected, markdown
+    assert render(lambda text: fastparser.markdown_to_html_node(text).to_html(), markdown)[0] == expected[0], markdown
+
+
+class TestSameRenderingAsReference:
+    @pytest.mark.parametrize("markdown", TEST_DOCUMENTS + INVALID_DOCUMENTS)
+    def test_test_documents(self, markdown):
+        assert_same_rendering(markdown)
+
+    def test_site_content(self):
+        documents = [path.read_text() for path in sorted(CONTENT_DIR.rglob("*.md"))]
+        assert documents
+        for document in documents:
+            assert_same_rendering(document)
+
+    def test_corpus(self):
+        for document in generate_documents(CorpusSettings(pages=30, seed=5)):
+            assert_same_rendering(document)
+
+    def test_fuzzed_documents(self):
+        generator = random.Random(2024)
+        for _ in range(5000):
+            assert_same_rendering("".join(generator.choice(FUZZ_PIECES) for _ in range(generator.randint(0, 20))))
+
+    def test_fuzzed_inline_text(self):
+        pieces = ["a", " ", "*", "**", "`", "[", "]", "(", ")", "!", "](", "\n", "![x](y)", "[l](p)"]
+        generator = random.Random(77)
+        for _ in range(5000):
+            text = "".join(generator.choice(pieces) for _ in range(generator.randint(1, 12)))
+            assert_same_rendering(f"paragraph {text}")
+
+
+class TestErrors:
+    def test_unmatched_delimiter_raises_the_reference_error(self):
+        with pytest.raises(Exception, match="Unmatched delimiter '`'"):
+            fastparser.markdown_to_html("`code block` text with non closed `delimiter")
+
+    def test_empty_document(self):
+        with pytest.raises(ValueError):
+            fastparser.markdown_to_html("")
+        with pytest.raises(ValueError):
+            list(fastparser.iter_html_fragments(iter_blocks(io.StringIO("\n\n  \n"))))
+
+    def test_block_without_inline_element(self):
+        with pytest.raises(ValueError):
+            fastparser.block_to_html("![](image.png)")
+
+
+class TestStateMachine:
+    @pytest.mark.parametrize("text, html", [
+        ("a **b** *c* `d`", "a <b>b</b> <i>c</i> <code>d</code>"),
+        ("**a*b`c**", "<b>a*b`c</b>"),
+        ("*a`b*", "<i>a`b</i>"),
+        ("a ** b", None),
+        ("*a**b**c*", None),
+        ("`a*b`", None),
+    ])
+    def test_delimiters(self, text, html):
+        parts, words = [], []
+        if html is None:
+            assert not fastparser.delimiters_to_html(text, parts, words)
+        else:
+            assert fastparser.delimiters_to_html(text, parts, words)
+            assert "".join(parts) == html
+
+    def test_text_to_html(self):
+        links = []
+        assert fastparser.text_to_html("a **b** [l](u) ![i](s)", links) == \
+            ('a <b>b</b> <a href="u">l</a> <img src="s" alt="i"></img>', "a b l i")
+        assert links == ["u", "s"]
+
+    def test_find_bracket(self):
+        assert fastparser.find_bracket("x ![a](b) [c](d)", "![", 0, 16) == (2, "a", "b", 9)
+        assert fastparser.find_bracket("x ![a](b) [c](d)", "[", 9, 16) == (10, "c", "d", 16)
+        assert fastparser.find_bracket("[a\n](b) [c](d)", "[", 0, 14) == (8, "c", "d", 14)
+        assert fastparser.find_bracket("[a](b)", "[", 0, 5) is None
+
+
+class TestFragments:
+    def test_streamed_blocks_same_html(self):
+        for document in generate_documents(CorpusSettings(pages=3, blocks=20, seed=8)):
+            blocks = iter_blocks(io.StringIO(document), chunk_size=100)
+            assert "".join(fastparser.iter_html_fragments(blocks)) == page_formatter.markdown_to_html(document)
+
+    def test_cached_blocks(self):
+        markdown = "# [Home](/)\n\nSee ![logo](/logo.png)\n\nSee ![logo](/logo.png)"
+        cache = BlockCache()
+        fastparser.markdown_to_html(markdown, cache)
+        with collect_links() as links, collect_text() as texts:
+            html = fastparser.markdown_to_html(markdown, cache)
+        assert cache.hits == 4 and cache.misses == 2  # the repeated block is a hit of the first render
+        assert render(page_formatter.markdown_to_html, markdown) == (html, links, texts)
@@ -0,0 +1,113 @@
+import pytest
+
+from fileio import MappedIO, SyncIO, ThreadedIO, make_io_backend
+
+
+@pytest.fixture(params=["sync", "threaded", "mmap"])
+def backend(request):
+    backend = make_io_backend(request.param, threads=2)
+    yield backend
+    backend.close()
+
+
+class TestIOBackends:
+    def test_read_text(self, backend, tmp_path):
+        path = tmp_path / "index.md"
+        path.write_text("# Title")
+        assert backend.read_text(path) == "# Title"
+
+    def test_read_prefetched_files(self, backend, tmp_path):
+        paths = [tmp_path / f"page_{i}.md" for i in range(50)]
+        for i, path in enumerate(paths):
+            path.write_text(f"# Page {i}")
+        backend.prefetch(paths)
+        assert [backend.read_text(path) for path in paths] == [f"# Page {i}" for i in range(50)]
+
+    def test_write_is_done_after_flush(self, backend, tmp_path):
+        path = tmp_path / "index.html"
+        with backend.open_write(path) as stream:
+            stream.write("<p>")
+            stream.write("page</p>")
+        backend.flush()
+        assert path.read_text() == "<p>page</p>"
+
+    def test_written_is_called_once_the_file_is_in_place(self, backend, tmp_path):
+        path = tmp_path / "index.html"
+        written = []
+        with backend.open_write(path, written=lambda: written.append(path.read_text())) as stream:
+            stream.write("<p>page</p>")
+        backend.flush()
+        assert written == ["<p>page</p>"]
+
+    def test_error_while_writing_keeps_the_previous_file(self, backend, tmp_path):
+        path = tmp_path / "index.html"
+        path.write_text("<p>previous</p>")
+        with pytest.raises(ValueError):
+            with backend.open_write(path) as stream:
+                stream.write("<p>partial")
+                raise ValueError("render error")
+        backend.flush()
+        assert path.read_text() == "<p>previous</p>"
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_invalid_backend(self):
+        with pytest.raises(ValueError):
+            make_io_backend("async")
+
+
+class TestMappedIO:
+    def test_open_mapping(self, tmp_path):
+        path = tmp_path / "index.md"
+        path.write_text("# Title\n\ntext")
+        with MappedIO().open_mapping(path) as mapping:
+            assert mapping[:7] == b"# Title"
+            assert mapping.read() == b"# Title\n\ntext"
+
+    def test_open_empty_file(self, tmp_path):
+        path = tmp_path / "index.md"
+        path.write_text("")
+        with MappedIO().open_mapping(path) as mapping:
+            assert mapping.read() == b""
+
+
+class TestThreadedIO:
+    def test_pending_writes_are_bounded(self, tmp_path):
+        backend = ThreadedIO(threads=2, max_pending=4)
+        for i in range(20):
+            with backend.open_write(tmp_path / f"page_{i}.html") as stream:
+                stream.write(str(i))
+            assert len(backend.writes) <= 4
+        backend.close()
+        assert (tmp_path / "page_19.html").read_text() == "19"
+
+    def test_failed_write_keeps_the_previous_file(self, tmp_path):
+        path = tmp_path / "index.html"
+        path.write_text("<p>previous</p>")
+        backend = ThreadedIO(threads=1)
+        with backend.open_write(path) as stream:
+            stream.write("<p>partial" + "\ud800")  # can not be encoded, once the text is written
+        with pytest.raises(UnicodeEncodeError):
+            backend.close()
+        assert path.read_text() == "<p>previous</p>"
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_write_error_names_the_file(self, tmp_path):
+        backend = ThreadedIO(threads=1)
+        with backend.open_write(tmp_path / "missing" / "index.html") as stream:
+            stream.write("<p>page</p>")
+        with pytest.raises(Exception, match="index.html"):
+            backend.close()
+
+    def test_read_without_prefetch(self, tmp_path):
+        path = tmp_path / "index.md"
+        path.write_text("# Title")
+        backend = ThreadedIO(threads=1)
+        assert backend.read_text(path) == "# Title"
+        backend.close()
+
+
+class TestSyncIO:
+    def test_write_is_done_on_close(self, tmp_path):
+        with SyncIO().open_write(tmp_path / "index.html") as stream:
+            stream.write("<p>page</p>")
+        assert (tmp_path / "index.html").read_text() == "<p>page</p>"
@@ -1,3 +1,5 @@
+import io
+
 import pytest
 from unittest import main, TestCase
 
@@ -30,6 +32,11 @@ class TestHTMLNode(TestCase):
         self.assertEqual(node.props_to_html(), 'href="https://www.google.com" target="_blank"')
 
 
+    def test_no_instance_dict(self):
+        for node in [HTMLNode(), LeafNode(Tag.B, "bold"), ParentNode(Tag.P, [LeafNode(None, "text")])]:
+            self.assertFalse(hasattr(node, "__dict__"))
+
+
 class TestLeafNode(TestCase):
     def test_init_without_value(self):
         with self.assertRaises(TypeError):
@@ -83,6 +90,32 @@ class TestParentNode:
         node_p = ParentNode(Tag.P, [node_ul, node_i]) # top-parent
 
         assert node_p.to_html() == '<p><ul><li>raw text<b>BOLDMAN !</b></li><li>Another raw text<a href="https//myawesomelink.net" target="_blank">I am a hyperlink</a></li></ul><i>This is italic</i></p>'
+
+
+class TestStreamingHtml:
+    def test_iter_html_chunks(self):
+        node = ParentNode(Tag.P, [LeafNode(None, "raw text"), LeafNode(Tag.B, "bold")])
+        assert list(node.iter_html()) == ["<p>", "raw text", "<b>bold</b>", "</p>"]
+
+    def test_iter_html_code(self):
+        node = ParentNode(Tag.CODE, [LeafNode(None, "print()")])
+        assert "".join(node.iter_html()) == "<pre><code>print()</code></pre>"
+
+    def test_write_html_same_as_to_html(self):
+        node_li = ParentNode(Tag.LI, [LeafNode(None, "raw text"), LeafNode(Tag.A, "link", {"href": "url"})])
+        node = ParentNode(Tag.DIV, [ParentNode(Tag.UL, [node_li]), ParentNode(Tag.CODE, [LeafNode(None, "x")])])
+        stream = io.StringIO()
+        node.write_html(stream)
+        assert stream.getvalue() == node.to_html()
+
+    def test_write_html_leaf(self):
+        stream = io.StringIO()
+        LeafNode(Tag.I, "italic").write_html(stream)
+        assert stream.getvalue() == "<i>italic</i>"
+
+    def test_write_html_no_children(self):
+        with pytest.raises(ValueError):
+            ParentNode(Tag.UL, children=[]).write_html(io.StringIO())
         
 if __name__ == '__main__':
     main()
\ No newline at end of file
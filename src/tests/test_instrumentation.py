@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+
+import pytest
+
+import instrumentation
+from instrumentation import BuildProfiler
+
+
+class TestBuildProfiler:
+    def test_stage_records_time_and_calls(self):
+        profiler = BuildProfiler()
+        for _ in range(3):
+            with profiler.stage("read"):
+                pass
+        assert profiler.totals["read"][1] == 3
+
+    def test_nested_stage_time_is_not_counted_twice(self):
+        profiler = BuildProfiler()
+        with profiler.stage("outer"):
+            with profiler.stage("inner"):
+                time.sleep(0.02)
+        assert profiler.totals["inner"][0] >= 0.02
+        assert profiler.totals["outer"][0] < 0.01
+
+    def test_stages_attributed_to_page(self):
+        profiler = BuildProfiler()
+        with profiler.page("index.md"):
+            with profiler.stage("read"):
+                pass
+        with profiler.stage("read"):
+            pass
+        assert set(profiler.pages["index.md"]) == {"page", "read"}
+        assert profiler.totals["read"][1] == 2
+
+    def test_stages_of_concurrent_threads(self):
+        profiler = BuildProfiler()
+        in_page = threading.Event()
+        thread_done = threading.Event()
+
+        def write():
+            in_page.wait()
+            with profiler.stage("write"):
+                time.sleep(0.02)
+            thread_done.set()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        with profiler.page("index.md"):
+            with profiler.stage("render"):
+                in_page.set()
+                thread_done.wait()
+        thread.join()
+        assert set(profiler.pages["index.md"]) == {"page", "render"}  # not the stage of the thread
+        assert profiler.totals["render"][0] >= 0.02  # the time of the thread is not a nested stage
+        assert profiler.totals["write"][1] == 1
+
+    def test_slowest_pages(self):
+        profiler = BuildProfiler()
+        with profiler.page("fast.md"):
+            pass
+        with profiler.page("slow.md"):
+            time.sleep(0.01)
+        assert profiler.slowest_pages(1) == ["slow.md"]
+        assert "slow.md" in profiler.report(slowest=1)
+
+    def test_drain_and_merge(self):
+        worker = BuildProfiler(trace=True)
+        with worker.page("index.md"):
+            with worker.stage("read"):
+                pass
+        profiler = BuildProfiler(trace=True)
+        profiler.merge(worker.drain())
+        assert worker.totals == {}
+        assert profiler.totals["read"][1] == 1
+        assert "index.md" in profiler.pages
+        assert len(profiler.events) == 2
+
+    def test_chrome_trace(self, tmp_path):
+        profiler = BuildProfiler(trace=True)
+        with profiler.stage("read"):
+            pass
+        profiler.write_chrome_trace(tmp_path / "trace.json")
+        events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+        assert events[0]["name"] == "read"
+        assert events[0]["ph"] == "X"
+
+    def test_no_events_without_trace(self):
+        profiler = BuildProfiler()
+        with profiler.stage("read"):
+            pass
+        assert profiler.events == []
+
+
+class TestModuleProfiler:
+    @pytest.fixture(autouse=True)
+    def disable_after_test(self):
+        yield
+        instrumentation.disable()
+
+    def test_disabled_stage_records_nothing(self):
+        instrumentation.disable()
+        with instrumentation.stage("read"):
+            pass
+        assert instrumentation.PROFILER is None
+
+    def test_enabled_stage(self):
+        profiler = instrumentation.enable()
+        with instrumentation.page("index.md"):
+            with instrumentation.stage("read"):
+                pass
+        assert profiler.pages["index.md"]["read"] >= 0
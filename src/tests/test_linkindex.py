@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from linkindex import LinkIndex, add_link, add_links, collect_links, resolve_url
+
+
+class TestResolveUrl:
+    def test_relative_url(self):
+        assert resolve_url("post.html", "blog") == "blog/post.html"
+        assert resolve_url("../index.css", "blog") == "index.css"
+        assert resolve_url("./images/a.png", ".") == "images/a.png"
+
+    def test_absolute_url(self):
+        assert resolve_url("/images/a.png", "blog") == "images/a.png"
+        assert resolve_url("/", "blog") == "."
+
+    def test_query_fragment_and_quoting_are_ignored(self):
+        assert resolve_url("post.html#part?x", "blog") == "blog/post.html"
+        assert resolve_url("/my%20page.html?lang=en", ".") == "my page.html"
+
+    def test_external_urls_are_not_checked(self):
+        for url in ["https://www.boot.dev", "mailto:me@example.com", "//cdn.example.com/a.js", "#top", ""]:
+            assert resolve_url(url, ".") is None
+
+    def test_url_above_the_root(self):
+        assert resolve_url("../../a.html", "blog") == "../a.html"
+
+
+class TestCollectLinks:
+    def test_links_are_collected_inside_only(self):
+        add_link("outside")
+        with collect_links() as links:
+            add_link("a.html")
+            add_links(["b.html", "c.png"])
+        assert links == ["a.html", "b.html", "c.png"]
+
+    def test_nested_collection(self):
+        with collect_links() as outer:
+            with collect_links() as inner:
+                add_link("a.html")
+            add_links(inner)
+            add_link("b.html")
+        assert inner == ["a.html"]
+        assert outer == ["a.html", "b.html"]
+
+    def test_collections_of_threads_are_separate(self):
+        collecting = threading.Event()
+        main_collecting = threading.Event()
+        added = threading.Event()
+        thread_links = []
+
+        def render():
+            with collect_links() as links:
+                collecting.set()
+                main_collecting.wait()
+                add_link("thread.html")
+                added.set()
+            thread_links.extend(links)
+
+        thread = threading.Thread(target=render)
+        thread.start()
+        collecting.wait()
+        with collect_links() as links:
+            main_collecting.set()
+            added.wait()
+            add_link("main.html")
+        thread.join()
+        assert links == ["main.html"]
+        assert thread_links == ["thread.html"]
+
+
+class TestLinkIndex:
+    @pytest.fixture
+    def public(self, tmp_path):
+        (tmp_path / "blog" / "first").mkdir(parents=True)
+        (tmp_path / "index.html").write_text("")
+        (tmp_path / "index.css").write_text("")
+        (tmp_path / "blog" / "post.html").write_text("")
+        (tmp_path / "blog" / "first" / "index.html").write_text("")
+        return tmp_path
+
+    def test_dangling_links(self, public):
+        index = LinkIndex()
+        index.add(public / "index.html", ["/index.css", "blog/post.html", "blog/missing.html",
+                                          "https://www.boot.dev", "/blog/first/", "/blog"])
+        index.add(public / "blog" / "post.html", ["../index.css", "first", "../../outside.html",
+                                                  "missing.html", "/"])
+        assert index.dangling(public) == [
+            (public / "index.html", "blog/missing.html"),
+            (public / "index.html", "/blog"),
+            (public / "blog" / "post.html", "../../outside.html"),
+            (public / "blog" / "post.html", "missing.html"),
+        ]
+        assert index.links_count() == 11
@@ -0,0 +1,455 @@
+import gzip
+import os
+
+import pytest
+
+import assetsync
+import buildlog
+import main
+from fileio import make_io_backend
+from htmlnode import Tag, LeafNode, ParentNode
+from main import build_incremental, generate_pages_recursive
+
+
+def count_generated_pages(monkeypatch):
+    """Record the markdown sources passed to generate_page"""
+    generated = []
+    generate_page = main.generate_page
+
+    def counting_generate_page(from_path, template_path, dest_path, **kwargs):
+        generated.append(from_path.name)
+        generate_page(from_path, template_path, dest_path, **kwargs)
+
+    monkeypatch.setattr(main, "generate_page", counting_generate_page)
+    return generated
+
+
+def incremental_build(site):
+    build_incremental(content_dir=site / "content", static_dir=site / "static",
+                      template_path=site / "template.html", public_dir=site / "public",
+                      manifest_path=site / ".cache" / "manifest.json")
+
+
+class TestFullBuild:
+    def test_generate_pages_recursive(self, site):
+        generate_pages_recursive(site / "content", site / "template.html", site / "public")
+        assert (site / "public" / "index.html").read_text() == \
+            "<html><title>Home</title><body><div><h1>Home</h1><p>Welcome <b>home</b></p></div></body></html>"
+        assert (site / "public" / "blog" / "post.html").exists()
+
+
+    def test_generate_page_with_transform(self, site):
+        def add_footer(node):
+            node.children.append(ParentNode(Tag.P, [LeafNode(None, "footer")]))
+            return node
+
+        main.generate_page(site / "content" / "index.md", site / "template.html", site / "public",
+                           transform=add_footer)
+        assert (site / "public" / "index.html").read_text() == \
+            "<html><title>Home</title><body><div><h1>Home</h1><p>Welcome <b>home</b></p><p>footer</p></div></body></html>"
+
+
+    def test_render_error_of_a_streamed_page_keeps_the_previous_document(self, site):
+        main.generate_page(site / "content" / "index.md", site / "template.html", site / "public")
+        previous = (site / "public" / "index.html").read_text()
+        (site / "content" / "index.md").write_text("# Home\n\nWelcome\n\nnon closed `delimiter")
+        with pytest.raises(Exception, match="Unmatched delimiter"):
+            main.generate_page(site / "content" / "index.md", site / "template.html", site / "public",
+                               file_io=make_io_backend("mmap"))
+        assert (site / "public" / "index.html").read_text() == previous
+        assert sorted(path.name for path in (site / "public").iterdir()) == ["index.html"]
+
+
+class TestIncrementalBuild:
+    def test_first_build_generates_all_pages(self, site, monkeypatch):
+        generated = count_generated_pages(monkeypatch)
+        incremental_build(site)
+        assert sorted(generated) == ["index.md", "post.md"]
+        assert (site / "public" / "index.css").exists()
+
+    def test_unchanged_pages_are_skipped(self, site, monkeypatch):
+        incremental_build(site)
+        generated = count_generated_pages(monkeypatch)
+        incremental_build(site)
+        assert generated == []
+
+    def test_changed_page_is_regenerated(self, site, monkeypatch):
+        incremental_build(site)
+        (site / "content" / "index.md").write_text("# Home\n\nChanged")
+        generated = count_generated_pages(monkeypatch)
+        incremental_build(site)
+        assert generated == ["index.md"]
+        assert "Changed" in (site / "public" / "index.html").read_text()
+
+    def test_template_change_regenerates_all_pages(self, site, monkeypatch):
+        incremental_build(site)
+        (site / "template.html").write_text("<main>{{ Content }}</main>")
+        generated = count_generated_pages(monkeypatch)
+        incremental_build(site)
+        assert sorted(generated) == ["index.md", "post.md"]
+
+    def test_deleted_static_file_is_removed(self, site):
+        incremental_build(site)
+        (site / "static" / "index.css").unlink()
+        incremental_build(site)
+        assert not (site / "public" / "index.css").exists()
+        assert (site / "public" / "index.html").exists()
+
+    def test_deleted_source_removes_page(self, site):
+        incremental_build(site)
+        (site / "content" / "blog" / "post.md").unlink()
+        incremental_build(site)
+        assert not (site / "public" / "blog" / "post.html").exists()
+        assert (site / "public" / "index.html").exists()
+
+    def test_unchanged_sources_are_not_hashed(self, site, monkeypatch):
+        for path in [site / "content" / "index.md", site / "content" / "blog" / "post.md"]:
+            os.utime(path, ns=(0, 10**9))  # long before the scans
+        incremental_build(site)
+        hashed = []
+        hash_file = main.hash_file
+        monkeypatch.setattr(main, "hash_file", lambda path: hashed.append(path.name) or hash_file(path))
+        incremental_build(site)
+        assert hashed == ["template.html"]
+
+        (site / "content" / "index.md").write_text("# Home\n\nWelcome  home")
+        os.utime(site / "content" / "index.md", ns=(0, 2 * 10**9))
+        generated = count_generated_pages(monkeypatch)
+        incremental_build(site)
+        assert generated == ["index.md"]
+        assert hashed[1:] == ["template.html", "index.md"]
+
+
+class TestFullAfterIncrementalBuild:
+    def build(self, site, *options):
+        main.build(main.parse_args(list(options)), content_dir=site / "content",
+                   static_dir=site / "static", template_path=site / "template.html",
+                   public_dir=site / "public", cache_dir=site / ".cache")
+
+    def test_static_files_of_a_full_build_are_unchanged_for_the_next_incremental(self, site, monkeypatch):
+        self.build(site)
+        transferred = []
+        monkeypatch.setattr(assetsync, "transfer_file", lambda src, dst, mode: transferred.append(src))
+        self.build(site, "--incremental")
+        assert transferred == []
+
+    def test_incremental_build_after_a_full_build(self, site):
+        self.build(site, "--incremental")
+        index = site / "content" / "index.md"
+        index.write_text("# Home\n\nEdited")
+        self.build(site)
+        assert not (site / ".cache" / "manifest.json").exists()
+        index.write_text("# Home\n\nWelcome **home**")
+        self.build(site, "--incremental")
+        assert "<b>home</b>" in (site / "public" / "index.html").read_text()
+
+    @pytest.mark.parametrize("options", [[], ["--asset-mode", "hardlink"]])
+    def test_static_file_hidden_by_a_page(self, site, options):
+        self.build(site)
+        expected = (site / "public" / "index.html").read_text()
+        self.build(site, "--incremental", *options)
+        (site / "static" / "index.html").write_text("<p>static</p>")
+        for _ in range(2):
+            self.build(site, "--incremental", *options)
+            assert (site / "public" / "index.html").read_text() == expected
+        (site / "static" / "index.html").unlink()
+        self.build(site, "--incremental", *options)
+        assert (site / "public" / "index.html").read_text() == expected
+
+    def test_static_file_synchronised_before_its_page(self, site):
+        (site / "content" / "index.md").unlink()
+        (site / "static" / "index.html").write_text("<p>static</p>")
+        self.build(site, "--incremental", "--asset-mode", "hardlink")
+        (site / "content" / "index.md").write_text("# Home\n\nWelcome **home**")
+        self.build(site, "--incremental", "--asset-mode", "hardlink")
+        assert "<b>home</b>" in (site / "public" / "index.html").read_text()
+        assert (site / "static" / "index.html").read_text() == "<p>static</p>"
+
+    def test_full_build_removes_the_shard_manifests(self, site):
+        self.build(site, "--shard", "1/2")
+        self.build(site)
+        assert not (site / ".cache" / "shards").exists()
+
+
+class TestParallelBuild:
+    def test_output_identical_to_serial_build(self, site, tmp_path_factory):
+        for index in range(20):
+            (site / "content" / f"page_{index}.md").write_text(f"# Page {index}\n\n* item **{index}**")
+        generate_pages_recursive(site / "content", site / "template.html", site / "public")
+        parallel_public = tmp_path_factory.mktemp("parallel_public")
+        generate_pages_recursive(site / "content", site / "template.html", parallel_public, jobs=4)
+
+        serial_files = sorted(path.relative_to(site / "public") for path in (site / "public").rglob("*.html"))
+        parallel_files = sorted(path.relative_to(parallel_public) for path in parallel_public.rglob("*.html"))
+        assert serial_files == parallel_files
+        for path in serial_files:
+            assert (site / "public" / path).read_bytes() == (parallel_public / path).read_bytes()
+
+    def test_worker_error_names_source_file(self, site):
+        (site / "content" / "broken.md").write_text("no title in this document")
+        with pytest.raises(Exception, match="broken.md"):
+            generate_pages_recursive(site / "content", site / "template.html", site / "public", jobs=2)
+
+    def test_parse_args_jobs(self):
+        assert main.parse_args(["--jobs", "4"]).jobs == 4
+        assert main.parse_args([]).jobs == 1
+        assert main.parse_args(["--jobs", "0"]).jobs >= 1
+
+
+class TestIOBackendsBuild:
+    @pytest.mark.parametrize("backend, jobs", [("threaded", 1), ("mmap", 1), ("mmap", 2)])
+    def test_output_identical_to_sync_build(self, site, tmp_path_factory, backend, jobs):
+        for index in range(20):
+            (site / "content" / f"page_{index}.md").write_text(f"# Page {index}\r\n\r\n> quote {index}\xa0é")
+        generate_pages_recursive(site / "content", site / "template.html", site / "public")
+        other_public = tmp_path_factory.mktemp("other_public")
+        file_io = make_io_backend(backend, threads=4)
+        generate_pages_recursive(site / "content", site / "template.html", other_public,
+                                 jobs=jobs, file_io=file_io)
+        file_io.close()
+
+        for path in (site / "public").rglob("*.html"):
+            assert path.read_bytes() == (other_public / path.relative_to(site / "public")).read_bytes()
+
+    def test_mmap_page_with_transform(self, site):
+        main.generate_page(site / "content" / "index.md", site / "template.html", site / "public",
+                           file_io=make_io_backend("mmap"), transform=lambda node: node)
+        assert "<h1>Home</h1>" in (site / "public" / "index.html").read_text()
+
+
+class TestParserBackendsBuild:
+    def build(self, site, public_dir, *options):
+        main.build(main.parse_args(list(options)), content_dir=site / "content",
+                   static_dir=site / "static", template_path=site / "template.html",
+                   public_dir=public_dir, cache_dir=site / ".cache")
+
+    @pytest.mark.parametrize("options", [[], ["--jobs", "2"], ["--io", "mmap"], ["--tree-cache"],
+                                         ["--block-cache", "10", "--search-index"], ["--incremental"]])
+    def test_output_identical_to_reference_build(self, site, tmp_path_factory, options):
+        (site / "content" / "list.md").write_text("# List\n\n* [a](a.html)\n* `b` ![c](c.png)\n\n1. **d**")
+        self.build(site, site / "public", *options)
+        fast_public = tmp_path_factory.mktemp("fast_public")
+        for _ in range(2):  # parsed, then from the caches
+            self.build(site, fast_public, "--parser", "fast", *options)
+
+        paths = sorted(path.relative_to(site / "public") for path in (site / "public").rglob("*") if path.is_file())
+        assert paths == sorted(path.relative_to(fast_public) for path in fast_public.rglob("*") if path.is_file())
+        for path in paths:
+            assert (site / "public" / path).read_bytes() == (fast_public / path).read_bytes()
+
+    def test_trees_cached_per_parser_backend(self, site):
+        self.build(site, site / "public", "--tree-cache")
+        self.build(site, site / "public", "--tree-cache", "--parser", "fast")
+        assert [path.name.endswith("-fast") for path in (site / ".cache" / "trees").iterdir()] == [True]
+
+
+class TestCheckLinks:
+    @pytest.fixture
+    def linked_site(self, site):
+        (site / "content" / "index.md").write_text(
+            "# Home\n\n[post](blog/post.html) [css](/index.css) [gone](blog/gone.html)")
+        (site / "content" / "blog" / "post.md").write_text("# Post\n\n![missing](../logo.png) [home](/)")
+        return site
+
+    def build(self, site, *options):
+        link_index = main.build(main.parse_args(["--check-links", *options]), content_dir=site / "content",
+                                static_dir=site / "static", template_path=site / "template.html",
+                                public_dir=site / "public", cache_dir=site / ".cache")
+        main.report_broken_links(link_index, site / "public")
+
+    @pytest.mark.parametrize("options", [[], ["--jobs", "2"], ["--block-cache", "10"], ["--io", "mmap"]])
+    def test_broken_links_are_reported(self, linked_site, capsys, options):
+        self.build(linked_site, *options)
+        assert capsys.readouterr().out == "2 broken links out of 5 links in 2 pages\n"
+
+    def test_links_of_skipped_pages_come_from_the_manifest(self, linked_site, capsys, monkeypatch):
+        self.build(linked_site, "--incremental")
+        (linked_site / "static" / "logo.png").write_bytes(b"png")
+        generated = count_generated_pages(monkeypatch)
+        self.build(linked_site, "--incremental")
+        assert generated == []
+        assert capsys.readouterr().out.splitlines()[-1] == "1 broken links out of 5 links in 2 pages"
+
+    def test_pages_without_recorded_links_are_rendered_again(self, linked_site, capsys, monkeypatch):
+        main.build(main.parse_args(["--incremental"]), content_dir=linked_site / "content",
+                   static_dir=linked_site / "static", template_path=linked_site / "template.html",
+                   public_dir=linked_site / "public", cache_dir=linked_site / ".cache")
+        generated = count_generated_pages(monkeypatch)
+        self.build(linked_site, "--incremental")
+        assert sorted(generated) == ["index.md", "post.md"]
+
+
+class TestTreeCacheBuild:
+    def build(self, site, *options):
+        main.build(main.parse_args(["--tree-cache", *options]), content_dir=site / "content",
+                   static_dir=site / "static", template_path=site / "template.html",
+                   public_dir=site / "public", cache_dir=site / ".cache")
+
+    @pytest.mark.parametrize("options", [[], ["--jobs", "2"], ["--io", "mmap"], ["--block-cache", "10"]])
+    def test_output_identical_with_cached_trees(self, site, options, monkeypatch):
+        generate_pages_recursive(site / "content", site / "template.html", site / "public")
+        expected = {path: path.read_bytes() for path in (site / "public").rglob("*.html")}
+
+        self.build(site, *options)
+        assert len(list((site / ".cache" / "trees").rglob("*"))) == 3  # version directory and 2 trees
+        monkeypatch.setattr(main, "TreeCache", CountingTreeCache)
+        self.build(site, *options)
+        assert {path: path.read_bytes() for path in (site / "public").rglob("*.html")} == expected
+        assert (CountingTreeCache.last.hits, CountingTreeCache.last.misses) == (2, 0)
+
+    @pytest.mark.parametrize("options", [[], ["--jobs", "2"]])
+    def test_full_build_removes_the_unused_trees(self, site, options):
+        self.build(site, *options)
+        (site / "content" / "index.md").write_text("# Home\n\nEdited")
+        self.build(site, "--incremental", *options)
+        trees = site / ".cache" / "trees"
+        assert len([path for path in trees.rglob("*") if path.is_file()]) == 3  # the tree of the edit added
+        self.build(site, *options)
+        assert len([path for path in trees.rglob("*") if path.is_file()]) == 2
+
+
+    def test_transform_gets_the_cached_tree(self, site):
+        tree_cache = main.TreeCache(site / ".cache" / "trees", version="1")
+        for _ in range(2):
+            main.generate_page(site / "content" / "index.md", site / "template.html", site / "public",
+                               tree_cache=tree_cache,
+                               transform=lambda node: ParentNode(Tag.DIV, [node, LeafNode(Tag.P, "footer")]))
+        assert tree_cache.hits == 1
+        assert (site / "public" / "index.html").read_text() == \
+            "<html><title>Home</title><body><div><div><h1>Home</h1><p>Welcome <b>home</b></p></div><p>footer</p></div></body></html>"
+
+
+class CountingTreeCache(main.TreeCache):
+    last = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingTreeCache.last = self
+
+
+class TestSearchIndexBuild:
+    def build(self, site, *options):
+        main.build(main.parse_args(["--search-index", *options]), content_dir=site / "content",
+                   static_dir=site / "static", template_path=site / "template.html",
+                   public_dir=site / "public", cache_dir=site / ".cache")
+
+    def read_search_files(self, site):
+        return {path.relative_to(site / "public").as_posix(): path.read_text()
+                for path in (site / "public" / "search").rglob("*.json")}
+
+    @pytest.mark.parametrize("options", [["--jobs", "2"], ["--io", "mmap"], ["--block-cache", "10"],
+                                         ["--tree-cache"], ["--incremental"]])
+    def test_index_identical_with_all_options(self, site, options):
+        self.build(site)
+        expected = self.read_search_files(site)
+        assert expected["search/terms/ho.json"] == '{"home":[1,2]}'  # blog/post.html is document 0
+        for _ in range(2):  # the second build with the caches filled
+            self.build(site, *options)
+            assert self.read_search_files(site) == expected
+
+    def test_incremental_build_indexes_the_changed_pages(self, site, monkeypatch):
+        self.build(site, "--incremental")
+        (site / "content" / "blog" / "post.md").write_text("# Post\n\nA *search*")
+        generated = count_generated_pages(monkeypatch)
+        self.build(site, "--incremental")
+        assert generated == ["post.md"]
+        files = self.read_search_files(site)
+        assert files["search/terms/se.json"] == '{"search":[0,1]}'
+        assert "search/terms/po.json" in files  # the title is still indexed
+
+    def test_incremental_build_renders_the_pages_missing_from_the_index(self, site, monkeypatch):
+        main.build(main.parse_args(["--incremental"]), content_dir=site / "content",
+                   static_dir=site / "static", template_path=site / "template.html",
+                   public_dir=site / "public", cache_dir=site / ".cache")
+        generated = count_generated_pages(monkeypatch)
+        self.build(site, "--incremental")
+        assert sorted(generated) == ["index.md", "post.md"]
+
+    def test_incremental_build_indexes_the_pages_changed_without_the_index(self, site, monkeypatch):
+        self.build(site, "--incremental")
+        (site / "content" / "blog" / "post.md").write_text("# Post\n\nA *search*")
+        main.build(main.parse_args(["--incremental"]), content_dir=site / "content",
+                   static_dir=site / "static", template_path=site / "template.html",
+                   public_dir=site / "public", cache_dir=site / ".cache")
+        generated = count_generated_pages(monkeypatch)
+        self.build(site, "--incremental")
+        assert generated == ["post.md"]
+        assert self.read_search_files(site)["search/terms/se.json"] == '{"search":[0,1]}'
+
+    def test_not_combined_with_shards(self):
+        with pytest.raises(SystemExit):
+            main.parse_args(["--search-index", "--shard", "1/2"])
+
+
+class TestCompressedBuild:
+    def build(self, site, *options):
+        main.build(main.parse_args(["--compress", "gzip", "--compress-min-size", "0", *options]),
+                   content_dir=site / "content", static_dir=site / "static",
+                   template_path=site / "template.html", public_dir=site / "public",
+                   cache_dir=site / ".cache")
+
+    def siblings(self, site):
+        return sorted(path.relative_to(site / "public").as_posix()
+                      for path in (site / "public").rglob("*.gz") if "search" not in path.parts)
+
+    @pytest.mark.parametrize("options", [[], ["--jobs", "2"], ["--incremental"], ["--io", "mmap"],
+                                         ["--io", "threaded"], ["--search-index"]])
+    def test_siblings_of_pages_and_assets(self, site, options):
+        self.build(site, *options)
+        assert self.siblings(site) == ["blog/post.html.gz", "index.css.gz", "index.html.gz"]
+        compressor = main.Compressor(threads=0)
+        for name in ["blog/post.html", "index.html", "index.css"]:
+            sibling = (site / "public" / (name + ".gz")).read_bytes()
+            assert gzip.decompress(sibling) == (site / "public" / name).read_bytes()
+            assert compressor.is_up_to_date(site / "public" / name)  # written after the document
+
+    def test_search_files_are_compressed(self, site):
+        self.build(site, "--search-index")
+        assert (site / "public" / "search" / "index.json.gz").exists()
+
+    def test_incremental_build_compresses_the_changed_pages(self, site):
+        self.build(site, "--incremental")
+        (site / "content" / "blog" / "post.md").write_text("# Post\n\nA *changed* post")
+        (site / "content" / "index.md").unlink()
+        self.build(site, "--incremental")
+        assert self.siblings(site) == ["blog/post.html.gz", "index.css.gz"]
+        sibling = (site / "public" / "blog" / "post.html.gz").read_bytes()
+        assert b"changed" in gzip.decompress(sibling)
+
+    def test_no_siblings_without_the_option(self, site):
+        main.build(main.parse_args([]), content_dir=site / "content", static_dir=site / "static",
+                   template_path=site / "template.html", public_dir=site / "public",
+                   cache_dir=site / ".cache")
+        assert self.siblings(site) == []
+
+
+class TestBuildLogs:
+    @pytest.fixture
+    def log_path(self, site):
+        yield site / "logs.txt"
+        buildlog.close()
+
+    def build(self, site, log_path, *options, use_queue=False, summary_only=False):
+        main.configure_logging(log_path, use_queue=use_queue, summary_only=summary_only)
+        main.build(main.parse_args(list(options)), content_dir=site / "content", static_dir=site / "static",
+                   template_path=site / "template.html", public_dir=site / "public",
+                   cache_dir=site / ".cache")
+        buildlog.close()
+        return [line.split(" - ", 2)[2] for line in log_path.read_text().splitlines()]
+
+    @pytest.mark.parametrize("options", [[], ["--jobs", "2"]])
+    def test_queue_writes_every_line(self, site, log_path, options):
+        self.build(site, log_path, *options)  # the next builds delete the same files first
+        expected = sorted(line for line in self.build(site, log_path, *options) if not line.startswith("PHASE"))
+        lines = self.build(site, log_path, *options, use_queue=True)
+        assert sorted(line for line in lines if not line.startswith("PHASE")) == expected
+        assert expected.count(f"FILE CREATED : {site / 'public' / 'index.html'}") == 1
+
+    @pytest.mark.parametrize("options", [[], ["--jobs", "2"], ["--incremental"]])
+    @pytest.mark.parametrize("use_queue", [False, True])
+    def test_summary_only(self, site, log_path, options, use_queue):
+        lines = self.build(site, log_path, *options, use_queue=use_queue, summary_only=True)
+        assert not [line for line in lines if line.startswith(("FILE", "DIRECTORY", "Generating"))]
+        phases = {line.split(" : ")[0]: line for line in lines if line.startswith("PHASE")}
+        assert ", FILE CREATED 2" in phases["PHASE pages"]  # counted by the workers with --jobs
+        assert "PHASE assets" in phases
@@ -0,0 +1,56 @@
+from manifest import Manifest, hash_file
+
+
+class TestManifest:
+    def test_load_missing_file(self, tmp_path):
+        manifest = Manifest.load(tmp_path / "manifest.json")
+        assert manifest.pages == {}
+
+    def test_save_and_load(self, tmp_path):
+        output = tmp_path / "index.html"
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.record(tmp_path / "index.md", "abc", "def", output)
+        manifest.save()
+        assert Manifest.load(tmp_path / "manifest.json").pages == manifest.pages
+
+    def test_links(self, tmp_path):
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.record(tmp_path / "index.md", "abc", "def", tmp_path / "index.html", links=["a.html"])
+        manifest.record(tmp_path / "post.md", "abc", "def", tmp_path / "post.html")
+        assert manifest.links(tmp_path / "index.md") == ["a.html"]
+        assert manifest.links(tmp_path / "post.md") is None
+        assert manifest.links(tmp_path / "missing.md") is None
+
+    def test_is_up_to_date(self, tmp_path):
+        source = tmp_path / "index.md"
+        output = tmp_path / "index.html"
+        output.write_text("<p>page</p>")
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.record(source, "abc", "def", output)
+        assert manifest.is_up_to_date(source, "abc", "def", output)
+        assert not manifest.is_up_to_date(source, "changed", "def", output)
+        assert not manifest.is_up_to_date(source, "abc", "changed", output)
+
+    def test_is_not_up_to_date_when_output_missing(self, tmp_path):
+        source = tmp_path / "index.md"
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.record(source, "abc", "def", tmp_path / "index.html")
+        assert not manifest.is_up_to_date(source, "abc", "def", tmp_path / "index.html")
+
+    def test_remove_orphans(self, tmp_path):
+        output = tmp_path / "old.html"
+        output.write_text("<p>old</p>")
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.record(tmp_path / "old.md", "abc", "def", output)
+        manifest.seen.clear()  # new build where old.md was not found
+        assert manifest.remove_orphans() == [output]
+        assert not output.exists()
+        assert manifest.pages == {}
+
+    def test_hash_file(self, tmp_path):
+        path = tmp_path / "file.md"
+        path.write_text("# Title")
+        assert hash_file(path) == hash_file(path)
+        other = tmp_path / "other.md"
+        other.write_text("# Other")
+        assert hash_file(path) != hash_file(other)
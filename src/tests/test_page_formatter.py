@@ -1,6 +1,13 @@
+import io
+import random
+
 import pytest
 
+from corpus import CorpusSettings, generate_documents
 from page_formatter import (text_to_textnodes, 
+                            markdown_to_html,
+                            iter_html_fragments,
+                            text_to_html,
                             text_node_to_html_node,
                             markdown_to_html_node,
                             get_heading_tag,
@@ -12,6 +19,9 @@ from page_formatter import (text_to_textnodes,
  
 from textnode import TextType, TextNode
 from htmlnode import Tag, ParentNode, LeafNode
+from blockcache import BlockCache
+from splitblocks import iter_blocks
+from linkindex import collect_links
 
 
 class TestTextToTextNodes:
@@ -140,6 +150,87 @@ print(foo)
 # result of foo</code></pre><p>If we can do the verification in polynomial time, the problem is in <code>NP</code>, otherwise, it isn't.</p><h4>Example of NP problems</h4><ul><li><a href="app://obsidian.md/Cryptography">Cryptography</a> :</li><li><a href="app://obsidian.md/Traveling%20Salesman%20Problem">Traveling Salesman Problem</a></li></ul></div>"""
         assert markdown_to_html_node(input_text).to_html() == expected
 
+    def test_block_cache_same_html(self):
+        markdown = "# Title\n\nSome **bold** text\n\n- a\n- b\n\nSome **bold** text"
+        cache = BlockCache()
+        expected = markdown_to_html_node(markdown).to_html()
+        assert markdown_to_html_node(markdown, cache=cache).to_html() == expected
+        assert cache.hits == 1  # the repeated paragraph
+        assert markdown_to_html_node(markdown, cache=cache).to_html() == expected
+        assert cache.misses == 3
+
+
+class TestMarkdownToHtml:
+    def html_or_error(self, function, markdown):
+        """Return the html, or Exception if the document can not be rendered.
+        The tree raises its errors once fully built, the fast path at the first one,
+        so the type of the error may differ."""
+        try:
+            return function(markdown)
+        except Exception:
+            return Exception
+
+    def assert_same_html(self, markdown):
+        assert self.html_or_error(markdown_to_html, markdown) == \
+            self.html_or_error(lambda text: markdown_to_html_node(text).to_html(), markdown), markdown
+
+    def test_same_html_as_tree_on_corpus(self):
+        for document in generate_documents(CorpusSettings(pages=20)):
+            self.assert_same_html(document)
+
+    def test_same_html_as_tree_on_fuzzed_documents(self):
+        pieces = ["# ", "## ", "word", " ", "**b**", "*i*", "`c`", "[l](u)", "![a](i)", "![](i)",
+                  "\n", "\n\n", "- ", "* ", "1. ", "2. ", "> ", "```", "\xa0", "*"]
+        generator = random.Random(42)
+        for _ in range(2000):
+            self.assert_same_html("".join(generator.choice(pieces) for _ in range(generator.randint(0, 15))))
+
+    def test_streamed_blocks_same_html(self):
+        for document in generate_documents(CorpusSettings(pages=3, blocks=20, seed=8)):
+            blocks = iter_blocks(io.StringIO(document), chunk_size=100)
+            assert "".join(iter_html_fragments(blocks)) == markdown_to_html(document)
+            blocks = iter_blocks(io.StringIO(document), chunk_size=100)
+            assert markdown_to_html_node(blocks).to_html() == markdown_to_html(document)
+
+    def test_streamed_empty_document(self):
+        with pytest.raises(ValueError):
+            list(iter_html_fragments(iter_blocks(io.StringIO("\n\n  \n"))))
+
+    def test_empty_document(self):
+        with pytest.raises(ValueError):
+            markdown_to_html("")
+
+    def test_text_to_html(self):
+        assert text_to_html("a **b** [l](u) ![i](s)") == \
+            'a <b>b</b> <a href="u">l</a> <img src="s" alt="i"></img>'
+
+    def test_text_to_html_without_inline_element(self):
+        with pytest.raises(ValueError):
+            text_to_html("![](image.png)")
+
+
+class TestLinkCollection:
+    markdown = "# [Home](/)\n\nSee ![logo](/logo.png) and [post](blog/post.html)\n\n* [a](a.html)"
+    expected = ["/", "/logo.png", "blog/post.html", "a.html"]
+
+    def test_links_of_the_tree(self):
+        with collect_links() as links:
+            markdown_to_html_node(self.markdown)
+        assert links == self.expected
+
+    def test_links_of_the_fast_path(self):
+        with collect_links() as links:
+            markdown_to_html(self.markdown)
+        assert links == self.expected
+
+    def test_links_of_cached_blocks(self):
+        cache = BlockCache()
+        markdown_to_html(self.markdown, cache)
+        with collect_links() as links:
+            markdown_to_html(self.markdown, cache)
+        assert cache.misses == 3 and cache.hits == 3
+        assert links == self.expected
+
 
 class TestHelperFunctions:
     def test_get_heading_tag(self):
@@ -220,4 +311,25 @@ class TestExtractMarkdownTitle:
     def test_invalid_title_h2_then_h1(self):
         markdown = "## Title\n# Another Title\n\nParagraph"
         with pytest.raises(Exception) as e:
-            extract_title(markdown)
\ No newline at end of file
+            extract_title(markdown)
+
+    def test_title_ends_at_any_line_separator(self):
+        assert extract_title("# Title\rParagraph") == "Title"
+        assert extract_title("# Title\u2028Paragraph\n\nMore") == "Title"
+
+    def test_title_of_binary_source(self):
+        source = io.BytesIO("# Tîtle\r\n\r\nParagraph".encode())
+        source.seek(2)
+        assert extract_title(source) == "Tîtle"
+        assert source.tell() == 2  # the position is kept
+
+    def test_only_first_line_is_read(self):
+        source = io.BytesIO(b"# Title\n" + b"x" * 1000)
+        source.read = None  # the rest of the document is never read
+        assert extract_title(source) == "Title"
+
+    def test_empty_document_has_no_title(self):
+        with pytest.raises(Exception):
+            extract_title("")
+        with pytest.raises(Exception):
+            extract_title(io.BytesIO())
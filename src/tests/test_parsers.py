@@ -0,0 +1,27 @@
+import io
+
+import pytest
+
+from corpus import CorpusSettings, generate_documents
+from parsers import PARSER_BACKENDS, FastParser, ReferenceParser, make_parser_backend
+from splitblocks import iter_blocks
+
+
+class TestParserBackends:
+    def test_make_parser_backend(self):
+        assert isinstance(make_parser_backend("reference"), ReferenceParser)
+        assert isinstance(make_parser_backend("fast"), FastParser)
+        assert [make_parser_backend(name).name for name in PARSER_BACKENDS] == list(PARSER_BACKENDS)
+        with pytest.raises(ValueError):
+            make_parser_backend("regex")
+
+    def test_same_html_from_every_method(self):
+        reference = ReferenceParser()
+        for name in PARSER_BACKENDS:
+            parser = make_parser_backend(name)
+            for document in generate_documents(CorpusSettings(pages=3, blocks=10, seed=2)):
+                html = reference.markdown_to_html(document)
+                assert parser.markdown_to_html(document) == html
+                assert "".join(parser.markdown_to_html_fragments(document)) == html
+                assert parser.markdown_to_html_node(document).to_html() == html
+                assert "".join(parser.iter_html_fragments(iter_blocks(io.StringIO(document)))) == html
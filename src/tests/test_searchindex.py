@@ -0,0 +1,173 @@
+import json
+import threading
+
+import pytest
+
+from blockcache import BlockCache
+from page_formatter import markdown_to_html, markdown_to_html_node
+from searchindex import (OTHER_PREFIX, SearchIndex, collect_text, count_terms, term_prefix,
+                         add_textnodes)
+from textnode import TextNode, TextType
+
+
+MARKDOWN = "# Title\n\nSome **bold** and [a link](a.html)\n\n> quoted\n> twice\n\n* one ![logo](logo.png)\n* two"
+
+
+def read_json(path):
+    return json.loads(path.read_text())
+
+
+class TestCollectText:
+    def test_text_of_the_inline_elements(self):
+        with collect_text() as texts:
+            markdown_to_html(MARKDOWN)
+        assert texts == ["Title", "Some bold and a link", "quoted<br>twice", "one logo", "two"]
+
+    def test_tree_and_cached_blocks_collect_the_same_text(self):
+        with collect_text() as texts:
+            markdown_to_html(MARKDOWN)
+        with collect_text() as tree_texts:
+            markdown_to_html_node(MARKDOWN).to_html()
+        cache = BlockCache()
+        markdown_to_html(MARKDOWN, cache)
+        with collect_text() as cached_texts:
+            markdown_to_html(MARKDOWN, cache)
+        assert tree_texts == texts
+        assert "\n".join(cached_texts) == "\n".join(texts)
+
+    def test_collections_of_threads_are_separate(self):
+        collecting = threading.Event()
+        main_collecting = threading.Event()
+        rendered = threading.Event()
+        thread_texts = []
+
+        def render():
+            with collect_text() as texts:
+                collecting.set()
+                main_collecting.wait()
+                markdown_to_html("# Thread")
+                rendered.set()
+            thread_texts.extend(texts)
+
+        thread = threading.Thread(target=render)
+        thread.start()
+        collecting.wait()
+        with collect_text() as texts:
+            main_collecting.set()
+            rendered.wait()
+            markdown_to_html("# Main")
+        thread.join()
+        assert texts == ["Main"]
+        assert thread_texts == ["Thread"]
+
+    def test_nothing_collected_outside(self):
+        add_textnodes([TextNode("text", TextType.TEXT)])
+        with collect_text() as texts:
+            with collect_text() as inner_texts:
+                add_textnodes([TextNode("inner", TextType.TEXT)])
+        assert (texts, inner_texts) == ([], ["inner"])
+
+
+class TestTerms:
+    def test_count_terms(self):
+        assert count_terms("The cat<br>the Cat, a dog_s 42") == {"the": 2, "cat": 2, "dog": 1, "42": 1}
+        assert count_terms("«Été» — l’été") == {"été": 2}
+        assert count_terms("a" * 65) == {}
+
+    def test_term_prefix(self):
+        assert term_prefix("search") == "se"
+        assert term_prefix("42") == "42"
+        assert term_prefix("été") == OTHER_PREFIX
+        assert term_prefix("_private") == OTHER_PREFIX
+
+
+class TestSearchIndex:
+    @pytest.fixture
+    def public(self, tmp_path):
+        (tmp_path / "public" / "blog").mkdir(parents=True)
+        return tmp_path / "public"
+
+    def test_write(self, public, tmp_path):
+        index = SearchIndex(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        index.add(public / "blog" / "post.html", "Post", "A post about home, home")
+        assert index.write(public) == ["ab", "ho", "po", "we"]
+
+        assert read_json(public / "search" / "index.json") == {
+            "version": 2, "prefix_length": 2, "shards": ["ab", "ho", "po", "we"],
+            "documents": {"0": ["blog/post.html", "Post"], "1": ["index.html", "Home"]},  # in path order
+        }
+        assert read_json(public / "search" / "terms" / "ho.json") == {"home": [0, 2, 1, 1]}
+        assert read_json(public / "search" / "terms" / "po.json") == {"post": [0, 1]}
+
+    def test_incremental_update_writes_the_changed_shards(self, public, tmp_path):
+        index = SearchIndex(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        index.add(public / "blog" / "post.html", "Post", "A post")
+        index.write(public)
+
+        index = SearchIndex.load(tmp_path / "search.json")
+        assert index.keep(public / "index.html")
+        index.add(public / "blog" / "post.html", "Post", "A post about search")
+        assert index.write(public) == ["ab", "se"]
+        assert read_json(public / "search" / "terms" / "se.json") == {"search": [0, 1]}
+        assert read_json(public / "search" / "terms" / "we.json") == {"welcome": [1, 1]}
+
+    def test_unchanged_document_writes_no_shard(self, public, tmp_path):
+        index = SearchIndex(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        index.write(public)
+        index = SearchIndex.load(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        assert index.write(public) == []
+
+    def test_removed_document(self, public, tmp_path):
+        index = SearchIndex(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        index.add(public / "blog" / "post.html", "Post", "A post")
+        index.write(public)
+
+        index = SearchIndex.load(tmp_path / "search.json")
+        index.keep(public / "index.html")
+        index.write(public)
+        assert not (public / "search" / "terms" / "po.json").exists()
+        assert read_json(public / "search" / "index.json")["documents"] == {"1": ["index.html", "Home"]}
+
+    def test_new_document_keeps_the_ids(self, public, tmp_path):
+        index = SearchIndex(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        index.write(public)
+        index = SearchIndex.load(tmp_path / "search.json")
+        index.add(public / "blog" / "post.html", "Post", "home")
+        index.keep(public / "index.html")
+        index.write(public)
+        assert read_json(public / "search" / "terms" / "ho.json") == {"home": [0, 1, 1, 1]}
+
+    def test_document_of_another_source_is_not_kept(self, public, tmp_path):
+        index = SearchIndex(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        index.set_source_hash(public / "index.html", "hash1")
+        index.write(public)
+        index = SearchIndex.load(tmp_path / "search.json")
+        assert not index.keep(public / "index.html", "hash2")
+        assert index.keep(public / "index.html", "hash1")
+
+    def test_missing_search_directory_writes_every_shard(self, public, tmp_path):
+        index = SearchIndex(tmp_path / "search.json")
+        index.add(public / "index.html", "Home", "Welcome home")
+        index.write(public)
+        (public / "search" / "index.json").unlink()
+        index = SearchIndex.load(tmp_path / "search.json")
+        index.keep(public / "index.html")
+        assert index.write(public) == ["ho", "we"]
+
+    def test_invalid_state_is_ignored(self, tmp_path):
+        (tmp_path / "search.json").write_text("{")
+        assert SearchIndex.load(tmp_path / "search.json").documents == {}
+
+    def test_merge(self, public):
+        worker_index = SearchIndex()
+        worker_index.add(public / "index.html", "Home", "Welcome")
+        index = SearchIndex()
+        index.merge(worker_index.documents)
+        assert index.documents == {str(public / "index.html"): [None, "Home", {"welcome": 1}, None]}
@@ -0,0 +1,160 @@
+import filecmp
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import main
+from manifest import Manifest
+from shard import merge_shards, parse_shard, shard_manifest_path, shard_of
+
+
+@pytest.fixture
+def site(site):
+    """The site of conftest with 4 more sections of 5 pages, and 4 directories of 5 images"""
+    for directory in range(4):
+        (site / "content" / f"section{directory}").mkdir()
+        (site / "static" / f"images{directory}").mkdir()
+        for page in range(5):
+            (site / "content" / f"section{directory}" / f"page{page}.md").write_text(
+                f"# Page {directory}.{page}\n\n[home](/index.html) **bold** text")
+            (site / "static" / f"images{directory}" / f"image{page}.png").write_bytes(bytes([directory, page]))
+    return site
+
+
+def build_shard(site, shard, *options):
+    main.build(main.parse_args(["--shard", shard, *options]), content_dir=site / "content",
+               static_dir=site / "static", template_path=site / "template.html",
+               public_dir=site / "public", cache_dir=site / ".cache")
+
+
+def merge(site, count):
+    return merge_shards(content_dir=site / "content", static_dir=site / "static",
+                        public_dir=site / "public", cache_dir=site / ".cache", count=count,
+                        manifest_path=site / ".cache" / "manifest.json")
+
+
+class TestParseShard:
+    def test_valid(self):
+        assert parse_shard("1/1") == (1, 1)
+        assert parse_shard("3/4") == (3, 4)
+
+    @pytest.mark.parametrize("text", ["0/2", "3/2", "1", "a/2", "1/-2", ""])
+    def test_invalid(self, text):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+    def test_command_line(self):
+        assert main.parse_args(["--shard", "2/3"]).shard == (2, 3)
+        assert main.parse_args([]).shard is None
+
+
+class TestShardOf:
+    def test_deterministic_partition(self):
+        paths = [f"section/page{index}.md" for index in range(200)]
+        shards = [shard_of(path, 4) for path in paths]
+        assert shards == [shard_of(path, 4) for path in paths]
+        assert set(shards) == {1, 2, 3, 4}
+
+    def test_single_shard(self):
+        assert shard_of("index.md", 1) == 1
+
+
+class TestShardedBuild:
+    def test_shards_build_disjoint_slices(self, site):
+        build_shard(site, "1/2")
+        first = Manifest.load(shard_manifest_path(site / ".cache", (1, 2)))
+        build_shard(site, "2/2")
+        second = Manifest.load(shard_manifest_path(site / ".cache", (2, 2)))
+        assert first.pages and second.pages
+        assert not set(first.pages) & set(second.pages)
+        assert not set(first.assets) & set(second.assets)
+        assert len(first.pages) + len(second.pages) == 22
+        assert len(first.assets) + len(second.assets) == 21
+
+    def test_processes_build_the_same_site(self, site, tmp_path_factory):
+        reference = tmp_path_factory.mktemp("reference")
+        (reference / "public").mkdir()
+        main.build(main.parse_args([]), content_dir=site / "content", static_dir=site / "static",
+                   template_path=site / "template.html", public_dir=reference / "public",
+                   cache_dir=reference / ".cache")
+
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            list(executor.map(build_shard, [site] * 3, ["1/3", "2/3", "3/3"]))
+        manifest = merge(site, 3)
+
+        assert len(manifest.pages) == 22
+        assert len(manifest.assets) == 21
+        assert Manifest.load(site / ".cache" / "manifest.json").pages == manifest.pages
+        comparison = filecmp.dircmp(reference / "public", site / "public")
+        assert not comparison.left_only and not comparison.right_only
+        for directory in ["section0", "images0"]:
+            assert filecmp.dircmp(reference / "public" / directory, site / "public" / directory).diff_files == []
+
+    def test_merged_manifest_skips_pages_of_an_incremental_build(self, site, monkeypatch):
+        for shard in ["1/2", "2/2"]:
+            build_shard(site, shard)
+        merge(site, 2)
+        rendered = []
+        monkeypatch.setattr(main, "generate_page", lambda **kwargs: rendered.append(kwargs["from_path"]))
+        main.build(main.parse_args(["--incremental"]), content_dir=site / "content",
+                   static_dir=site / "static", template_path=site / "template.html",
+                   public_dir=site / "public", cache_dir=site / ".cache")
+        assert rendered == []
+
+    def test_merge_with_check_links(self, site):
+        for shard in ["1/2", "2/2"]:
+            build_shard(site, shard, "--check-links")
+        link_index = main.merge_build(main.parse_args(["--merge-shards", "2", "--check-links"]),
+                                      content_dir=site / "content", static_dir=site / "static",
+                                      public_dir=site / "public", cache_dir=site / ".cache")
+        assert link_index.links_count() == 20
+        assert link_index.dangling(site / "public") == []
+
+    def test_merge_with_check_links_of_shards_without_links(self, site):
+        build_shard(site, "1/2", "--check-links")
+        build_shard(site, "2/2")
+        with pytest.raises(Exception, match="links not recorded for"):
+            main.merge_build(main.parse_args(["--merge-shards", "2", "--check-links"]),
+                             content_dir=site / "content", static_dir=site / "static",
+                             public_dir=site / "public", cache_dir=site / ".cache")
+
+
+    def test_merge_static_file_hidden_by_a_page(self, site):
+        (site / "content" / "about.md").write_text("# About")
+        (site / "static" / "about.html").write_text("<p>static about</p>")
+        for shard in ["1/2", "2/2"]:
+            build_shard(site, shard)
+        manifest = merge(site, 2)
+        assert str(site / "content" / "about.md") in manifest.pages
+        assert "about.html" not in manifest.assets
+        assert "About" in (site / "public" / "about.html").read_text()
+
+
+class TestMergeValidation:
+    def test_missing_shard(self, site):
+        build_shard(site, "1/2")
+        with pytest.raises(Exception, match="missing manifest of shard 2/2"):
+            merge(site, 2)
+
+    def test_page_not_built(self, site):
+        build_shard(site, "1/1")
+        (site / "content" / "new.md").write_text("# New")
+        with pytest.raises(Exception, match="page not built by any shard"):
+            merge(site, 1)
+
+    def test_page_of_another_shard(self, site):
+        build_shard(site, "1/2")
+        build_shard(site, "2/2")
+        first = Manifest.load(shard_manifest_path(site / ".cache", (1, 2)))
+        second = Manifest.load(shard_manifest_path(site / ".cache", (2, 2)))
+        source, entry = next(iter(second.pages.items()))
+        first.pages[source] = entry
+        first.save()
+        with pytest.raises(Exception, match="page built by more than one shard"):
+            merge(site, 2)
+
+    def test_missing_document(self, site):
+        build_shard(site, "1/1")
+        (site / "public" / "index.html").unlink()
+        with pytest.raises(Exception, match="missing document"):
+            merge(site, 1)
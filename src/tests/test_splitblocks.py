@@ -1,4 +1,26 @@
-from splitblocks import BlockType, markdown_to_blocks, block_to_block_type
+import io
+import mmap
+import random
+import re
+
+from splitblocks import BlockType, markdown_to_blocks, block_to_block_type, classify_block, iter_blocks
+
+
+def reference_block_type(block: str) -> BlockType:
+    """The block classification with a regex per type, tried in order"""
+    lines = block.split("\n")
+    if re.match(r'^#{1,6} .*$', block):
+        return BlockType.HEADING
+    if re.match(r'^```[\s\S]*?```$', block):
+        return BlockType.CODE
+    if all(re.match(r'^>.*$', line) for line in lines):
+        return BlockType.QUOTE
+    if all(re.match(r'^[*-] .*$', line) for line in lines):
+        return BlockType.UNORDERED_LIST
+    if [line[0:3] for line in lines] == [f"{i}. " for i in range(1, len(lines) + 1)]:
+        return BlockType.ORDERED_LIST
+    return BlockType.PARAGRAPH
+
 
 class TestMarkdownToBlocks:
     def test_single_block(self):
@@ -99,4 +121,60 @@ def add(a, b)
         input_case = "1 Ordered list\n2. Are sad\n3.with no point !!"
         assert block_to_block_type(input_case) == BlockType.PARAGRAPH
 
+    def test_ordered_list_of_ten_items_is_a_paragraph(self):
+        input_case = "\n".join(f"{i}. item" for i in range(1, 11))
+        assert block_to_block_type(input_case) == BlockType.PARAGRAPH
 
+    def test_heading_on_several_lines_is_a_paragraph(self):
+        assert block_to_block_type("# Heading\nand text") == BlockType.PARAGRAPH
+
+
+class TestClassifyBlock:
+    def test_lines_are_returned_with_the_type(self):
+        assert classify_block("* a\n- b") == (BlockType.UNORDERED_LIST, ["* a", "- b"])
+        assert classify_block("some text") == (BlockType.PARAGRAPH, ["some text"])
+
+    def test_fuzzed_blocks_same_type_as_reference(self):
+        pieces = ["#", "## ", "####### ", "```", "`", ">", "> ", "* ", "- ", "*", "1. ", "2. ", "3.",
+                  "1 ", "10. ", "text", " ", "\n", "\n"]
+        generator = random.Random(4321)
+        for _ in range(5000):
+            block = "".join(generator.choice(pieces) for _ in range(generator.randint(0, 8)))
+            block_type, lines = classify_block(block)
+            assert block_type == reference_block_type(block), repr(block)
+            assert lines == block.split("\n")
+
+
+class TestIterBlocks:
+    markdown = "# Title\n\n\n\nSome\xa0text\non two lines\n\n   \n\n* a\n* b\n\n"
+
+    def test_same_blocks_as_markdown_to_blocks(self):
+        expected = markdown_to_blocks(self.markdown)
+        for chunk_size in (1, 2, 3, 7, 1 << 16):
+            assert list(iter_blocks(io.StringIO(self.markdown), chunk_size)) == expected
+
+    def test_bytes_are_decoded_with_line_returns_translated(self):
+        markdown = "# Tîtle\r\n\r\nSome text\rand more\n\n* a"
+        expected = markdown_to_blocks(markdown.replace("\r\n", "\n").replace("\r", "\n"))
+        for chunk_size in (1, 2, 5, 1 << 16):
+            assert list(iter_blocks(io.BytesIO(markdown.encode()), chunk_size)) == expected
+
+    def test_mmap(self, tmp_path):
+        path = tmp_path / "index.md"
+        path.write_text(self.markdown)
+        with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            assert list(iter_blocks(mapping, chunk_size=4)) == markdown_to_blocks(self.markdown)
+
+    def test_blocks_are_yielded_lazily(self):
+        stream = io.StringIO("first\n\n" + "x" * 100)
+        blocks = iter_blocks(stream, chunk_size=10)
+        assert next(blocks) == "first"
+        assert stream.tell() == 10
+
+    def test_fuzzed_documents_same_blocks(self):
+        pieces = ["\n", "\n\n", " ", "\xa0", "text", "# t", "\t"]
+        generator = random.Random(99)
+        for _ in range(2000):
+            markdown = "".join(generator.choice(pieces) for _ in range(generator.randint(0, 20)))
+            chunk_size = generator.randint(1, 6)
+            assert list(iter_blocks(io.StringIO(markdown), chunk_size)) == markdown_to_blocks(markdown), repr(markdown)
@@ -1,11 +1,15 @@
+import random
+
 import pytest
 
 from textnode import TextNode, TextType
+from page_formatter import text_to_textnodes_chained
 from splitinlines import (split_nodes_delimiter, 
                           split_nodes_image,
                           split_nodes_link,
                           extract_markdown_images, 
-                          extract_markdown_links)
+                          extract_markdown_links,
+                          tokenize_inline)
 
 class TestSplitNodesDelimiter:
     def test_bold_delimiter(self):
@@ -169,3 +173,66 @@ class TestExtractMdLinks:
     def test_special_characters(self):
         text = "This is text with a link [t(o@boot dev]]](htttps://www.boo}t.dev)"
         assert extract_markdown_links(text) == [("t(o@boot dev]]", "htttps://www.boo}t.dev")]
+
+
+
+def reference_or_error(text):
+    """Return the nodes of the reference chain, or the type of the exception it raised"""
+    try:
+        return text_to_textnodes_chained(text)
+    except Exception as error:
+        return type(error)
+
+
+def tokenize_or_error(text):
+    try:
+        return tokenize_inline(text)
+    except Exception as error:
+        return type(error)
+
+
+class TestTokenizeInline:
+    def test_all_cases(self):
+        text = "**b** and *i* and `c` ![img](i.png) [link](l.html) end"
+        assert tokenize_inline(text) == [
+            TextNode("b", TextType.BOLD),
+            TextNode(" and ", TextType.TEXT),
+            TextNode("i", TextType.ITALIC),
+            TextNode(" and ", TextType.TEXT),
+            TextNode("c", TextType.CODE),
+            TextNode(" ", TextType.TEXT),
+            TextNode("img", TextType.IMAGE, "i.png"),
+            TextNode(" ", TextType.TEXT),
+            TextNode("link", TextType.LINK, "l.html"),
+            TextNode(" end", TextType.TEXT),
+        ]
+
+    def test_empty_string(self):
+        assert tokenize_inline("") == [TextNode("", TextType.TEXT)]
+
+    def test_delimiters_inside_link_are_kept(self):
+        assert tokenize_inline("[**bold**](url)") == [TextNode("**bold**", TextType.LINK, "url")]
+
+    def test_imbalanced_delimiter(self):
+        with pytest.raises(Exception):
+            tokenize_inline("`code block` text with non closed `delimiter")
+
+    @pytest.mark.parametrize("text", [
+        "This is **text** with an *italic* word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)",
+        "[x ![c](d)](e)",
+        "![](empty.png) and [](empty.html)",
+        "****",
+        "a **b [l](u) c** d",
+        "[a](b) ![c](d) [e](f)",
+        "- [Wikipedia](https://en.wikipedia.org/wiki/NP_(complexity)) ",
+    ])
+    def test_same_nodes_as_reference(self, text):
+        assert tokenize_or_error(text) == reference_or_error(text)
+
+    def test_fuzzed_inputs_same_nodes_as_reference(self):
+        pieces = ["a", "word", " ", "*", "**", "`", "[", "]", "(", ")", "!", "](", "\n",
+                  "![alt](img.png)", "[link](page.html)", "[](x)", "![](y)"]
+        generator = random.Random(1234)
+        for _ in range(3000):
+            text = "".join(generator.choice(pieces) for _ in range(generator.randint(0, 12)))
+            assert tokenize_or_error(text) == reference_or_error(text), text
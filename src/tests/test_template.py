@@ -0,0 +1,62 @@
+import io
+import os
+
+from htmlnode import Tag, LeafNode, ParentNode
+from template import Template, load_template
+
+
+class TestTemplate:
+    def test_segments_and_slots(self):
+        template = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        assert template.segments == ["<title>", "</title><body>", "</body>"]
+        assert template.slots == ["Title", "Content"]
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        assert template.render({"Title": "Home", "Content": "<p>Hi</p>"}) == \
+            "<title>Home</title><body><p>Hi</p></body>"
+
+    def test_render_same_placeholder_twice(self):
+        template = Template("{{ Title }} - {{ Title }}")
+        assert template.render({"Title": "Home"}) == "Home - Home"
+
+    def test_render_more_placeholders(self):
+        template = Template("{{ Title }}|{{ Author }}|{{ Date }}")
+        assert template.render({"Title": "Home", "Author": "Me", "Date": "today"}) == "Home|Me|today"
+
+    def test_missing_value_keeps_placeholder(self):
+        template = Template("<p>{{ Title }} {{ Unknown }}</p>")
+        assert template.render({"Title": "Home"}) == "<p>Home {{ Unknown }}</p>"
+
+    def test_no_placeholder(self):
+        assert Template("<p>static</p>").render({}) == "<p>static</p>"
+
+    def test_write_html_node(self):
+        template = Template("<article>{{ Content }}</article>")
+        stream = io.StringIO()
+        node = ParentNode(Tag.P, [LeafNode(Tag.B, "bold")])
+        template.write(stream, {"Content": node})
+        assert stream.getvalue() == "<article><p><b>bold</b></p></article>"
+
+    def test_write_fragments_generator(self):
+        template = Template("<article>{{ Content }}</article>")
+        stream = io.StringIO()
+        template.write(stream, {"Content": (fragment for fragment in ["<div>", "<p>a</p>", "</div>"])})
+        assert stream.getvalue() == "<article><div><p>a</p></div></article>"
+
+
+class TestLoadTemplate:
+    def test_template_is_cached(self, tmp_path):
+        path = tmp_path / "template.html"
+        path.write_text("<p>{{ Content }}</p>")
+        assert load_template(path) is load_template(path)
+
+    def test_template_is_reloaded_when_changed(self, tmp_path):
+        path = tmp_path / "template.html"
+        path.write_text("<p>{{ Content }}</p>")
+        first = load_template(path)
+        path.write_text("<div>{{ Content }}</div>")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert load_template(path) is not first
+        assert load_template(path).render({"Content": "x"}) == "<div>x</div>"
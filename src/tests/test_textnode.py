@@ -34,6 +34,10 @@ class TestTextNode(TestCase):
         with self.assertRaises(Exception):
             TextNode("This is a text", "normal") # type: ignore
 
+    def test_no_instance_dict(self):
+        node = TextNode("This is a text", TextType.TEXT)
+        self.assertFalse(hasattr(node, "__dict__"))
+
     def test_test_type_isnot_valid_TextType_value(self):
         with self.assertRaises(AttributeError):
             TextNode("This is a text", TextType.normal) # type: ignore
@@ -0,0 +1,116 @@
+import io
+import mmap
+
+import pytest
+
+import treecache
+from corpus import CorpusSettings, generate_documents
+from htmlnode import Tag, LeafNode, ParentNode
+from linkindex import collect_links
+from page_formatter import markdown_to_html_node
+from treecache import (TreeCache, cached_markdown_to_html_fragments, cached_markdown_to_html_node,
+                       decode_tree, encode_tree, encoded_tree_to_html, source_key)
+
+
+class TestEncodeTree:
+    def test_round_trip(self):
+        tree = ParentNode(Tag.DIV, [ParentNode(Tag.P, [LeafNode(None, "text"),
+                                                       LeafNode(Tag.A, "link", {"href": "a.html"})]),
+                                    LeafNode(None, "<p>raw</p>")])
+        decoded = decode_tree(encode_tree(tree))
+        assert repr(decoded) == repr(tree)
+        assert decoded.to_html() == tree.to_html()
+        assert "".join(encoded_tree_to_html(encode_tree(tree), [])) == tree.to_html()
+
+    def test_round_trip_same_html_on_corpus(self):
+        for document in generate_documents(CorpusSettings(pages=3, blocks=20, seed=3)):
+            tree = markdown_to_html_node(document)
+            assert decode_tree(encode_tree(tree)).to_html() == tree.to_html()
+            assert "".join(encoded_tree_to_html(encode_tree(tree), [])) == tree.to_html()
+
+    def test_invalid_parent_raises_like_the_tree(self):
+        for tree in [ParentNode(Tag.DIV, []), ParentNode(None, [LeafNode(None, "text")])]:
+            with pytest.raises(ValueError):
+                encoded_tree_to_html(encode_tree(tree), [])
+
+
+class TestSourceKey:
+    def test_same_key_for_text_bytes_and_mmap(self, tmp_path):
+        path = tmp_path / "index.md"
+        path.write_text("# Tîtle\n\ntext")
+        with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            assert source_key(mapping) == source_key("# Tîtle\n\ntext")
+        assert source_key(io.BytesIO(b"")) == source_key("")
+        assert source_key("a") != source_key("b")
+
+
+class TestTreeCache:
+    def test_put_and_get(self, tmp_path):
+        cache = TreeCache(tmp_path, version="1")
+        assert cache.get("key") is None
+        cache.put("key", encode_tree(ParentNode(Tag.DIV, [LeafNode(Tag.B, "bold")])), ["a.html"], "bold")
+        encoded_tree, links, text = cache.get("key")
+        assert decode_tree(encoded_tree).to_html() == "<div><b>bold</b></div>"
+        assert links == ["a.html"]
+        assert text == "bold"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_trees_of_another_version_are_not_read(self, tmp_path):
+        TreeCache(tmp_path, version="1").put("key", "text")
+        cache = TreeCache(tmp_path, version="2")
+        assert cache.get("key") is None
+        cache.put("key", "text")
+        cache.remove_other_versions()
+        assert [path.name for path in tmp_path.iterdir()] == [cache.directory.name]
+
+    def test_drain_and_merge_counts(self, tmp_path):
+        worker = TreeCache(tmp_path, version="1")
+        worker.put("a", "text")
+        worker.get("a")
+        worker.get("b")
+        cache = TreeCache(tmp_path, version="1")
+        cache.merge_counts(worker.drain_counts())
+        assert (cache.hits, cache.misses, cache.used) == (1, 1, {"a", "b"})
+        assert worker.drain_counts() == (0, 0, set())
+
+    def test_remove_unused(self, tmp_path):
+        previous = TreeCache(tmp_path, version="1")
+        previous.put("old", "text")
+        previous.put("new", "text")
+        cache = TreeCache(tmp_path, version="1")
+        cache.get("new")
+        assert cache.remove_unused() == 1
+        assert [path.name for path in cache.directory.iterdir()] == ["new"]
+
+    def test_corrupted_tree_is_a_miss(self, tmp_path):
+        cache = TreeCache(tmp_path, version="1")
+        cache.put("key", "text")
+        (cache.directory / "key").write_bytes(b"\x00garbage")
+        assert cache.get("key") is None
+
+
+class TestCachedMarkdownToHtmlNode:
+    markdown = "# Title\n\nSee [post](post.html) and ![logo](logo.png)"
+
+    def test_cached_tree_is_not_parsed_again(self, tmp_path, monkeypatch):
+        cache = TreeCache(tmp_path, version="1")
+        html = cached_markdown_to_html_node(self.markdown, cache).to_html()
+        assert html == markdown_to_html_node(self.markdown).to_html()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("parsed again")
+
+        monkeypatch.setattr(treecache, "markdown_to_html_node", fail)
+        with collect_links() as links:
+            assert cached_markdown_to_html_node(self.markdown, cache).to_html() == html
+            assert "".join(cached_markdown_to_html_fragments(self.markdown, cache)) == html
+        assert links == ["post.html", "logo.png"] * 2
+
+    def test_mmap_source(self, tmp_path):
+        path = tmp_path / "index.md"
+        path.write_text(self.markdown)
+        cache = TreeCache(tmp_path / "trees", version="1")
+        with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            tree = cached_markdown_to_html_node(mapping, cache)
+        assert tree.to_html() == markdown_to_html_node(self.markdown).to_html()
+        assert cache.get(source_key(self.markdown)) is not None
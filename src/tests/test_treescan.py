@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+import treescan
+from treescan import RACY_DELAY_NS, TreeInventory, scan_tree
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    (root / "b" / "c").mkdir(parents=True)
+    (root / "a").mkdir()
+    (root / "index.md").write_text("index")
+    (root / "b" / "page.md").write_text("page")
+    (root / "b" / "c" / "deep.md").write_text("deep")
+    (root / "a" / "first.md").write_text("first")
+    return root
+
+
+def age(root, seconds=60):
+    """Move the mtime of every file and directory of a tree back in the past, so that
+    the next scan trusts them"""
+    for path in [root, *root.rglob("*")]:
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 1_000_000_000))
+
+
+class TestScanTree:
+    def test_inventory(self, tree):
+        inventory = scan_tree(tree)
+        assert list(inventory.files) == ["index.md", "a/first.md", "b/page.md", "b/c/deep.md"]
+        assert list(inventory.directories) == [".", "a", "b", "b/c"]
+        assert inventory.directories["b"][1:] == (["c"], ["page.md"])
+        assert inventory.files["index.md"] == ((tree / "index.md").stat().st_mtime_ns, 5)
+        assert inventory.paths()[0] == tree / "index.md"
+
+    def test_missing_root(self, tmp_path):
+        inventory = scan_tree(tmp_path / "missing")
+        assert (inventory.files, inventory.directories) == ({}, {})
+
+    def test_broken_link(self, tree):
+        (tree / "lock.md").symlink_to(tree / "missing.md")
+        with pytest.raises(Exception, match="invalid content"):
+            scan_tree(tree)
+        assert "lock.md" not in scan_tree(tree, strict=False).files
+
+    def test_followed_link(self, tree):
+        (tree / "linked").symlink_to(tree / "a")
+        assert "linked/first.md" in scan_tree(tree).files
+
+
+class TestRescan:
+    def test_unchanged_files(self, tree):
+        age(tree)
+        previous = scan_tree(tree)
+        assert previous.unchanged == set()  # no previous scan
+        (tree / "b" / "page.md").write_text("changed page")
+        inventory = scan_tree(tree, previous)
+        assert inventory.unchanged == {"index.md", "a/first.md", "b/c/deep.md"}
+        assert inventory.is_unchanged(tree / "index.md")
+        assert not inventory.is_unchanged(tree / "b" / "page.md")
+
+    def test_recent_files_are_not_trusted(self, tree):
+        previous = scan_tree(tree)  # the files were modified less than RACY_DELAY_NS ago
+        assert scan_tree(tree, previous).unchanged == set()
+
+    def test_unchanged_directories_are_not_read(self, tree, monkeypatch):
+        age(tree)
+        previous = scan_tree(tree)
+        (tree / "b" / "c" / "new.md").write_text("new")
+        (tree / "index.md").write_text("edited in place")
+        read = []
+        read_listing = treescan.read_listing
+        monkeypatch.setattr(treescan, "read_listing", lambda path, strict: read.append(path) or read_listing(path, strict))
+
+        inventory = scan_tree(tree, previous)
+        assert read == [tree / "b" / "c"]
+        assert list(inventory.files) == ["index.md", "a/first.md", "b/page.md", "b/c/deep.md", "b/c/new.md"]
+        assert inventory.files["index.md"][1] == len("edited in place")  # still given a stat
+
+    def test_removed_directory(self, tree):
+        age(tree)
+        previous = scan_tree(tree)
+        for path in (tree / "b" / "c").iterdir():
+            path.unlink()
+        (tree / "b" / "c").rmdir()
+        assert list(scan_tree(tree, previous).directories) == [".", "a", "b"]
+
+    def test_directories_changed(self, tree):
+        age(tree)
+        inventory = scan_tree(tree)
+        (tree / "index.md").write_text("edited in place")
+        assert not inventory.directories_changed()
+        (tree / "b" / "c" / "new.md").write_text("new")
+        assert inventory.directories_changed()
+        assert scan_tree(tree).directories_changed()  # modified too recently to be trusted
+
+    def test_save_and_load(self, tree, tmp_path):
+        age(tree)
+        scan_tree(tree).save(tmp_path / "inventory.json")
+        previous = TreeInventory.load(tmp_path / "inventory.json", tree)
+        assert scan_tree(tree, previous).unchanged == {"index.md", "a/first.md", "b/page.md", "b/c/deep.md"}
+
+    def test_load_another_root(self, tree, tmp_path):
+        scan_tree(tree).save(tmp_path / "inventory.json")
+        assert TreeInventory.load(tmp_path / "inventory.json", tmp_path).files == {}
+
+    @pytest.mark.parametrize("text", ["{", '{"version": 0}'])
+    def test_invalid_inventory_is_ignored(self, tree, tmp_path, text):
+        (tmp_path / "inventory.json").write_text(text)
+        assert TreeInventory.load(tmp_path / "inventory.json", tree).files == {}
+
+    def test_trusted_mtime(self):
+        inventory = TreeInventory(None, scan_time=10 * RACY_DELAY_NS)
+        assert inventory.is_trusted(8 * RACY_DELAY_NS)
+        assert not inventory.is_trusted(9 * RACY_DELAY_NS + 1)
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+from manifest import Manifest
+from treescan import RACY_DELAY_NS
+from watch import (ChangeQueue, SiteWatcher, ReloadNotifier, RELOAD_SCRIPT, changed_paths,
+                   inject_reload_script, snapshot, start_server)
+
+
+@pytest.fixture
+def watcher(site):
+    return SiteWatcher(content_dir=site / "content", static_dir=site / "static",
+                       template_path=site / "template.html", public_dir=site / "public",
+                       manifest=Manifest(site / "manifest.json"))
+
+
+class TestSnapshot:
+    def test_changed_paths(self, tmp_path):
+        (tmp_path / "a.md").write_text("a")
+        (tmp_path / "b.md").write_text("b")
+        before = snapshot(tmp_path)
+        (tmp_path / "a.md").write_text("changed a")
+        (tmp_path / "b.md").unlink()
+        (tmp_path / "c.md").write_text("c")
+        assert changed_paths(before, snapshot(tmp_path)) == {tmp_path / "a.md", tmp_path / "b.md", tmp_path / "c.md"}
+
+    def test_snapshot_of_file(self, tmp_path):
+        (tmp_path / "template.html").write_text("<p></p>")
+        assert list(snapshot(tmp_path / "template.html")) == [tmp_path / "template.html"]
+
+
+class TestSiteWatcher:
+    def test_markdown_change_rebuilds_only_its_page(self, watcher):
+        source = watcher.content_dir / "blog" / "post.md"
+        source.write_text("# Post\n\nEdited post")
+        assert watcher.rebuild({source}) == [watcher.public_dir / "blog" / "post.html"]
+        assert "Edited post" in (watcher.public_dir / "blog" / "post.html").read_text()
+        assert not (watcher.public_dir / "index.html").exists()
+
+    def test_deleted_markdown_deletes_its_page(self, watcher):
+        source = watcher.content_dir / "index.md"
+        watcher.rebuild({source})
+        source.unlink()
+        watcher.rebuild({source})
+        assert not (watcher.public_dir / "index.html").exists()
+
+    def test_deleted_markdown_shows_the_static_file_it_hid(self, site):
+        (site / "content" / "about.md").write_text("# About")
+        (site / "static" / "about.html").write_text("<p>static about</p>")
+        watcher = SiteWatcher(content_dir=site / "content", static_dir=site / "static",
+                              template_path=site / "template.html", public_dir=site / "public",
+                              manifest=Manifest(site / "manifest.json"))
+        source = site / "content" / "about.md"
+        watcher.rebuild({source})
+        source.unlink()
+        assert set(watcher.rebuild({source})) == {site / "public" / "about.html"}  # deleted, then copied
+        assert (site / "public" / "about.html").read_text() == "<p>static about</p>"
+        assert watcher.manifest.assets == ["about.html"]
+
+    def test_template_change_rebuilds_all_pages(self, watcher):
+        assert len(watcher.rebuild({watcher.template_path})) == 2
+        assert (watcher.public_dir / "index.html").exists()
+        assert (watcher.public_dir / "blog" / "post.html").exists()
+
+    def test_static_change_copies_only_the_file(self, watcher):
+        asset = watcher.static_dir / "index.css"
+        assert watcher.rebuild({asset}) == [watcher.public_dir / "index.css"]
+        assert (watcher.public_dir / "index.css").read_text() == "body {}"
+        assert watcher.manifest.assets == ["index.css"]
+
+    def test_poll(self, watcher):
+        assert watcher.poll() == set()
+        (watcher.content_dir / "new.md").write_text("# New")
+        assert watcher.poll() == {watcher.content_dir / "new.md"}
+        assert watcher.poll() == set()
+
+    def test_poll_without_full_scan_stats_only_the_directories(self, watcher, monkeypatch):
+        watcher.full_scan_interval = 3600
+        old = time.time_ns() - 2 * RACY_DELAY_NS
+        for inventory in watcher.inventories.values():  # scanned long after the last changes
+            inventory.scan_time = time.time_ns()
+            for path in [inventory.root, *(inventory.root / name for name in inventory.directories)]:
+                os.utime(path, ns=(old, old))
+            inventory.directories = {name: (os.stat(inventory.root / name).st_mtime_ns, *listing)
+                                     for name, (_, *listing) in inventory.directories.items()}
+        edited = watcher.content_dir / "index.md"
+        edited.write_text("# Home\n\nEdited in place")
+
+        assert watcher.poll() == set()  # the file edited in place waits for the next full scan
+        (watcher.content_dir / "blog" / "new.md").write_text("# New")
+        assert watcher.poll() == {edited, watcher.content_dir / "blog" / "new.md"}
+        watcher.template_path.write_text("<body>{{ Content }}</body>")
+        assert watcher.poll() == {watcher.template_path}
+
+    def test_poll_notified_changes(self, watcher):
+        watcher.changes = ChangeQueue()
+        post = watcher.content_dir / "blog" / "post.md"
+        post.write_text("# Post\n\nEdited")
+        (watcher.content_dir / "index.md").unlink()
+        drafts = watcher.content_dir / "drafts"
+        drafts.mkdir()
+        (drafts / "draft.md").write_text("# Draft")
+        for event in [SimpleNamespace(event_type="modified", is_directory=False, src_path=str(post)),
+                      SimpleNamespace(event_type="opened", is_directory=False, src_path=str(watcher.static_dir / "index.css")),
+                      SimpleNamespace(event_type="deleted", is_directory=False, src_path=str(watcher.content_dir / "index.md")),
+                      SimpleNamespace(event_type="created", is_directory=True, src_path=str(drafts)),
+                      SimpleNamespace(event_type="modified", is_directory=True, src_path=str(watcher.content_dir))]:
+            watcher.changes.dispatch(event)
+
+        assert watcher.poll() == {post, watcher.content_dir / "index.md", drafts / "draft.md"}
+        assert watcher.poll() == set()
+
+    def test_poll_notified_moved_directory(self, watcher):
+        watcher.changes = ChangeQueue()
+        blog = watcher.content_dir / "blog"
+        blog.rename(watcher.content_dir / "posts")
+        watcher.changes.dispatch(SimpleNamespace(event_type="moved", is_directory=True, src_path=str(blog),
+                                                 dest_path=str(watcher.content_dir / "posts")))
+        assert watcher.poll() == {blog / "post.md", watcher.content_dir / "posts" / "post.md"}
+        assert watcher.content_dir / "posts" / "post.md" in watcher.snapshots
+        assert blog / "post.md" not in watcher.snapshots
+
+
+class TestLiveReload:
+    def test_inject_reload_script(self):
+        assert inject_reload_script("<body><p>page</p></body>") == f"<body><p>page</p>{RELOAD_SCRIPT}</body>"
+        assert inject_reload_script("<p>page</p>") == f"<p>page</p>{RELOAD_SCRIPT}"
+
+    def test_notifier_wakes_waiting_thread(self):
+        notifier = ReloadNotifier()
+        versions = []
+        thread = threading.Thread(target=lambda: versions.append(notifier.wait(0, timeout=5)))
+        thread.start()
+        notifier.notify()
+        thread.join()
+        assert versions == [1]
+
+    def test_server_injects_script_and_sends_reload(self, tmp_path):
+        (tmp_path / "index.html").write_text("<body><p>page</p></body>")
+        notifier = ReloadNotifier()
+        server = start_server(tmp_path, 0, notifier)
+        url = f"http://localhost:{server.server_address[1]}"
+        try:
+            with urllib.request.urlopen(url + "/") as response:
+                assert RELOAD_SCRIPT in response.read().decode()
+            with urllib.request.urlopen(url + "/__livereload", timeout=5) as events:
+                notifier.notify()
+                assert events.readline() == b"data: reload\n"
+        finally:
+            server.shutdown()
+            server.server_close()
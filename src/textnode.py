@@ -14,6 +14,9 @@ class TextType(Enum):
 
 
 class TextNode:
+    # No per instance __dict__: every inline fragment of a page is a TextNode
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text: str, text_type: TextType, url: Optional[str] = None) -> None:
         self.text = text
         if not isinstance(text_type, TextType):
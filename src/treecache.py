@@ -0,0 +1,213 @@
+import hashlib
+import io
+import marshal
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple, Union
+
+from htmlnode import Tag, HTMLNode, LeafNode, ParentNode
+from linkindex import add_links, collect_links
+from page_formatter import markdown_to_html_node
+from searchindex import add_texts, collect_text
+from splitblocks import iter_blocks
+
+
+FORMAT_VERSION = "2"  # version of the encoding of the trees, see encode_tree, and of their entries
+
+TAGS = list(Tag)
+TAG_CODES = {tag: code for code, tag in enumerate(TAGS)}
+NO_TAG = -1
+
+# Opening and closing html of the ParentNodes by tag code, see ParentNode.iter_html
+OPENING_TAGS = [f"<pre><{tag.value}>" if tag == Tag.CODE else f"<{tag.value}>" for tag in TAGS]
+CLOSING_TAGS = [f"</{tag.value}></pre>" if tag == Tag.CODE else f"</{tag.value}>" for tag in TAGS]
+
+
+def source_key(source: Union[str, bytes, mmap.mmap, io.BytesIO]) -> str:
+    """Return the content address of a markdown source, given as text,
+    or as bytes, a mmap or a bytes stream (see fileio.MappedIO)
+    """
+    if isinstance(source, str):
+        source = source.encode()
+    elif isinstance(source, io.BytesIO):
+        source = source.getvalue()
+    return hashlib.blake2b(source, digest_size=16).hexdigest()
+
+
+def encode_tree(node: HTMLNode):
+    """Convert a tree of HTMLNodes into builtin values that marshal stores compactly :
+    - the text of a LeafNode without tag nor props
+    - a tuple (tag code, value, props) for the other LeafNodes
+    - a list [tag code, props, *children] for a ParentNode
+    The tag code is the index of the tag in Tag, or NO_TAG.
+    """
+    tag = TAG_CODES[node.tag] if node.tag is not None else NO_TAG
+    if isinstance(node, ParentNode):
+        return [tag, node.props, *[encode_tree(child) for child in node.children]]  # type: ignore
+    if tag == NO_TAG and not node.props and isinstance(node.value, str):
+        return node.value
+    return (tag, node.value, node.props)
+
+
+def decode_tree(data) -> HTMLNode:
+    """Build the tree of HTMLNodes encoded by encode_tree
+    """
+    if type(data) is str:
+        return LeafNode(None, data)
+    tag = TAGS[data[0]] if data[0] != NO_TAG else None
+    if type(data) is tuple:
+        return LeafNode(tag, data[1], data[2])
+    return ParentNode(tag, [decode_tree(child) for child in data[2:]], data[1])  # type: ignore
+
+
+def encoded_tree_to_html(data, parts: List[str]) -> List[str]:
+    """Append to parts the html of a tree encoded by encode_tree, the same as the to_html
+    of the decoded tree, without building its HTMLNodes. Return parts.
+    """
+    if type(data) is str:
+        parts.append(data)
+    elif type(data) is tuple:
+        tag, value, props = data
+        if tag != NO_TAG and not props and value is not None:
+            name = TAGS[tag].value
+            parts.append(f"<{name}>{value}</{name}>")
+        else:
+            parts.append(decode_tree(data).to_html())  # links and images, with their props
+    else:
+        tag = data[0]
+        if tag == NO_TAG:
+            raise ValueError("ParentNode object must have a tag")
+        if len(data) == 2:
+            raise ValueError("ParentNode object must have children")
+        parts.append(OPENING_TAGS[tag])
+        for child in data[2:]:
+            encoded_tree_to_html(child, parts)
+        parts.append(CLOSING_TAGS[tag])
+    return parts
+
+
+class TreeCache:
+    """A TreeCache stores the HTMLNode tree of each markdown source parsed by a build,
+    with the urls of its links and its text (see searchindex), so that the next builds load the tree instead of parsing
+    the source again.
+    Each tree is a file named by the content address of its source and encoded with marshal,
+    in a directory named by the version, usually the version of the parser:
+    trees of another version are never read, and are deleted by remove_other_versions.
+    The keys got or put are kept in used, so that a build going through every source
+    can delete the trees of the sources it no longer has, see remove_unused.
+    Worker processes can share a cache, as every tree is written to a file of its own,
+    and send their counts and used keys back with drain_counts.
+    """
+
+    def __init__(self, directory: Path, version: str):
+        self.root = directory
+        self.directory = directory / f"{FORMAT_VERSION}-{version}"
+        self.hits = 0
+        self.misses = 0
+        self.used: Set[str] = set()
+
+    def get(self, key: str) -> Optional[Tuple[object, List[str], str]]:
+        """Return the encoded tree (see encode_tree), the urls of the links and the text
+        of a source, or None if it is not cached
+        """
+        self.used.add(key)
+        try:
+            data = (self.directory / key).read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            encoded_tree, links, text = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            self.misses += 1  # truncated or corrupted file, rewritten by the next put
+            return None
+        self.hits += 1
+        return encoded_tree, list(links), text
+
+    def put(self, key: str, encoded_tree, links: Iterable[str] = (), text: str = "") -> None:
+        """Store the encoded tree, the urls of the links and the text of a source
+        """
+        self.used.add(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / key
+        temporary_path = path.with_name(f"{key}.{os.getpid()}.tmp")
+        temporary_path.write_bytes(marshal.dumps((encoded_tree, tuple(links), text)))
+        os.replace(temporary_path, path)  # never leave a partial tree behind
+
+    def drain_counts(self) -> Tuple[int, int, Set[str]]:
+        """Return the hits, the misses and the used keys since the last call, and reset them
+        """
+        counts = (self.hits, self.misses, self.used)
+        self.hits = 0
+        self.misses = 0
+        self.used = set()
+        return counts
+
+    def merge_counts(self, counts: Tuple[int, int, Set[str]]) -> None:
+        """Add the counts and the used keys of a worker process, see drain_counts
+        """
+        hits, misses, used = counts
+        self.hits += hits
+        self.misses += misses
+        self.used.update(used)
+
+    def remove_unused(self) -> int:
+        """Delete the trees of this version not used since the cache was created, and
+        return their count. Only for a build which got or put the tree of every source.
+        """
+        if not self.directory.exists():
+            return 0
+        removed = 0
+        for path in self.directory.iterdir():
+            if path.name not in self.used:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def remove_other_versions(self) -> None:
+        """Delete the trees stored by other versions
+        """
+        if not self.root.exists():
+            return
+        for directory in self.root.iterdir():
+            if directory != self.directory and directory.is_dir():
+                shutil.rmtree(directory)
+
+
+def cached_markdown_to_html_node(markdown, tree_cache: TreeCache, block_cache=None, parser=None) -> HTMLNode:
+    """Return the tree of markdown_to_html_node for a markdown document given as text
+    or as a mmap, loaded from the tree cache, or parsed and stored in it.
+    The tree is parsed by the parser backend if given (see parsers), whose name should
+    be in the version of the cache.
+    The urls of its links and its text are added to the ones being collected, as if it was parsed.
+    """
+    return decode_tree(load_encoded_tree(markdown, tree_cache, block_cache, parser))
+
+
+def cached_markdown_to_html_fragments(markdown, tree_cache: TreeCache, block_cache=None,
+                                      parser=None) -> List[str]:
+    """Return the html of cached_markdown_to_html_node in fragments,
+    rendered from the encoded tree without building its HTMLNodes
+    """
+    return encoded_tree_to_html(load_encoded_tree(markdown, tree_cache, block_cache, parser), [])
+
+
+def load_encoded_tree(markdown, tree_cache: TreeCache, block_cache=None, parser=None):
+    """Return the encoded tree of a markdown document, see cached_markdown_to_html_node
+    """
+    key = source_key(markdown)
+    entry = tree_cache.get(key)
+    if entry is not None:
+        encoded_tree, links, text = entry
+    else:
+        blocks = markdown if isinstance(markdown, str) else iter_blocks(markdown)
+        with collect_links() as links, collect_text() as texts:
+            to_html_node = parser.markdown_to_html_node if parser is not None else markdown_to_html_node
+            encoded_tree = encode_tree(to_html_node(blocks, cache=block_cache))
+        text = "\n".join(texts)
+        tree_cache.put(key, encoded_tree, links, text)
+    add_links(links)
+    add_texts([text])
+    return encoded_tree
@@ -0,0 +1,179 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+
+FORMAT_VERSION = 1  # version of the saved inventories
+
+# A file or directory modified less than this before a scan may be modified again
+# with the same mtime, the timestamps of the filesystems being coarser than time_ns
+# (up to 2 seconds on FAT). Its stat is not trusted by the next scan, see TreeInventory.
+RACY_DELAY_NS = 2_000_000_000
+
+
+class TreeInventory:
+    """A TreeInventory is the flat list of the files of a directory tree, found with
+    os.scandir whose entries give the type of the files without a stat call :
+    - files: relative posix path -> (mtime_ns, size) of each file
+    - directories: relative posix path -> (mtime_ns, subdirectory names, file names)
+      of each directory, "." for the root
+    - scan_time: time of the start of the scan, in ns
+    The directories and the files are in a stable order: each directory before its files,
+    then its subdirectories, in the order of their names.
+    Symbolic links are followed, as with Path.is_file and Path.is_dir.
+
+    The inventory can be saved between builds and given to the next scan_tree, which
+    then knows the files left unchanged since the previous scan (see is_unchanged), and
+    reuses the listing of the unchanged directories instead of reading them again.
+    Only the names in a directory change its mtime, not an edit of one of its files nor
+    a change deeper in its subtree, so the files and subdirectories of an unchanged
+    directory are still given a stat each: a subtree is never skipped as a whole.
+    """
+
+    def __init__(self, root: Path, files: Optional[Dict[str, Tuple[int, int]]] = None,
+                 directories: Optional[Dict[str, Tuple[int, List[str], List[str]]]] = None,
+                 scan_time: int = 0):
+        self.root = root
+        self.files = files if files is not None else {}
+        self.directories = directories if directories is not None else {}
+        self.scan_time = scan_time
+        self.unchanged: Set[str] = set()  # files with the same stat as in the previous scan
+
+    @classmethod
+    def load(cls, path: Path, root: Path) -> "TreeInventory":
+        """Load the inventory of a root directory saved by a previous build,
+        or return an empty inventory if there is none or it can not be read
+        """
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(root)
+        if data.get("version") != FORMAT_VERSION or data.get("root") != str(root):
+            return cls(root)
+        files = {name: tuple(stat) for name, stat in data["files"].items()}
+        directories = {name: (mtime, names, file_names)
+                       for name, (mtime, names, file_names) in data["directories"].items()}
+        return cls(root, files, directories, data["scan_time"])
+
+    def save(self, path: Path) -> None:
+        """Write the inventory to a json file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"version": FORMAT_VERSION, "root": str(self.root),
+                                    "scan_time": self.scan_time, "files": self.files,
+                                    "directories": self.directories}, separators=(",", ":")))
+
+    def paths(self) -> List[Path]:
+        """Return the paths of the files of the tree
+        """
+        return [self.root / name for name in self.files]
+
+    def is_unchanged(self, path: Path) -> bool:
+        """Return True if a file of the tree has the same size and mtime as in the
+        previous scan, and was last modified long enough before it to trust them
+        """
+        return path.relative_to(self.root).as_posix() in self.unchanged
+
+    def directories_changed(self) -> bool:
+        """Return True if a directory of the tree has another mtime than in the scan,
+        a file or directory being added, removed or renamed in it, or may have changed
+        with the same mtime. Only the directories are given a stat, not the files.
+        """
+        root = os.fspath(self.root) + os.sep
+        for directory, (mtime, _, _) in self.directories.items():
+            try:
+                current = os.stat(self.root if directory == "." else root + directory).st_mtime_ns
+            except FileNotFoundError:
+                return True
+            if current != mtime or not self.is_trusted(mtime):
+                return True
+        return not self.directories and self.root.exists()
+
+    def is_trusted(self, mtime: int) -> bool:
+        """Return True if a stat taken by this scan can be compared by the next one
+        """
+        return mtime < self.scan_time - RACY_DELAY_NS
+
+
+def scan_tree(root: Path, previous: Optional[TreeInventory] = None, strict: bool = True) -> TreeInventory:
+    """Return the inventory of the files of a directory tree, empty if it does not exist.
+    With the inventory of a previous scan of the same tree, the directories with the same
+    mtime are not read again, and the files with the same stat are marked unchanged.
+    If strict, raise an Exception for an entry neither a file nor a directory, e.g. a broken
+    link, otherwise skip it. The entries removed while the tree is scanned are skipped.
+    """
+    inventory = TreeInventory(root, scan_time=time.time_ns())
+    if previous is None or previous.root != root:
+        previous = TreeInventory(root)
+    try:
+        root_mtime = os.stat(root).st_mtime_ns
+    except FileNotFoundError:
+        return inventory
+
+    pending = [(".", root_mtime)]
+    while pending:
+        directory, mtime = pending.pop()
+        path = root if directory == "." else root / directory
+        known = previous.directories.get(directory)
+        listing = None
+        if known is not None and known[0] == mtime and previous.is_trusted(mtime):
+            listing = stat_listing(path, known[1], known[2])
+        if listing is None:
+            try:
+                listing = read_listing(path, strict)
+            except FileNotFoundError:  # removed since the scan of its parent
+                continue
+        subdirectories, files = listing
+
+        inventory.directories[directory] = (mtime, [name for name, _ in subdirectories],
+                                            [name for name, _ in files])
+        for name, stat in files:
+            relative = name if directory == "." else f"{directory}/{name}"
+            inventory.files[relative] = stat
+            if previous.files.get(relative) == stat and previous.is_trusted(stat[0]):
+                inventory.unchanged.add(relative)
+        for name, subdirectory_mtime in reversed(subdirectories):
+            pending.append((name if directory == "." else f"{directory}/{name}", subdirectory_mtime))
+    return inventory
+
+
+def read_listing(path: Path, strict: bool = True) -> Tuple[List[Tuple[str, int]],
+                                                          List[Tuple[str, Tuple[int, int]]]]:
+    """Read a directory, and return its (subdirectory name, mtime) and (file name, (mtime, size))
+    pairs sorted by name
+    """
+    subdirectories = []
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    subdirectories.append((entry.name, entry.stat().st_mtime_ns))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.name, (stat.st_mtime_ns, stat.st_size)))
+                elif strict:
+                    raise Exception(f"invalid content: {entry.path}")
+            except FileNotFoundError:  # removed since the directory was read
+                continue
+    subdirectories.sort()
+    files.sort()
+    return subdirectories, files
+
+
+def stat_listing(path: Path, subdirectory_names: List[str], file_names: List[str]):
+    """Return the listing of read_listing from the names of a previous scan of an unchanged
+    directory, or None if one of them changed meanwhile
+    """
+    directory = os.fspath(path) + os.sep  # str paths, faster to build than Paths
+    try:
+        subdirectories = [(name, os.stat(directory + name).st_mtime_ns) for name in subdirectory_names]
+        files = []
+        for name in file_names:
+            stat = os.stat(directory + name)
+            files.append((name, (stat.st_mtime_ns, stat.st_size)))
+    except FileNotFoundError:
+        return None
+    return subdirectories, files
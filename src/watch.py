@@ -0,0 +1,376 @@
+import argparse
+import logging
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import main
+from assetsync import transfer_file
+from buildgraph import BuildGraph
+from buildlog import log_file_event
+from manifest import Manifest, hash_file
+from treescan import TreeInventory, scan_tree
+
+try:
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency, the sources are polled without it
+    Observer = None
+
+
+LOGGER = logging.getLogger(__name__)
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = f'<script>new EventSource("{RELOAD_PATH}").onmessage = () => location.reload();</script>'
+
+
+def snapshot(root: Path, inventory: Optional[TreeInventory] = None) -> Dict[Path, Tuple[int, int]]:
+    """Return the (mtime, size) of every file in a directory tree, or of a single file.
+    The tree is given by its inventory, scanned if not given (see treescan.scan_tree).
+    """
+    if root.is_file():
+        stat = root.stat()
+        return {root: (stat.st_mtime_ns, stat.st_size)}
+
+    if inventory is None:
+        inventory = scan_tree(root, strict=False)
+    return {root / name: stat for name, stat in inventory.files.items()}
+
+
+def changed_paths(before: Dict[Path, Tuple[int, int]], after: Dict[Path, Tuple[int, int]]) -> Set[Path]:
+    """Return the files added, modified or deleted between two snapshots
+    """
+    changed = {path for path, state in after.items() if before.get(path) != state}
+    changed.update(path for path in before if path not in after)
+    return changed
+
+
+class ChangeQueue:
+    """Collects the paths of the change notifications of the OS, sent by the thread
+    of a watchdog observer, until the next poll of the SiteWatcher takes them
+    """
+
+    def __init__(self):
+        self.paths: Set[Path] = set()
+        self.lock = threading.Lock()
+
+    def dispatch(self, event) -> None:
+        """Record the paths of a watchdog event
+        """
+        if event.is_directory and event.event_type == "modified":
+            return  # a name added or removed, whose own event is recorded
+        with self.lock:
+            self.paths.add(Path(os.fsdecode(event.src_path)))
+            if getattr(event, "dest_path", ""):  # moved
+                self.paths.add(Path(os.fsdecode(event.dest_path)))
+
+    def take(self) -> Set[Path]:
+        """Return the paths recorded since the last call
+        """
+        with self.lock:
+            paths, self.paths = self.paths, set()
+        return paths
+
+
+def start_observer(changes: ChangeQueue, content_dir: Path, static_dir: Path, template_path: Path):
+    """Start a watchdog observer sending the changes of the sources to a ChangeQueue,
+    or return None if watchdog is not installed
+    """
+    if Observer is None:
+        return None
+    observer = Observer()
+    for root in (content_dir, static_dir):
+        if root.is_dir():
+            observer.schedule(changes, os.fspath(root), recursive=True)
+    observer.schedule(changes, os.fspath(template_path.parent), recursive=False)
+    observer.start()
+    return observer
+
+
+class SiteWatcher:
+    """A SiteWatcher keeps a site up to date with its sources.
+    It watches the content directory, the static directory and the template,
+    and on each change rebuilds only what depends on it :
+    - a markdown document: its page is generated again, or deleted with its source
+    - the template: every page is generated again
+    - a static file: it is copied again, or deleted with its source
+
+    Given a ChangeQueue filled by the notifications of the OS, a poll only stats the
+    notified paths. Otherwise the sources are polled: each poll stats their directories,
+    whose mtime changes with the files added, removed or renamed, and the template,
+    and only every full_scan_interval seconds every file, for the files edited in place.
+    """
+
+    def __init__(self, content_dir: Path, static_dir: Path, template_path: Path,
+                 public_dir: Path, manifest: Manifest, changes: Optional[ChangeQueue] = None,
+                 full_scan_interval: float = 1.0):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.public_dir = public_dir
+        self.manifest = manifest
+        self.changes = changes
+        self.full_scan_interval = full_scan_interval
+        self.graph = BuildGraph.scan(content_dir=content_dir, static_dir=static_dir,
+                                     template_path=template_path, public_dir=public_dir)
+        self.inventories: Dict[Path, TreeInventory] = {}
+        self.snapshots = self.take_snapshots()
+        self.last_full_scan = time.monotonic()
+
+    def take_snapshots(self) -> Dict[Path, Tuple[int, int]]:
+        """Return the snapshot of the sources. The directories are scanned with their
+        previous inventory, so that only the directories changed since are read again.
+        """
+        files = snapshot(self.template_path)
+        for root in (self.content_dir, self.static_dir):
+            # the broken links, like the lock files of the editors, are not sources
+            self.inventories[root] = scan_tree(root, self.inventories.get(root), strict=False)
+            files.update(snapshot(root, self.inventories[root]))
+        return files
+
+    def poll(self) -> Set[Path]:
+        """Return the files changed since the last poll
+        """
+        if self.changes is not None:
+            return self.update_snapshots(self.changes.take())
+        if (time.monotonic() - self.last_full_scan < self.full_scan_interval
+                and not self.directories_changed()):
+            return self.update_snapshots({self.template_path})
+
+        snapshots = self.take_snapshots()
+        self.last_full_scan = time.monotonic()
+        changed = changed_paths(self.snapshots, snapshots)
+        self.snapshots = snapshots
+        return changed
+
+    def directories_changed(self) -> bool:
+        """Return True if a directory of the sources changed since their last scan
+        """
+        return any(inventory.directories_changed() for inventory in self.inventories.values())
+
+    def update_snapshots(self, paths: Set[Path]) -> Set[Path]:
+        """Update the snapshot of the given paths of the sources, files or directories,
+        and return the files changed among them
+        """
+        changed = set()
+        for path in paths:
+            if path != self.template_path and not (path.is_relative_to(self.content_dir)
+                                                   or path.is_relative_to(self.static_dir)):
+                continue
+            if path in self.snapshots or path.is_file():
+                before = {path: self.snapshots[path]} if path in self.snapshots else {}
+            else:  # a directory added, removed or renamed, with the files under it
+                prefix = os.fspath(path) + os.sep
+                before = {file: state for file, state in self.snapshots.items()
+                          if os.fspath(file).startswith(prefix)}
+            try:
+                after = snapshot(path) if path.exists() else {}
+            except FileNotFoundError:  # removed meanwhile
+                after = {}
+
+            files = changed_paths(before, after)
+            for file in files:
+                if file in after:
+                    self.snapshots[file] = after[file]
+                else:
+                    del self.snapshots[file]
+            changed.update(files)
+        return changed
+
+    def rebuild(self, changed: Set[Path]) -> List[Path]:
+        """Update the site for the changed files and return the updated outputs.
+        The outputs to update are planned by the build graph of the site, see buildgraph.BuildGraph.
+        """
+        plan = self.graph.plan(changed)
+        for path in changed:
+            if path.is_relative_to(self.content_dir) and not path.exists():
+                self.manifest.pages.pop(str(path), None)
+            elif path.is_relative_to(self.static_dir) and not path.exists():
+                relative_asset = path.relative_to(self.static_dir).as_posix()
+                if relative_asset in self.manifest.assets:
+                    self.manifest.assets.remove(relative_asset)
+
+        self.graph.execute(plan, render_pages=self.render_pages, copy_assets=self.copy_assets)
+        updated = [main.page_path(source, dest_dir) for source, dest_dir in plan.pages]
+        updated.extend(destination for _, destination in plan.assets)
+        updated.extend(plan.deleted)
+        return updated
+
+    def render_pages(self, pages: List[Tuple[Path, Path]]) -> None:
+        template_hash = hash_file(self.template_path)
+        for source, dest_dir in pages:
+            main.generate_page(from_path=source, template_path=self.template_path, dest_path=dest_dir)
+            self.manifest.record(source, hash_file(source), template_hash, main.page_path(source, dest_dir))
+
+    def copy_assets(self, assets: List[Tuple[Path, Path]]) -> None:
+        for asset, destination in assets:
+            transfer_file(asset, destination, mode="copy")
+            relative_asset = asset.relative_to(self.static_dir).as_posix()
+            if relative_asset not in self.manifest.assets:
+                self.manifest.assets.append(relative_asset)
+            log_file_event(LOGGER, "FILE COPIED", asset, destination)
+
+
+class ReloadNotifier:
+    """Counts the rebuilds of the site and wakes up the browsers waiting for one
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def notify(self) -> None:
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version: int, timeout: float) -> int:
+        """Wait until the version is above the given one, or the timeout.
+        Return the current version.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version > version, timeout=timeout)
+            return self.version
+
+
+def inject_reload_script(html: str) -> str:
+    """Add the live reload script at the end of the body of a html document
+    """
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    """Serve the public directory, with the live reload script in the html documents
+    and a server-sent events stream telling the browsers to reload after a rebuild
+    """
+
+    notifier: ReloadNotifier
+
+    def do_GET(self):
+        if self.path == RELOAD_PATH:
+            self.send_reload_events()
+            return
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            self.send_html(path)
+            return
+        super().do_GET()
+
+    def send_html(self, path: str) -> None:
+        body = inject_reload_script(Path(path).read_text()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_reload_events(self) -> None:
+        version = self.notifier.version  # before the headers, to never miss a rebuild
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                new_version = self.notifier.wait(version, timeout=15)
+                if new_version > version:
+                    self.wfile.write(b"data: reload\n\n")
+                    version = new_version
+                else:
+                    self.wfile.write(b": ping\n\n")  # keep the connection alive
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        LOGGER.info("SERVER : " + format % args)
+
+
+def start_server(public_dir: Path, port: int, notifier: ReloadNotifier) -> ThreadingHTTPServer:
+    """Serve the public directory with live reload in a background thread
+    """
+    handler = type("Handler", (LiveReloadHandler,), {"notifier": notifier})
+    server = ThreadingHTTPServer(("", port), partial(handler, directory=str(public_dir)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def watch(args: argparse.Namespace) -> None:
+    """Build the site, then rebuild what changed on each poll until interrupted.
+    The changes are notified by the OS if watchdog is installed, unless args.poll.
+    """
+    changes = ChangeQueue()
+    observer = None
+    if not args.poll:
+        observer = start_observer(changes, main.CONTENT_DIR, main.STATIC_DIR, main.TEMPLATE_PATH)
+    if observer is None:
+        changes = None
+        print("Polling the sources, install watchdog to be notified of their changes")
+
+    build_args = main.parse_args(["--incremental"])
+    main.build(build_args, content_dir=main.CONTENT_DIR, static_dir=main.STATIC_DIR,
+               template_path=main.TEMPLATE_PATH, public_dir=main.PUBLIC_DIR, cache_dir=main.CACHE_DIR)
+
+    manifest = Manifest.load(main.CACHE_DIR / main.MANIFEST_NAME)
+    watcher = SiteWatcher(content_dir=main.CONTENT_DIR, static_dir=main.STATIC_DIR,
+                          template_path=main.TEMPLATE_PATH, public_dir=main.PUBLIC_DIR,
+                          manifest=manifest, changes=changes, full_scan_interval=args.scan_interval)
+    if changes is not None:
+        changes.take()  # the changes of the build, already in the snapshots
+    notifier = ReloadNotifier()
+    server = None
+    if not args.no_server:
+        server = start_server(main.PUBLIC_DIR, args.port, notifier)
+        print(f"Serving {main.PUBLIC_DIR} on http://localhost:{args.port}")
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            changed = watcher.poll()
+            if not changed:
+                continue
+            start = time.perf_counter()
+            try:
+                updated = watcher.rebuild(changed)
+            except Exception as error:
+                print(f"Rebuild failed: {error}")
+                continue
+            notifier.notify()
+            print(f"Rebuilt {len(updated)} files in {(time.perf_counter() - start) * 1000:.1f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manifest.save()
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        if server is not None:
+            server.shutdown()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the site on each change and serve it with live reload")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between two polls of the sources")
+    parser.add_argument("--no-server", action="store_true", help="only rebuild, without serving the site")
+    parser.add_argument("--poll", action="store_true",
+                        help="poll the sources even if watchdog can notify their changes")
+    parser.add_argument("--scan-interval", type=float, default=1.0,
+                        help="seconds between two polls of every source file, for the files edited in place")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main.configure_logging()
+    watch(parse_args())